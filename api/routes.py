@@ -14,8 +14,10 @@ import logging
 import conf.config as conf
 import modules.byzantine as byz
 from modules.replication.models.request import Request
-from modules.replication.models.client_request import ClientRequest
+from modules.replication.models.client_request import (
+    ClientRequest, intern_client_request)
 from modules.replication.models.operation import Operation
+from modules.replication.models.checkpoint import Checkpoint
 
 # globals
 routes = Blueprint("routes", __name__)
@@ -29,7 +31,7 @@ class CustomEncoder(json.JSONEncoder):
         """Converts set to list, all other datatypes are treated as usual."""
         if isinstance(obj, set):
             return list(obj)
-        if isinstance(obj, (Request, ClientRequest, Operation)):
+        if isinstance(obj, (Request, ClientRequest, Operation, Checkpoint)):
             return obj.to_dct()
         return json.JSONEncoder.default(self, obj)
 
@@ -56,7 +58,8 @@ def handle_client_message():
 
     try:
         op = Operation(data["operation"]["type"], data["operation"]["args"])
-        req = ClientRequest(data["client_id"], data["timestamp"], op)
+        req = intern_client_request(
+            ClientRequest(data["client_id"], data["timestamp"], op))
         pend_reqs = app.resolver.inject_client_req(req)
         logger.debug(f"Injected req {req} to pend_reqs")
         return jsonify({"pend_reqs": jsonpickle.encode(pend_reqs)})
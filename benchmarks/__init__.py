@@ -0,0 +1,5 @@
+"""Package containing micro-benchmarks for BFTList.
+
+Each benchmark is a module that can be run from the project root, e.g.
+python -m benchmarks.codec
+"""
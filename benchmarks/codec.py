@@ -0,0 +1,93 @@
+"""Benchmark of the wire codecs: bytes/message and µs/message.
+
+Compares the BINARY codec against JSONPICKLE for every message type, with a
+replica structure whose state and logs are filled as in a running cluster.
+
+Usage: python -m benchmarks.codec [state length] [number of clients]
+"""
+
+# standard
+import sys
+import timeit
+
+# local
+from communication import codec
+from communication.constants import BINARY, JSONPICKLE
+from communication.zeromq.message import Message, MessageEnum
+from resolve.enums import MessageType
+from modules.enums import (ReplicationEnums, OperationEnums,
+                           PrimaryMonitoringEnums)
+from modules.constants import (REQUEST, STATUS, X_SET, REPLY,
+                               V_STATUS, PRIM, NEED_CHANGE, NEED_CHG_SET,
+                               SIGMA)
+from modules.replication.models.replica_structure import ReplicaStructure
+from modules.replication.models.request import Request
+from modules.replication.models.client_request import ClientRequest
+from modules.replication.models.operation import Operation
+
+
+def build_replica_structure(state_length, k):
+    """Builds a replica structure with full logs and queues."""
+    def req(seq_num):
+        client_req = ClientRequest(seq_num % k, seq_num,
+                                   Operation(OperationEnums.APPEND, seq_num))
+        return Request(client_req, 0, seq_num)
+
+    log_length = min(state_length, 3 * SIGMA * k)
+    r_log = [{REQUEST: req(i), X_SET: set(range(6))}
+             for i in range(state_length - log_length, state_length)]
+    req_q = [{REQUEST: req(i), STATUS: {ReplicationEnums.PRE_PREP,
+                                        ReplicationEnums.PREP}}
+             for i in range(state_length, state_length + SIGMA * k)]
+    pend_reqs = [x[REQUEST].get_client_request() for x in req_q]
+    last_req = [{REQUEST: req(i), REPLY: i} for i in range(k)]
+    return ReplicaStructure(0, number_of_clients=k,
+                            rep_state=list(range(state_length)), r_log=r_log,
+                            pend_reqs=pend_reqs, req_q=req_q,
+                            last_req=last_req,
+                            seq_num=state_length + SIGMA * k, prim=0)
+
+
+def build_messages(state_length, k):
+    """Builds one enveloped message of each type."""
+    data = {
+        MessageType.VIEW_ESTABLISHMENT_MESSAGE: (0, True, 1, 1, False,
+                                                 0, True, 1, 1, False),
+        MessageType.REPLICATION_MESSAGE: {
+            "own_replica_structure": build_replica_structure(state_length, k)
+        },
+        MessageType.PRIMARY_MONITORING_MESSAGE: {
+            "vcm": {V_STATUS: PrimaryMonitoringEnums.OK, PRIM: 1,
+                    NEED_CHANGE: False, NEED_CHG_SET: 0b111}
+        },
+        MessageType.FAILURE_DETECTOR_MESSAGE: {"prim_susp": False},
+        MessageType.EVENT_DRIVEN_FD_MESSAGE: {"token": 1234, "owner_id": 1}
+    }
+    return {t: Message(MessageEnum.SENDER_MESSAGE, 1, 0,
+                       {"type": t, "sender": 0, "data": d})
+            for t, d in data.items()}
+
+
+def measure(msg, using, number):
+    """Returns (bytes, µs to encode, µs to decode) for msg."""
+    data = codec.encode(msg, using=using)
+    enc = timeit.timeit(lambda: codec.encode(msg, using=using), number=number)
+    dec = timeit.timeit(lambda: codec.decode(data), number=number)
+    return len(data), enc / number * 1e6, dec / number * 1e6
+
+
+def main(state_length=100, k=6):
+    """Prints a table comparing the codecs for every message type."""
+    print(f"state length {state_length}, {k} clients")
+    print(f"{'message type':<28}{'codec':<12}{'bytes':>8}"
+          f"{'enc µs':>10}{'dec µs':>10}")
+    for msg_type, msg in build_messages(state_length, k).items():
+        number = 50 if msg_type == MessageType.REPLICATION_MESSAGE else 500
+        for using in [JSONPICKLE, BINARY]:
+            size, enc, dec = measure(msg, using, number)
+            print(f"{msg_type.name:<28}{using:<12}{size:>8}"
+                  f"{enc:>10.1f}{dec:>10.1f}")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
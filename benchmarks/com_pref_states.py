@@ -0,0 +1,111 @@
+"""Benchmark of ReplicationModule.com_pref_states over cluster sizes.
+
+Times com_pref_states for n = 4..64 (f = (n - 1) // 3, n - 2f required
+processors) with replica states that share prefixes, and compares it with
+the previous implementation that checked every combination of processors
+for the sizes where that finishes in reasonable time.
+
+Usage: python -m benchmarks.com_pref_states [max n] [state length]
+"""
+
+# standard
+import itertools
+import random
+import sys
+import timeit
+from math import factorial
+
+# local
+from resolve.resolver import Resolver
+from modules.replication.module import ReplicationModule
+from modules.replication.models.client_request import ClientRequest
+
+# max number of combinations to run the previous implementation for
+MAX_COMBINATIONS = 20000
+
+
+def combinations_com_pref_states(replication, required_processors):
+    """The previous implementation, checking all combinations."""
+    dct = {}
+    for replica_structure in replication.rep:
+        dct[replica_structure.get_id()] = {
+            "REP_STATE": replica_structure.get_rep_state(),
+            "R_LOG": replica_structure.get_r_log()
+        }
+    candidates = []
+    for processor_set in itertools.combinations(dct, required_processors):
+        all_states_are_prefixes = True
+        for id_A, id_B in itertools.combinations(processor_set, 2):
+            if not replication.are_prefixes(id_A, id_B):
+                all_states_are_prefixes = False
+                break
+        if all_states_are_prefixes:
+            candidates.append(list(processor_set))
+
+    longest_prefix_found = -1
+    returning_processors = []
+    for processors in candidates:
+        states = [dct[id]["REP_STATE"] for id in processors]
+        prefixes = replication.find_prefix(states)
+        length = len(prefixes) if prefixes is not None else -1
+        if length > longest_prefix_found:
+            longest_prefix_found = length
+            returning_processors = processors
+
+    returning_states = []
+    returning_r_log = []
+    is_default_prefix = False
+    for id in returning_processors:
+        if replication.rep[id].is_def_prefix():
+            is_default_prefix = True
+        returning_states.append(dct[id]["REP_STATE"])
+        returning_r_log.append(dct[id]["R_LOG"])
+    return (returning_states, returning_r_log, is_default_prefix)
+
+
+def build_replication(n, state_length, seed=0):
+    """Replication module with nodes at different points of one state.
+
+    About a fifth of the nodes have diverged from that state.
+    """
+    rnd = random.Random(seed)
+    replication = ReplicationModule(0, Resolver(testing=True), n,
+                                    (n - 1) // 3, 1)
+    state = list(range(state_length))
+    for rs in replication.rep:
+        rs_state = state[:rnd.randint(state_length // 2, state_length)]
+        if rnd.random() < 0.2:
+            rs_state = rs_state + [-1]
+        rs.set_rep_state(rs_state)
+        rs.set_pend_reqs([ClientRequest(0, 0, None)])
+    return replication
+
+
+def main(max_n=64, state_length=100):
+    """Prints ms per call of com_pref_states for n = 4..max_n."""
+    print(f"state length {state_length}")
+    print(f"{'n':>4}{'f':>4}{'n-2f':>6}{'combinations':>22}"
+          f"{'ms':>10}{'ms before':>12}")
+    for n in range(4, max_n + 1, 3):
+        f = (n - 1) // 3
+        k = n - 2 * f
+        replication = build_replication(n, state_length)
+        number = 5
+        ms = timeit.timeit(lambda: replication.com_pref_states(k),
+                           number=number) / number * 1e3
+        combinations = factorial(n) // (factorial(k) * factorial(n - k))
+        before = ""
+        if combinations <= MAX_COMBINATIONS:
+            result = replication.com_pref_states(k)
+            if combinations_com_pref_states(replication, k) != result:
+                raise AssertionError(f"Different result for n={n}")
+            before = timeit.timeit(
+                lambda: combinations_com_pref_states(replication, k),
+                number=1) * 1e3
+            before = f"{before:.1f}"
+        print(f"{n:>4}{f:>4}{k:>6}{combinations:>22}{ms:>10.2f}"
+              f"{before:>12}")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,173 @@
+"""Benchmark of the request model objects: memory and hash/compare speed.
+
+Compares Request, ClientRequest and Operation against plain classes with
+per-instance dicts, getter based equality and hashes computed on every
+call, as the models were before they became slotted values.
+
+Usage: python -m benchmarks.request_models [requests] [nodes]
+"""
+
+# standard
+import sys
+import timeit
+import tracemalloc
+
+# local
+from modules.enums import OperationEnums
+from modules.replication.models.request import Request
+from modules.replication.models.client_request import (
+    ClientRequest, intern_client_request)
+from modules.replication.models.operation import Operation
+
+
+class PlainOperation(object):
+    """Operation with a per-instance dict."""
+
+    def __init__(self, op_type, *args):
+        """Initializes an operation."""
+        self.op_type = op_type
+        self.args = args
+
+    def get_type(self):
+        """Returns the type of operation to execute."""
+        return self.op_type
+
+    def __eq__(self, other):
+        """Compares through getters."""
+        if type(other) is type(self):
+            return (self.get_type() == other.get_type() and
+                    self.args == other.args)
+        return False
+
+
+class PlainClientRequest(object):
+    """Client request with a per-instance dict."""
+
+    def __init__(self, client_id, timestamp, operation):
+        """Initializes a client request."""
+        self.client_id = client_id
+        self.timestamp = timestamp
+        self.operation = operation
+
+    def get_client_id(self):
+        """Returns the ID of the client."""
+        return self.client_id
+
+    def get_timestamp(self):
+        """Returns the timestamp of the request."""
+        return self.timestamp
+
+    def get_operation(self):
+        """Returns the operation of the request."""
+        return self.operation
+
+    def __eq__(self, other):
+        """Compares through getters."""
+        if type(other) is type(self):
+            return (self.client_id == other.get_client_id() and
+                    self.timestamp == other.get_timestamp() and
+                    self.operation == other.get_operation())
+        return False
+
+    def __hash__(self):
+        """Hashes a new tuple on every call."""
+        return hash((self.client_id, self.timestamp))
+
+
+class PlainRequest(object):
+    """Request with a per-instance dict."""
+
+    def __init__(self, client_request, view, seq_num):
+        """Initializes a request."""
+        self.client_request = client_request
+        self.view = view
+        self.seq_num = seq_num
+
+    def get_client_request(self):
+        """Returns the client request."""
+        return self.client_request
+
+    def get_view(self):
+        """Returns the view."""
+        return self.view
+
+    def get_seq_num(self):
+        """Returns the sequence number."""
+        return self.seq_num
+
+    def __eq__(self, other):
+        """Compares through getters."""
+        if type(other) is type(self):
+            return (self.client_request == other.get_client_request() and
+                    self.view == other.get_view() and
+                    self.seq_num == other.get_seq_num())
+        return False
+
+    def __hash__(self):
+        """Hashes a new tuple on every call."""
+        return hash((self.client_request.get_client_id(), self.view,
+                     self.seq_num))
+
+
+MODELS = {
+    "plain": (PlainOperation, PlainClientRequest, PlainRequest),
+    "slotted": (Operation, ClientRequest, Request)
+}
+
+
+def build(models, number, intern=False):
+    """Builds number requests, as a node receives them from one node."""
+    operation, client_request, request = models
+    reqs = []
+    for i in range(number):
+        client_req = client_request(i % 6, i,
+                                    operation(OperationEnums.APPEND, i))
+        if intern:
+            client_req = intern_client_request(client_req)
+        reqs.append(request(client_req, 0, i))
+    return reqs
+
+
+def memory(models, number, peers, intern=False):
+    """Returns the bytes allocated per request received from each peer."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    reqs = [build(models, number, intern) for j in range(peers)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del reqs
+    return (after - before) / (number * peers)
+
+
+def throughput(models, number, intern=False):
+    """Returns (hashes/s, equal compares/s, unequal compares/s)."""
+    a = build(models, number, intern)
+    b = build(models, number, intern)
+    shifted = b[1:] + b[:1]
+    repeat = max(1, 200000 // number)
+    hashes = timeit.timeit(lambda: [hash(x) for x in a], number=repeat)
+    equal = timeit.timeit(
+        lambda: [x == y for x, y in zip(a, b)], number=repeat)
+    unequal = timeit.timeit(
+        lambda: [x == y for x, y in zip(a, shifted)], number=repeat)
+    ops = number * repeat
+    return ops / hashes, ops / equal, ops / unequal
+
+
+def main(number=10000, peers=4):
+    """Prints memory per request and hash/compare throughput."""
+    print(f"{number} requests received from each of {peers} nodes")
+    print(f"{'models':<10}{'bytes/req':>10}{'hash/s':>14}{'eq/s':>14}"
+          f"{'neq/s':>14}")
+    runs = [("plain", MODELS["plain"], False),
+            ("slotted", MODELS["slotted"], False),
+            ("interned", MODELS["slotted"], True)]
+    for name, models, intern in runs:
+        size = memory(models, number, peers, intern)
+        hashes, equal, unequal = throughput(models, number, intern)
+        print(f"{name:<10}{size:>10.0f}{hashes:>14,.0f}{equal:>14,.0f}"
+              f"{unequal:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:3]])
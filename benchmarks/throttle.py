@@ -0,0 +1,81 @@
+"""Benchmark of the module loop throttling: overhead and wake-up latency.
+
+Compares the condition based throttle with the previous implementation,
+which ran a new asyncio event loop on every call and polled the sender
+queues with fixed sleeps.
+
+Usage: python -m benchmarks.throttle [number of senders]
+"""
+
+# standard
+import asyncio
+import sys
+import time
+import timeit
+from threading import Thread
+
+# local
+from communication.coalescing_queue import CoalescingQueue
+from communication.zeromq import rate_limiter
+from modules.constants import MAX_QUEUE_SIZE, RUN_SLEEP
+
+
+class FakeSender:
+    """Sender with a message queue that is drained by hand."""
+
+    def __init__(self):
+        """Initializes the sender with an empty queue."""
+        self.msg_queue = CoalescingQueue()
+
+
+class FakeResolver:
+    """Resolver holding the fake senders."""
+
+    def __init__(self, n):
+        """Initializes n fake senders."""
+        self.senders = {i: FakeSender() for i in range(n)}
+
+
+async def polling_sleep():
+    """The previous throttle, polling the queues every RUN_SLEEP."""
+    while rate_limiter.queues_are_full():
+        await asyncio.sleep(RUN_SLEEP)
+
+
+def polling_throttle():
+    """The previous throttle, running a new event loop per call."""
+    asyncio.run(polling_sleep())
+
+
+def wake_up_latency(throttle):
+    """Returns the s from draining a full queue until throttle returns."""
+    queue = rate_limiter.resolver.senders[0].msg_queue
+    for i in range(MAX_QUEUE_SIZE + 1):
+        queue.put(i)
+    returned = []
+    t = Thread(target=lambda: (throttle(), returned.append(time.time())))
+    t.start()
+    time.sleep(0.02)
+    drained = time.time()
+    while queue.get() is not None:
+        rate_limiter.notify_drained(queue)
+    t.join()
+    return returned[0] - drained
+
+
+def main(n=8):
+    """Prints the throttle overhead and wake-up latency of both versions."""
+    rate_limiter.resolver = FakeResolver(n)
+    number = 2000
+    print(f"{n} senders")
+    print(f"{'throttle':<12}{'µs/call':>10}{'wake-up ms':>12}")
+    for name, throttle in [
+            ("polling", polling_throttle),
+            ("condition", lambda: rate_limiter.throttle(paced=False))]:
+        call = timeit.timeit(throttle, number=number) / number * 1e6
+        latency = sum(wake_up_latency(throttle) for i in range(5)) / 5
+        print(f"{name:<12}{call:>10.1f}{latency * 1e3:>12.2f}")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,67 @@
+"""Benchmark of the View Establishment case search over cluster sizes.
+
+Times the search for the current case, evaluating the predicates of cases
+0..3 in both phases as ViewEstablishmentModule.run does, for n = 4..64
+(f = (n - 1) // 3). The views of the nodes are spread over a few view
+pairs, some of them stale. The search is timed scanning the views in every
+predicate and with the views grouped once into a ViewHistogram, and the
+results of both are compared.
+
+Usage: python -m benchmarks.view_predicates [max n]
+"""
+
+# standard
+import logging
+import random
+import sys
+import timeit
+
+# local
+from resolve.resolver import Resolver
+from modules.view_establishment.module import ViewEstablishmentModule
+from modules.enums import ViewEstablishmentEnums as enums
+from modules.constants import CURRENT, NEXT
+
+
+def build_view_est(n, seed=0):
+    """View Establishment module with views spread over a few pairs."""
+    rnd = random.Random(seed)
+    view_est = ViewEstablishmentModule(0, Resolver(testing=True), n,
+                                       (n - 1) // 3)
+    pairs = [(1, 1), (1, 2), (2, 2), (enums.TEE, enums.DF_VIEW), (n, 1)]
+    for k in range(n):
+        current, next_view = rnd.choice(pairs)
+        view_est.pred_and_action.views[k] = {CURRENT: current,
+                                             NEXT: next_view}
+        view_est.phs[k] = 0 if current == next_view else 1
+    return view_est
+
+
+def search(pred_and_action, snapshot):
+    """Evaluates the predicates of all cases of both phases."""
+    if snapshot:
+        pred_and_action.take_snapshot()
+    res = [pred_and_action.automation(enums.PREDICATE, phase, case)
+           for phase in [0, 1] for case in range(4)]
+    pred_and_action.drop_snapshot()
+    return res
+
+
+def main(max_n=64):
+    """Prints ms per case search for n = 4..max_n."""
+    print(f"{'n':>4}{'f':>4}{'ms scanning':>14}{'ms histogram':>14}")
+    for n in range(4, max_n + 1, 6):
+        pred_and_action = build_view_est(n).pred_and_action
+        if search(pred_and_action, False) != search(pred_and_action, True):
+            raise AssertionError(f"Different result for n={n}")
+        number = 5
+        times = [timeit.timeit(lambda: search(pred_and_action, snapshot),
+                               number=number) / number * 1e3
+                 for snapshot in [False, True]]
+        print(f"{n:>4}{(n - 1) // 3:>4}{times[0]:>14.2f}{times[1]:>14.2f}")
+
+
+if __name__ == "__main__":
+    # the modules log errors about the missing hosts file
+    logging.disable(logging.ERROR)
+    main(*[int(arg) for arg in sys.argv[1:2]])
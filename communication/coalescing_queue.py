@@ -0,0 +1,114 @@
+"""Outbound message queue where newer state messages replace older ones."""
+
+# standard
+from collections import deque
+from threading import Lock
+import time
+
+
+class CoalescingQueue:
+    """Thread-safe FIFO queue that coalesces messages with the same key.
+
+    Messages put without a key are kept in FIFO order like in a Queue. A
+    message put with a key replaces the message with the same key that is
+    still waiting in the queue, if any, and takes over its place in the
+    queue. This is used for messages carrying the full (or latest) state of
+    a module, where a queued message is superseded by the next one.
+
+    A pinned message, such as a full snapshot that later messages are
+    deltas on, is only replaced by another pinned message. A message with
+    the same key that is not pinned is queued after it, and is replaced as
+    usual until the pinned message is sent. So at most two messages with a
+    key are queued.
+
+    Each slot keeps the time its first message was queued, so replacing a
+    message does not hide how long the state of the key has been waiting.
+    """
+
+    def __init__(self):
+        """Initializes an empty queue."""
+        self.lock = Lock()
+        # [key, msg, queued at] in the order to send them
+        self.slots = deque()
+        self.keyed = {}  # key -> last slot with key waiting in the queue
+        self.pinned = {}  # key -> slot of a pinned message waiting
+        self.backlog = 0  # messages in the queue without key
+
+    def put(self, msg, key=None, pinned=False, queued_at=None) -> int:
+        """Adds msg to the queue, replacing the queued message with key.
+
+        queued_at is the time msg was queued, default now. It is ignored
+        when msg replaces a message, as the slot keeps its first time.
+        Returns the change of the number of queued messages: 1 if msg was
+        added, 0 if it replaced a message and -1 if it replaced a message
+        after a pinned one, which it supersedes too.
+        """
+        if queued_at is None:
+            queued_at = time.time()
+        with self.lock:
+            if key is None:
+                self.slots.append([None, msg, queued_at])
+                self.backlog += 1
+                return 1
+            slot = self.keyed.get(key)
+            first = self.pinned.get(key)
+            if slot is None or (slot is first and not pinned):
+                slot = [key, msg, queued_at]
+                self.keyed[key] = slot
+                if pinned:
+                    self.pinned[key] = slot
+                self.slots.append(slot)
+                return 1
+            slot[1] = msg
+            if not pinned or slot is first:
+                return 0
+            self.pinned[key] = slot
+            if first is None:
+                return 0
+            for i, s in enumerate(self.slots):
+                if s is first:
+                    del self.slots[i]
+                    break
+            slot[2] = min(slot[2], first[2])
+            return -1
+
+    def get(self):
+        """Returns the next message, or None if the queue is empty."""
+        item = self.get_timed()
+        return None if item is None else item[1]
+
+    def get_timed(self):
+        """Returns (queued at, msg) of the next message, or None.
+
+        The time is when the first message of the slot was queued, even if
+        msg replaced it later.
+        """
+        with self.lock:
+            if not self.slots:
+                return None
+            slot = self.slots.popleft()
+            key, msg, queued_at = slot
+            if key is not None:
+                if self.keyed[key] is slot:
+                    del self.keyed[key]
+                if self.pinned.get(key) is slot:
+                    del self.pinned[key]
+            else:
+                self.backlog -= 1
+            return queued_at, msg
+
+    def qsize(self):
+        """Returns the number of messages in the queue."""
+        return len(self.slots)
+
+    def empty(self):
+        """Returns True if the queue is empty."""
+        return not self.slots
+
+    def fifo_size(self):
+        """Returns the number of messages in the queue without a key.
+
+        Keyed messages are bounded by the number of keys, so only these
+        messages can make the queue grow without bound.
+        """
+        return self.backlog
@@ -0,0 +1,347 @@
+"""Wire codecs used to serialize messages sent between nodes.
+
+Two codecs are supported and selected per cluster with the environment
+variable WIRE_CODEC:
+
+JSONPICKLE (default) - the full Python object graph encoded as JSON.
+BINARY - a compact, schema-aware binary encoding where every supported type
+         (builtins, enums and the replication models) has an explicit encoder.
+
+Decoding detects the codec from the first byte of the data, so a node can
+always decode messages regardless of which codec it is configured with.
+"""
+
+# standard
+import os
+import struct
+
+# external
+import jsonpickle
+
+# local
+from communication.constants import JSONPICKLE, BINARY
+from resolve.enums import MessageType
+from modules.enums import (ReplicationEnums, OperationEnums,
+                           PrimaryMonitoringEnums, ViewEstablishmentEnums)
+from modules.replication.models.operation import Operation
+from modules.replication.models.client_request import (
+    ClientRequest, intern_client_request)
+from modules.replication.models.request import Request
+from modules.replication.models.checkpoint import Checkpoint
+from modules.replication.models.replica_structure import ReplicaStructure
+
+# first byte of every binary encoded message, never the first byte of JSON
+MAGIC = 0xB1
+
+# type tags, all tags must be lower than SMALL_INT
+NONE = 0x00
+TRUE = 0x01
+FALSE = 0x02
+INT = 0x03
+FLOAT = 0x04
+STR = 0x05
+BYTES = 0x06
+LIST = 0x07
+TUPLE = 0x08
+DICT = 0x09
+SET = 0x0A
+FROZENSET = 0x0B
+ENUM = 0x0C
+
+# tags for registered structs (models and message envelopes)
+OPERATION = 0x20
+CLIENT_REQUEST = 0x21
+REQUEST = 0x22
+REPLICA_STRUCTURE = 0x23
+CHECKPOINT = 0x24
+ZMQ_MESSAGE = 0x30
+UDP_MESSAGE = 0x31
+
+# ints in [0, 127] are encoded as a single byte SMALL_INT | value
+SMALL_INT = 0x80
+
+_DOUBLE = struct.Struct("<d")
+
+codec = os.getenv("WIRE_CODEC", JSONPICKLE).upper()
+
+_encoders = {}
+_decoders = {}
+_enum_ids = {}
+_enums = {}
+
+
+class Reader:
+    """Cursor over a binary encoded message."""
+
+    def __init__(self, data):
+        """Initializes the reader, skipping the leading MAGIC byte."""
+        self.data = data
+        self.pos = 1
+
+    def byte(self):
+        """Reads a single byte."""
+        b = self.data[self.pos]
+        self.pos += 1
+        return b
+
+    def uvarint(self):
+        """Reads an unsigned varint."""
+        data = self.data
+        pos = self.pos
+        result = 0
+        shift = 0
+        while True:
+            b = data[pos]
+            pos += 1
+            result |= (b & 0x7F) << shift
+            if b < 0x80:
+                break
+            shift += 7
+        self.pos = pos
+        return result
+
+    def raw(self, size):
+        """Reads size raw bytes."""
+        start = self.pos
+        self.pos += size
+        if self.pos > len(self.data):
+            raise ValueError("Truncated binary message")
+        return self.data[start:self.pos]
+
+
+def encode(obj, using=None):
+    """Encodes obj to bytes using the configured (or given) codec."""
+    if (using or codec) == BINARY:
+        buf = bytearray((MAGIC,))
+        _encode(obj, buf)
+        return bytes(buf)
+    return jsonpickle.encode(obj).encode()
+
+
+def decode(data):
+    """Decodes bytes produced by encode, regardless of codec used."""
+    if data and data[0] == MAGIC:
+        reader = Reader(data)
+        obj = _decode(reader)
+        if reader.pos != len(data):
+            raise ValueError("Trailing bytes after binary message")
+        return obj
+    return jsonpickle.decode(data.decode())
+
+
+def register_struct(cls, tag, fields, factory=None):
+    """Registers an explicit encoder for cls.
+
+    Instances are encoded as the values of the attributes in fields, in
+    order. They are decoded by calling factory with those values or, if no
+    factory is given, by setting the attributes on a new instance without
+    calling __init__.
+    """
+    if tag in _decoders:
+        raise ValueError(f"Tag {tag} is already registered")
+
+    def encode_struct(obj, buf):
+        buf.append(tag)
+        for field in fields:
+            _encode(getattr(obj, field), buf)
+
+    if factory is None:
+        def decode_struct(reader):
+            obj = cls.__new__(cls)
+            for field in fields:
+                setattr(obj, field, _decode(reader))
+            return obj
+    else:
+        def decode_struct(reader):
+            return factory(*[_decode(reader) for _ in fields])
+
+    _encoders[cls] = encode_struct
+    _decoders[tag] = decode_struct
+
+
+def register_enum(cls, enum_id):
+    """Registers an Enum class whose members have int values."""
+    if enum_id in _enums:
+        raise ValueError(f"Enum id {enum_id} is already registered")
+    _enums[enum_id] = cls
+    _enum_ids[cls] = enum_id
+    _encoders[cls] = _encode_enum
+
+
+def _encode(obj, buf):
+    """Appends the encoding of obj to buf."""
+    encoder = _encoders.get(type(obj))
+    if encoder is None:
+        raise TypeError(f"Cannot encode object of type {type(obj)}")
+    encoder(obj, buf)
+
+
+def _decode(reader):
+    """Decodes the next object from reader."""
+    tag = reader.byte()
+    if tag >= SMALL_INT:
+        return tag - SMALL_INT
+    decoder = _decoders.get(tag)
+    if decoder is None:
+        raise ValueError(f"Unknown tag {tag} in binary message")
+    return decoder(reader)
+
+
+def _write_uvarint(n, buf):
+    while n > 0x7F:
+        buf.append((n & 0x7F) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+
+def _encode_none(obj, buf):
+    buf.append(NONE)
+
+
+def _encode_bool(obj, buf):
+    buf.append(TRUE if obj else FALSE)
+
+
+def _encode_int(obj, buf):
+    if 0 <= obj < SMALL_INT:
+        buf.append(SMALL_INT | obj)
+    else:
+        buf.append(INT)
+        # zigzag encoding keeps small negative numbers small
+        _write_uvarint(obj << 1 if obj >= 0 else ((-obj) << 1) - 1, buf)
+
+
+def _encode_float(obj, buf):
+    buf.append(FLOAT)
+    buf += _DOUBLE.pack(obj)
+
+
+def _encode_str(obj, buf):
+    data = obj.encode()
+    buf.append(STR)
+    _write_uvarint(len(data), buf)
+    buf += data
+
+
+def _encode_bytes(obj, buf):
+    buf.append(BYTES)
+    _write_uvarint(len(obj), buf)
+    buf += obj
+
+
+def _collection_encoder(tag):
+    def encode_collection(obj, buf):
+        buf.append(tag)
+        _write_uvarint(len(obj), buf)
+        for item in obj:
+            _encode(item, buf)
+    return encode_collection
+
+
+def _encode_dict(obj, buf):
+    buf.append(DICT)
+    _write_uvarint(len(obj), buf)
+    for k, v in obj.items():
+        _encode(k, buf)
+        _encode(v, buf)
+
+
+def _encode_enum(obj, buf):
+    buf.append(ENUM)
+    _write_uvarint(_enum_ids[type(obj)], buf)
+    _encode_int(obj.value, buf)
+
+
+def _decode_int(reader):
+    z = reader.uvarint()
+    return z >> 1 if not z & 1 else -((z + 1) >> 1)
+
+
+def _decode_float(reader):
+    return _DOUBLE.unpack(reader.raw(_DOUBLE.size))[0]
+
+
+def _decode_str(reader):
+    return reader.raw(reader.uvarint()).decode()
+
+
+def _decode_bytes(reader):
+    return reader.raw(reader.uvarint())
+
+
+def _decode_list(reader):
+    return [_decode(reader) for _ in range(reader.uvarint())]
+
+
+def _decode_tuple(reader):
+    return tuple(_decode_list(reader))
+
+
+def _decode_set(reader):
+    return set(_decode_list(reader))
+
+
+def _decode_frozenset(reader):
+    return frozenset(_decode_list(reader))
+
+
+def _decode_dict(reader):
+    dct = {}
+    for _ in range(reader.uvarint()):
+        k = _decode(reader)
+        dct[k] = _decode(reader)
+    return dct
+
+
+def _decode_enum(reader):
+    enum_id = reader.uvarint()
+    if enum_id not in _enums:
+        raise ValueError(f"Unknown enum id {enum_id} in binary message")
+    return _enums[enum_id](_decode(reader))
+
+
+_encoders.update({
+    type(None): _encode_none,
+    bool: _encode_bool,
+    int: _encode_int,
+    float: _encode_float,
+    str: _encode_str,
+    bytes: _encode_bytes,
+    list: _collection_encoder(LIST),
+    tuple: _collection_encoder(TUPLE),
+    set: _collection_encoder(SET),
+    frozenset: _collection_encoder(FROZENSET),
+    dict: _encode_dict
+})
+_decoders.update({
+    NONE: lambda reader: None,
+    TRUE: lambda reader: True,
+    FALSE: lambda reader: False,
+    INT: _decode_int,
+    FLOAT: _decode_float,
+    STR: _decode_str,
+    BYTES: _decode_bytes,
+    LIST: _decode_list,
+    TUPLE: _decode_tuple,
+    DICT: _decode_dict,
+    SET: _decode_set,
+    FROZENSET: _decode_frozenset,
+    ENUM: _decode_enum
+})
+
+register_enum(MessageType, 1)
+register_enum(ReplicationEnums, 2)
+register_enum(OperationEnums, 3)
+register_enum(PrimaryMonitoringEnums, 4)
+register_enum(ViewEstablishmentEnums, 5)
+
+register_struct(Operation, OPERATION, Operation.FIELDS,
+                lambda op_type, args: Operation(op_type, *args))
+register_struct(ClientRequest, CLIENT_REQUEST, ClientRequest.FIELDS,
+                lambda *fields: intern_client_request(ClientRequest(*fields)))
+register_struct(Request, REQUEST, Request.FIELDS, Request)
+register_struct(Checkpoint, CHECKPOINT, Checkpoint.FIELDS, Checkpoint)
+register_struct(ReplicaStructure, REPLICA_STRUCTURE,
+                ("id", "number_of_clients", "rep_state", "r_log",
+                 "pend_reqs", "req_q", "last_req", "seq_num", "con_flag",
+                 "view_changed", "prim", "checkpoint"))
@@ -4,3 +4,17 @@ import sys
 ZERO_MQ = "ZERO_MQ"
 MAXINT = sys.maxsize
 UDP = "UDP"
+
+# Wire codecs, selected with the WIRE_CODEC environment variable
+JSONPICKLE = "JSONPICKLE"
+BINARY = "BINARY"
+
+# ZeroMQ sender channels, selected with the ZMQ_CHANNEL environment variable
+REQ_REP = "REQ_REP"
+PIPELINED = "PIPELINED"
+# Default max number of unacked messages on a pipelined channel, can be
+# overridden with the ZMQ_WINDOW environment variable
+PIPELINE_WINDOW = 16
+# Seconds after which an unacked message on a pipelined channel is taken as
+# lost and its slot in the window is freed
+PIPELINE_ACK_TIMEOUT = 5
@@ -0,0 +1,37 @@
+"""Filter for state messages a node has already sent to a peer.
+
+The modules send their whole state to every peer each iteration. The
+filter keeps, per peer and kind of message, a key of the last state sent,
+such as a version counter or a digest of the encoded message. A state
+with the same key as the last one sent to a peer is only sent again once
+REFRESH_INTERVAL seconds have passed, while changed state is sent right
+away. The periodic refresh overwrites state lost or corrupted at the peer.
+"""
+
+# standard
+import time
+
+# local
+from modules.constants import REFRESH_INTERVAL
+
+
+class RefreshFilter:
+    """Decides whether state should be sent to a peer again."""
+
+    def __init__(self, interval: float = REFRESH_INTERVAL):
+        """Initializes the filter, with no state sent to any peer."""
+        self.interval = interval
+        self.sent = {}  # (node id, kind) -> (key, time sent)
+
+    def should_send(self, node_id, kind, key, now: float = None) -> bool:
+        """Returns True if state with key should be sent to node_id.
+
+        If so, the state is recorded as sent.
+        """
+        now = time.time() if now is None else now
+        last = self.sent.get((node_id, kind))
+        if (last is not None and last[0] == key and
+                now - last[1] < self.interval):
+            return False
+        self.sent[(node_id, kind)] = (key, now)
+        return True
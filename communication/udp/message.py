@@ -1,7 +1,7 @@
 """Models a message to be sent over the self-stabilizing communication link"""
 
-# standard
-import jsonpickle
+# local
+from communication import codec
 
 
 class Message:
@@ -20,11 +20,11 @@ class Message:
 
     def from_bytes(bytes):
         """Decodes bytes object to a Message instance"""
-        return jsonpickle.decode(bytes.decode())
+        return codec.decode(bytes)
 
     def to_bytes(self):
         """Encodes a Message instance to bytes"""
-        return jsonpickle.encode(self).encode()
+        return codec.encode(self)
 
     def get_sender_id(self):
         """Returns the sender_id of the message"""
@@ -41,3 +41,7 @@ class Message:
     def has_payload(self):
         """Returns True if payload is attached to the message"""
         return self.payload != {}
+
+
+codec.register_struct(Message, codec.UDP_MESSAGE,
+                      ("sender_id", "msg_counter", "payload"))
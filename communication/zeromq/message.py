@@ -1,7 +1,11 @@
 """Code related to modelling of messages to be sent over comm links."""
 from enum import Enum
+from hashlib import blake2b
 import jsonpickle
 
+# local
+from communication import codec
+
 
 class MessageEnum(Enum):
     """Enum representing a message type."""
@@ -41,5 +45,47 @@ class Message:
         return jsonpickle.encode(self)
 
     def as_bytes(self):
-        """Returns byte representation of JSON string."""
-        return str.encode(self.as_json())
+        """Returns byte representation using the configured wire codec."""
+        return codec.encode(self)
+
+
+class Payload:
+    """Models the serialized data of a message.
+
+    The data is encoded once when the payload is created, so the same
+    immutable bytes can be queued on several sender channels and later
+    changes to the original message do not affect what is sent.
+    """
+
+    def __init__(self, msg):
+        """Initializes the payload by encoding msg."""
+        self.msg_type = msg["type"]
+        self.data = codec.encode(msg)
+        self.digest = None
+        # a full replica structure, later deltas are based on it and must
+        # not replace it in a sender queue
+        data = msg.get("data")
+        self.full = isinstance(data, dict) and "own_replica_structure" in data
+
+    def get_msg_type(self):
+        """Returns the type of the encoded message."""
+        return self.msg_type
+
+    def get_data(self):
+        """Returns the encoded message."""
+        return self.data
+
+    def is_full(self) -> bool:
+        """Returns True if the message carries a full replica structure."""
+        return self.full
+
+    def get_digest(self):
+        """Returns a digest of the encoded message, computed once."""
+        if self.digest is None:
+            self.digest = blake2b(self.data, digest_size=16).digest()
+        return self.digest
+
+
+codec.register_enum(MessageEnum, 6)
+codec.register_struct(Message, codec.ZMQ_MESSAGE,
+                      ("type", "counter", "sender_id", "data"))
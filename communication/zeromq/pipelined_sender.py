@@ -0,0 +1,180 @@
+"""Asynchronous pipelined sender channel."""
+
+# standard
+import asyncio
+import logging
+import time
+from collections import deque
+import zmq
+
+# local
+from communication import codec
+from .message import Message, MessageEnum, Payload
+from .sender import Sender
+import modules.byzantine as byz
+from communication.constants import (ZERO_MQ, PIPELINE_WINDOW,
+                                     PIPELINE_ACK_TIMEOUT)
+
+# globals
+logger = logging.getLogger(__name__)
+
+
+class PipelinedSender(Sender):
+    """Models a pipelined sender channel for the zeromq/TCP protocol.
+
+    Instead of waiting for the ack of every message before sending the next
+    one as Sender does, up to window messages are sent without being acked
+    over a DEALER socket. The receiver acks messages in the order they were
+    sent, so every ack is still checked against the counter of the oldest
+    unacked message, which is self.counter as for Sender. Messages whose
+    acks are lost, garbled or late are dropped from the window, so its
+    slots are never lost (see handle_ack and expire_in_flight).
+    """
+
+    socket_type = zmq.DEALER
+
+    def __init__(self, id, node, on_message_sent=None,
+                 window=PIPELINE_WINDOW, ack_timeout=PIPELINE_ACK_TIMEOUT):
+        """Initializes the sender."""
+        super().__init__(id, node, on_message_sent)
+        self.window = window
+        self.ack_timeout = ack_timeout
+        self.next_counter = self.counter
+        # (counter, time sent, msg type, bytes) of messages not yet acked
+        self.in_flight = deque()
+        self.free_slots = None
+        # set from any thread when a message is queued, see next_msg
+        self.loop = None
+        self.queued = None
+
+    async def start(self):
+        """Main loop for the sender channel, sends and receives acks."""
+        self.free_slots = asyncio.Semaphore(self.window)
+        self.queued = asyncio.Event()
+        self.loop = asyncio.get_event_loop()
+        await asyncio.gather(self.send_loop(), self.ack_loop())
+
+    def add_msg_to_queue(self, msg):
+        """Adds the message to the queue and wakes up the send loop.
+
+        Messages are queued by the module threads, so the event of the
+        send loop is set through its event loop.
+        """
+        super().add_msg_to_queue(msg)
+        if self.loop is not None and not self.queued.is_set():
+            self.loop.call_soon_threadsafe(self.queued.set)
+
+    async def next_msg(self):
+        """Returns the next queued message, waiting until there is one."""
+        msg = self.get_msg_from_queue()
+        while msg is None:
+            self.queued.clear()
+            # a message queued before the event was cleared is taken here
+            msg = self.get_msg_from_queue()
+            if msg is None:
+                await self.queued.wait()
+                msg = self.get_msg_from_queue()
+        return msg
+
+    async def send_loop(self):
+        """Sends queued messages as long as the window is not full."""
+        while True:
+            await self.free_slots.acquire()
+            msg = await self.next_msg()
+
+            # wait if node is unresponsive before sending message
+            while byz.is_unresponsive():
+                await asyncio.sleep(0.1)
+            await self.send(msg)
+
+    async def ack_loop(self):
+        """Receives acks and frees up the window.
+
+        Waits at most ack_timeout seconds for an ack, so messages that are
+        never acked are expired even if no more acks arrive.
+        """
+        while True:
+            try:
+                frames = await asyncio.wait_for(self.socket.recv_multipart(),
+                                                self.ack_timeout)
+                freed = self.handle_ack(frames[-1])
+            except asyncio.TimeoutError:
+                freed = 0
+            freed += self.expire_in_flight()
+            for _ in range(freed):
+                self.free_slots.release()
+
+    async def send(self, payload: Payload):
+        """Sends a message without waiting for it to be acked.
+
+        As for Sender, the token and the already encoded payload are sent
+        as two frames, preceded by the empty delimiter frame a REQ socket
+        would add so the receiver handles both channels the same way.
+        """
+        counter = self.next_counter
+        header = Message(MessageEnum.SENDER_MESSAGE, counter,
+                         self.id).as_bytes()
+        data = payload.get_data()
+        self.in_flight.append((counter, time.time(), payload.get_msg_type(),
+                               len(header) + len(data)))
+        self.next_counter = (self.next_counter + 1) % self.cap
+        await self.socket.send_multipart([b"", header, data])
+
+    def handle_ack(self, reply_bytes) -> int:
+        """Checks the ack against the unacked messages.
+
+        Returns the number of messages no longer in flight, whose slots in
+        the window are free again. Acks arrive in the order the messages
+        were sent, so the acks of the messages sent before the acked one
+        were lost and these messages are dropped too. An ack that can not
+        be decoded is taken as the ack of the oldest message, and an ack of
+        a message not in flight, such as an expired one, is ignored.
+        """
+        try:
+            counter = codec.decode(reply_bytes).get_counter()
+        except Exception as e:
+            logger.error(f"error when decoding: {e}")
+            counter = self.counter
+        if all(c != counter for c, _, _, _ in self.in_flight):
+            logger.warning(f"ignoring ack {counter} of message not in " +
+                           f"flight to node {self.recv.id}")
+            return 0
+
+        freed = 0
+        while True:
+            c, sent_time, msg_type, size = self.in_flight.popleft()
+            freed += 1
+            if c == counter:
+                break
+            logger.warning(f"ack of message {c} to node {self.recv.id} " +
+                           "was lost")
+        # metric rtt time for sent and ACKed message
+        latency = time.time() - sent_time
+        if self.on_message_sent is not None:
+            metric_data = {"rec_id": self.recv.id,
+                           "rec_hostname": self.recv.hostname,
+                           "latency": latency,
+                           "bytes_size": size,
+                           "msg_type": ZERO_MQ}
+            self.on_message_sent({"type": msg_type}, metric_data)
+        self.counter = (counter + 1) % self.cap
+        return freed
+
+    def expire_in_flight(self, now: float = None) -> int:
+        """Drops the messages unacked for more than ack_timeout seconds.
+
+        Returns the number of messages dropped. Their acks are ignored if
+        they arrive later.
+        """
+        now = time.time() if now is None else now
+        freed = 0
+        while (self.in_flight and
+               now - self.in_flight[0][1] > self.ack_timeout):
+            c, _, _, _ = self.in_flight.popleft()
+            freed += 1
+            logger.warning(f"message {c} to node {self.recv.id} was not " +
+                           f"acked within {self.ack_timeout} s")
+        if freed:
+            self.counter = (self.in_flight[0][0] if self.in_flight
+                            else self.next_counter)
+        return freed
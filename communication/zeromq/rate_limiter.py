@@ -1,37 +1,78 @@
-"""Simple rate limiter that blocks until message queues are cleared."""
+"""Rate limiter pacing the module loops and blocking on full message queues.
+
+Senders signal the condition drained whenever their queue of FIFO messages
+is below the low watermark, so module threads blocked in throttle are woken
+up as soon as all queues have drained, without polling.
+"""
 
 # standard
-import asyncio
+from threading import Condition, local
 import os
+import time
 import logging
 
 # local
-from modules.constants import INTEGRATION_RUN_SLEEP, RUN_SLEEP, MAX_QUEUE_SIZE
+from modules.constants import (INTEGRATION_RUN_SLEEP, RUN_SLEEP,
+                               MAX_QUEUE_SIZE, QUEUE_LOW_WATERMARK)
 
 logger = logging.getLogger(__name__)
 resolver = None
+drained = Condition()
+# time the calling thread last returned from throttle
+pace = local()
 
 
-async def sleep():
-    """Sleeps if any of the sender messages queues are considered full."""
-    delay = 0
+def run_sleep():
+    """Returns the min time between two iterations of a module loop."""
     if os.getenv("INTEGRATION_TEST"):
-        delay = INTEGRATION_RUN_SLEEP
-    else:
-        delay = float(os.getenv("RUN_SLEEP", RUN_SLEEP))
-
-    while queues_are_full():
-        await asyncio.sleep(delay)
+        return INTEGRATION_RUN_SLEEP
+    return float(os.getenv("RUN_SLEEP", RUN_SLEEP))
 
 
 def queues_are_full():
-    """Returns True if at least on sender message queue is considered full."""
+    """Returns True if at least on sender message queue is considered full.
+
+    Only FIFO messages count, state messages replace older ones in the
+    queue so a slow link never holds more than one per message type.
+    """
     for s in resolver.senders.values():
-        if s.msg_queue.qsize() > MAX_QUEUE_SIZE:
+        if s.msg_queue.fifo_size() > MAX_QUEUE_SIZE:
             return True
     return False
 
 
-def throttle():
-    """Helper method that can be used to throttle based on message queues."""
-    asyncio.run(sleep())
+def queues_have_drained():
+    """Returns True if all sender message queues are below low watermark."""
+    for s in resolver.senders.values():
+        if s.msg_queue.fifo_size() > QUEUE_LOW_WATERMARK:
+            return False
+    return True
+
+
+def notify_drained(queue):
+    """Called by senders after taking a message from queue."""
+    if queue.fifo_size() <= QUEUE_LOW_WATERMARK:
+        with drained:
+            drained.notify_all()
+
+
+def throttle(paced=True):
+    """Blocks while message queues are full and paces the calling loop.
+
+    If a sender queue is full, blocks until all queues have drained below
+    the low watermark. Then, if paced, sleeps for what is left of the run
+    sleep interval since the last time the calling thread returned from
+    throttle.
+    """
+    if queues_are_full():
+        with drained:
+            drained.wait_for(queues_have_drained)
+    if not paced:
+        return
+
+    last = getattr(pace, "last", None)
+    now = time.time()
+    if last is not None and now - last < run_sleep():
+        time.sleep(run_sleep() - (now - last))
+        now = time.time()
+    pace.last = now
@@ -3,10 +3,10 @@
 # standard
 import logging
 import zmq
-import jsonpickle
 import time
 
 # local
+from communication import codec
 from .message import Message, MessageEnum
 
 # globals
@@ -28,8 +28,10 @@ class Receiver():
         self.resolver = resolver
         self.on_ack = on_ack
 
+        # a ROUTER socket serves both REQ senders and pipelined DEALER
+        # senders, replies are routed back using the sender identity frame
         self.context = zmq.Context()
-        self.socket = self.context.socket(zmq.REP)
+        self.socket = self.context.socket(zmq.ROUTER)
         self.socket.bind(f"tcp://*:{self.port}")
         logger.info(f"Receiver channel setup on port {self.port}")
 
@@ -38,19 +40,35 @@ class Receiver():
     def start(self):
         """Starts the zeromq server."""
         while True:
-            msg_bytes = self.socket.recv()
-            msg_json = msg_bytes.decode()
-            msg = jsonpickle.decode(msg_json)
-            self.resolver.dispatch_msg(msg.get_data())
+            frames = self.socket.recv_multipart()
+            received_at = time.time()
+            try:
+                # [identity, empty delimiter, header, payload]
+                identity, frames = frames[0], frames[2:]
+                msg = codec.decode(frames[0])
+                counter = msg.get_counter()
+            except Exception as e:
+                # without a counter there is nothing to ack, pipelined
+                # senders free the slot when the ack times out
+                logger.error(f"Dropping malformed msg: {e}")
+                continue
+            # ack before dispatching, the sender does not wait for modules
+            self.ack(identity, counter)
 
-            self.ack(msg.get_counter())
+            try:
+                # the payload is sent in a separate frame by the sender
+                data = codec.decode(frames[1]) if len(frames) > 1 else \
+                    msg.get_data()
+                self.resolver.dispatch_msg(data, received_at)
+            except Exception as e:
+                logger.error(f"Error when dispatching msg: {e}")
 
-    def ack(self, counter):
-        """Sends a message over the specified channel."""
+    def ack(self, identity, counter):
+        """Sends an ack for counter back to the sender with identity."""
         if self.msgs_received == 0:
             self.start_time = time.time()
         self.msgs_received += 1
         msg = Message(MessageEnum.RECEIVER_MESSAGE, counter, self.id)
         if self.on_ack is not None:
             self.on_ack()
-        self.socket.send(msg.as_bytes())
+        self.socket.send_multipart([identity, b"", msg.as_bytes()])
@@ -6,18 +6,27 @@ import logging
 import zmq
 import time
 import zmq.asyncio
-from queue import Queue
-import jsonpickle
 
 # local
-from metrics.messages import msgs_in_queue
-from .message import Message, MessageEnum
+from communication import codec
+from communication.coalescing_queue import CoalescingQueue
+from communication.zeromq import rate_limiter
+from metrics.messages import msgs_in_queue, msgs_coalesced
+from resolve.enums import MessageType
+from .message import Message, MessageEnum, Payload
 import modules.byzantine as byz
 from communication.constants import ZERO_MQ
 
 # globals
 logger = logging.getLogger(__name__)
 
+# message types carrying the latest state of a module, only the newest
+# queued message of each of these types is sent. Failure detector tokens
+# are heartbeats counted one by one (see update_beat), so they stay FIFO.
+STATE_MSG_TYPES = {MessageType.VIEW_ESTABLISHMENT_MESSAGE,
+                   MessageType.REPLICATION_MESSAGE,
+                   MessageType.PRIMARY_MONITORING_MESSAGE}
+
 
 class Sender():
     """Models a sender channel for the zeromq/TCP protocol.
@@ -26,6 +35,8 @@ class Sender():
     order to send messages.
     """
 
+    socket_type = zmq.REQ
+
     def __init__(self, id, node, on_message_sent=None):
         """Initializes the sender."""
         self.id = id
@@ -33,27 +44,45 @@ class Sender():
         self.on_message_sent = on_message_sent
 
         self.context = zmq.asyncio.Context()
-        self.socket = self.context.socket(zmq.REQ)
+        self.socket = self.context.socket(self.socket_type)
         self.socket.connect(f"tcp://{self.recv.hostname}:{self.recv.port}")
 
-        self.msg_queue = Queue()
+        self.msg_queue = CoalescingQueue()
         self.counter = 1
         self.cap = 2**31
 
     def add_msg_to_queue(self, msg):
-        """Adds the message to the FIFO queue for this sender channel."""
-        self.msg_queue.put(msg)
-        msgs_in_queue.labels(self.id, self.recv.id, self.recv.hostname).inc()
+        """Adds the message to the queue for this sender channel.
+
+        msg is either a message dict or an already encoded Payload. State
+        messages replace a queued message of the same type, other messages
+        are queued in FIFO order. Full replica structures are pinned, so
+        the periodic full snapshot is not replaced by a later delta.
+        """
+        if not isinstance(msg, Payload):
+            msg = Payload(msg)
+        msg_type = msg.get_msg_type()
+        key = msg_type if msg_type in STATE_MSG_TYPES else None
+        change = self.msg_queue.put(msg, key, msg.is_full())
+        if change > 0:
+            msgs_in_queue.labels(self.id, self.recv.id,
+                                 self.recv.hostname).inc()
+        else:
+            msgs_coalesced.labels(self.id, self.recv.id, msg_type).inc(
+                1 - change)
+            msgs_in_queue.labels(self.id, self.recv.id,
+                                 self.recv.hostname).inc(change)
 
     def get_msg_from_queue(self):
         """Gets the next message from the queue
 
         If there is no message, None will be returned. Non-blocking method.
         """
-        if self.msg_queue.empty():
-            return None
         msg = self.msg_queue.get()
+        if msg is None:
+            return None
         msgs_in_queue.labels(self.id, self.recv.id, self.recv.hostname).dec()
+        rate_limiter.notify_drained(self.msg_queue)
         return msg
 
     async def start(self):
@@ -72,16 +101,17 @@ class Sender():
                     raise ValueError("did not get same counter back")
                 self.counter += 1 % self.cap
 
-    async def send(self, data):
+    async def send(self, payload: Payload):
         """Sends a message over the specified channel.
 
-        Constructs a message consisting of the token and the payload and sends
-        it over the socket.
+        Constructs a message consisting of the token and sends it over the
+        socket together with the already encoded payload, as two frames.
         """
-        msg = Message(MessageEnum.SENDER_MESSAGE, self.counter, self.id, data)
+        msg = Message(MessageEnum.SENDER_MESSAGE, self.counter, self.id)
         sent_time = time.time()
-        msg_as_bytes = msg.as_bytes()
-        await self.socket.send(msg_as_bytes)
+        header = msg.as_bytes()
+        data = payload.get_data()
+        await self.socket.send_multipart([header, data])
 
         reply_bytes = await self.socket.recv()
         # metric rtt time for sent and ACKed message
@@ -91,14 +121,13 @@ class Sender():
             metric_data = {"rec_id": self.recv.id,
                            "rec_hostname": self.recv.hostname,
                            "latency": latency,
-                           "bytes_size": len(msg_as_bytes),
+                           "bytes_size": len(header) + len(data),
                            "msg_type": ZERO_MQ}
-            self.on_message_sent(data, metric_data)
+            self.on_message_sent({"type": payload.get_msg_type()},
+                                 metric_data)
 
         try:
-            reply_json = reply_bytes.decode()
-            reply = jsonpickle.decode(reply_json)
-            return reply
+            return codec.decode(reply_bytes)
         except Exception as e:
             logger.error(f"error when decoding: {e}")
             return None
@@ -11,6 +11,8 @@ from prometheus_client import start_http_server
 
 # local
 from communication.zeromq.sender import Sender
+from communication.zeromq.pipelined_sender import PipelinedSender
+from communication.constants import REQ_REP, PIPELINED, PIPELINE_WINDOW
 from communication.zeromq.receiver import Receiver
 from communication.udp.sender import Sender as FDSender
 from communication.udp.receiver import Receiver as FDReceiver
@@ -83,10 +85,16 @@ def setup_communication(resolver):
     t.start()
 
     # setup sender channel to other nodes
+    channel = os.getenv("ZMQ_CHANNEL", REQ_REP).upper()
+    window = int(os.getenv("ZMQ_WINDOW", PIPELINE_WINDOW))
     senders = {}
     for _, node in nodes.items():
         if id != node.id:
-            sender = Sender(id, node, resolver.on_message_sent)
+            if channel == PIPELINED:
+                sender = PipelinedSender(id, node, resolver.on_message_sent,
+                                         window)
+            else:
+                sender = Sender(id, node, resolver.on_message_sent)
             senders[node.id] = sender
     logger.info("All senders connected")
 
@@ -12,6 +12,11 @@ convergence_latency = Gauge("convergence_latency",
                             "Execution time of a view establishment",
                             ["node_id", "view"])
 
+time_to_suspicion = Gauge("time_to_suspicion",
+                          "Time from the last progress of the primary until \
+                          the failure detector suspects it",
+                          ["node_id", "view", "reason"])
+
 # dict to keep track of all client_requests and when they arrived in pending
 view_changes = {}
 
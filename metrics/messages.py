@@ -1,6 +1,9 @@
 """Metrics related to messages."""
 
-from prometheus_client import Counter, Gauge
+from prometheus_client import Counter, Gauge, Histogram
+
+# buckets in seconds for times from microseconds to seconds
+LOCK_TIME_BUCKETS = (.00001, .0001, .001, .01, .1, 1, 10)
 
 msgs_sent = Counter("msg_sent",
                     "Number of messages sent between nodes",
@@ -14,6 +17,16 @@ msgs_in_queue = Gauge("msgs_in_queue",
                       "The amount of messages waiting to be sent over channel",
                       ["node_id", "receiver_id", "receiver_hostname"])
 
+msgs_skipped = Counter("msgs_skipped",
+                       "State messages not sent since the node was sent the \
+                       same state less than REFRESH_INTERVAL ago",
+                       ["node_id", "receiver_id", "msg_type"])
+
+msgs_coalesced = Counter("msgs_coalesced",
+                         "Queued messages replaced by a newer message of \
+                         the same type before being sent",
+                         ["node_id", "receiver_id", "msg_type"])
+
 allow_service_rtt = Gauge("allow_service_rtt",
                           "Time taken from declining service to allowing",
                           ["node_id", "view_from"])
@@ -31,6 +44,24 @@ run_method_time = Gauge("run_method_time",
                         "Time taken to run the run-forever-loop",
                         ["node_id", "module"])
 
+run_method_cpu_time = Gauge("run_method_cpu_time",
+                            "CPU time of the last run of the \
+                            run-forever-loop",
+                            ["node_id", "module"])
+
+lock_wait_time = Histogram("lock_wait_time",
+                           "Time waited to acquire a lock",
+                           ["node_id", "lock"], buckets=LOCK_TIME_BUCKETS)
+
+lock_hold_time = Histogram("lock_hold_time",
+                           "Time a lock was held",
+                           ["node_id", "lock"], buckets=LOCK_TIME_BUCKETS)
+
+idle_iterations = Counter("idle_iterations",
+                          "Runs of the run-forever-loop started after the \
+                          max idle period without any change",
+                          ["node_id", "module"])
+
 msgs_during_exp = Gauge("msgs_during_exp",
                         "Number of messages sent during an experiment",
                         ["node_id", "exp_param", "view_est_msgs",
@@ -40,3 +71,18 @@ bytes_during_exp = Gauge("bytes_during_exp",
                          "Number of bytes sent during an experiment",
                          ["node_id", "exp_param", "view_est_bytes",
                           "rep_bytes", "prim_mon_bytes", "fd_bytes"])
+
+rep_gossip_msgs = Counter("rep_gossip_msgs",
+                          "Replication messages sent with a full replica \
+                          structure or a delta",
+                          ["node_id", "kind"])
+
+inbound_queue_size = Gauge("inbound_queue_size",
+                           "Received messages waiting to be delivered to \
+                           module",
+                           ["node_id", "module"])
+
+dispatch_wait_time = Gauge("dispatch_wait_time",
+                           "Time a received message waited before being \
+                           delivered to module",
+                           ["node_id", "module"])
@@ -17,6 +17,32 @@ START_TIME = "start_time"
 state_length = Counter("state_length",
                        "Length of the RSM state")
 
+checkpoint_length = Gauge("checkpoint_length",
+                          "Length of the sealed prefix of the RSM state",
+                          ["node_id"])
+
+live_state_length = Gauge("live_state_length",
+                          "Entries of the RSM state after the checkpoint",
+                          ["node_id"])
+
+batch_size = Gauge("batch_size",
+                   "Client requests in the last batch assigned by the primary",
+                   ["node_id"])
+
+batch_wait_time = Gauge("batch_wait_time",
+                        "Time the last batch assigned by the primary waited \
+                        to fill up",
+                        ["node_id"])
+
+batch_config = Gauge("batch_config",
+                     "Configured BATCH_SIZE and BATCH_TIMEOUT (ms)",
+                     ["node_id", "setting"])
+
+seq_num_window = Gauge("seq_num_window",
+                       "Sequence numbers the primary assigns ahead of the \
+                       last executed request",
+                       ["node_id"])
+
 client_req_exec_time = Gauge("client_req_exec_time",
                              "Execution time of client_request",
                              ["client_id", "timestamp", "state_length",
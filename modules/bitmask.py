@@ -0,0 +1,37 @@
+"""Sets of processor ids represented as int bitmasks.
+
+Bit k of a mask is set if processor k is in the set. Masks are ints, so
+they are immutable and shared without copies, intersections and unions
+are single bitwise operations, quorum checks count bits, and the wire
+codecs encode a mask as one int.
+"""
+
+
+def from_ids(ids) -> int:
+    """Returns the mask of the processor ids in ids."""
+    mask = 0
+    for k in ids:
+        mask |= 1 << k
+    return mask
+
+
+def to_ids(mask: int) -> list:
+    """Returns the sorted processor ids in mask."""
+    ids = []
+    k = 0
+    while mask:
+        if mask & 1:
+            ids.append(k)
+        mask >>= 1
+        k += 1
+    return ids
+
+
+def contains(mask: int, k) -> bool:
+    """Returns True if processor k is in mask, False for no valid id."""
+    return isinstance(k, int) and k >= 0 and bool(mask >> k & 1)
+
+
+def popcount(mask: int) -> int:
+    """Returns the number of processors in mask."""
+    return bin(mask).count("1")
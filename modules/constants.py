@@ -38,6 +38,39 @@ FD_TIMEOUT = 5
 MAXINT = sys.maxsize  # Sequence number limit
 SIGMA = 5  # Threshold for assigning sequence numbers
 MAX_QUEUE_SIZE = 10  # Max allowed amount of messages in send queue
+QUEUE_LOW_WATERMARK = 5  # Blocked modules resume when queues drain below
+# Send state that did not change since it was last sent to a node only
+# every REFRESH_INTERVAL seconds, opt out by setting env var SKIP_UNCHANGED
+# to 0
+SKIP_UNCHANGED = os.getenv("SKIP_UNCHANGED", "1") != "0"
+REFRESH_INTERVAL = float(os.getenv("REFRESH_INTERVAL", 1))
+# Send replica structure deltas instead of full structures, opt out by
+# setting env var DELTA_GOSSIP to 0
+DELTA_GOSSIP = os.getenv("DELTA_GOSSIP", "1") != "0"
+DELTA_HISTORY = 16  # Versions of own replica structure kept to build deltas
+FULL_SNAPSHOT_INTERVAL = 50  # Full replica structure every x msgs to a node
+SUPPORT_INDEX_REBUILD = 1000  # Rebuild request support index every x uses
+# Entries per sealed block of the state, checkpoints are taken at the end of
+# blocks agreed on by n - 2f replicas
+CHECKPOINT_INTERVAL = 100
+# Adapt the window of sequence numbers the primary assigns ahead between
+# number_of_clients and SIGMA * number_of_clients, opt out by setting env
+# var ADAPTIVE_WINDOW to 0
+ADAPTIVE_WINDOW = os.getenv("ADAPTIVE_WINDOW", "1") != "0"
+WINDOW_LATENCY_TOLERANCE = 2  # Shrink window when commits take x times base
+# Client requests the primary assigns a single sequence number, and the ms
+# it waits for a batch to fill up before assigning a smaller one. Set with
+# env vars BATCH_SIZE and BATCH_TIMEOUT, a BATCH_SIZE of 1 turns batching off
+BATCH_SIZE = max(1, int(os.getenv("BATCH_SIZE", 1)))
+BATCH_TIMEOUT = float(os.getenv("BATCH_TIMEOUT", 0))
+# Share one object between identical client requests received from different
+# nodes, opt out by setting env var INTERN_CLIENT_REQUESTS to 0
+INTERN_CLIENT_REQUESTS = os.getenv("INTERN_CLIENT_REQUESTS", "1") != "0"
+# Run the replication loop only when replica structures, client requests,
+# the view or the primary monitoring changed, or after REPLICATION_MAX_IDLE
+# seconds. Turned on by setting env var EVENT_DRIVEN_REPLICATION to 1
+EVENT_DRIVEN_REPLICATION = os.getenv("EVENT_DRIVEN_REPLICATION") == "1"
+REPLICATION_MAX_IDLE = float(os.getenv("REPLICATION_MAX_IDLE", 1))
 
 # Primary Monitoring
 V_STATUS = "v_status"
@@ -46,6 +79,10 @@ NEED_CHG_SET = "need_chg_set"
 BEAT_THRESHOLD = 50 if N <= 6 else 250  # Threshold for liveness, beat-variable
 CNT_THRESHOLD = 25 if N <= 6 else 125  # Threshold for progress, cnt-variable
 
+# Max seconds the failure detector waits for a token before checking whether
+# it has to send tokens to all nodes
+FD_TOKEN_WAIT = 0.1
+
 # Event driven FD module
 K_ADMISSIBILITY_THRESHOLD = 5
 EVENT_FD_WAIT = 0.1
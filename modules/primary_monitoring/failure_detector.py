@@ -8,13 +8,19 @@ import os
 
 # local
 from resolve.enums import Function, Module
-from modules.constants import (CNT_THRESHOLD, BEAT_THRESHOLD, VIEW_CHANGE)
+from modules.constants import (CNT_THRESHOLD, BEAT_THRESHOLD,
+                               FD_TOKEN_WAIT)
 from resolve.enums import MessageType
-from queue import Queue
+from modules.bitmask import contains
+from queue import Queue, Empty
 import conf.config as conf
 from communication.zeromq.rate_limiter import throttle
 import modules.byzantine as byz
 
+# metrics
+from metrics.messages import inbound_queue_size
+from metrics.convegence_latency import time_to_suspicion
+
 # globals
 logger = logging.getLogger(__name__)
 
@@ -34,10 +40,13 @@ class FailureDetectorModule:
         self.cnt = 0
         self.prim_susp = [False for i in range(n)]
         self.cur_check_req = []
-        self.fd_set = set()
+        # bitmask of the responsive processors, see modules/bitmask.py
+        self.fd_set = 0
         self.prim = -1
         self.msg_queue = Queue()
         self.was_unresponsive = False
+        # when the primary last made progress, see time_to_suspicion
+        self.prim_progress_at = time.time()
 
         # Injection of starting state for integration tests
         if os.getenv("INTEGRATION_TEST") or os.getenv("INJECT_START_STATE"):
@@ -69,13 +78,11 @@ class FailureDetectorModule:
                byz.get_byz_behavior() == byz.UNRESPONSIVE):
                 self.was_unresponsive = True
 
-            if self.msg_queue.empty():
-                time.sleep(0.1)
-            else:
-                msg = self.msg_queue.get()
-                processor_j = msg["sender"]
-                prim_susp_j = msg["data"]["prim_susp"]
+            tokens = self.get_tokens()
+            for processor_j, prim_susp_j in tokens.items():
                 self.upon_token_from_pj(processor_j, prim_susp_j)
+            # one reply per node, carrying prim_susp after all tokens
+            for processor_j in tokens:
                 self.send_msg(processor_j)
 
             if testing:
@@ -93,7 +100,29 @@ class FailureDetectorModule:
                         self.send_msg(node_j)
                 self.first_run = False
 
-            throttle()
+            # tokens are handled as they arrive
+            throttle(paced=False)
+
+    def get_tokens(self):
+        """Returns the tokens received, as {sender: prim_susp}.
+
+        Blocks for at most FD_TOKEN_WAIT seconds until a token arrives and
+        then takes all tokens in the queue. Only the newest token from each
+        node is kept.
+        """
+        tokens = {}
+        depth = 0
+        try:
+            msg = self.msg_queue.get(timeout=FD_TOKEN_WAIT)
+            while True:
+                depth += 1
+                tokens[msg["sender"]] = msg["data"]["prim_susp"]
+                msg = self.msg_queue.get_nowait()
+        except Empty:
+            pass
+        inbound_queue_size.labels(
+            self.id, Module.FAILURE_DETECTOR_MODULE).set(depth)
+        return tokens
 
     def upon_token_from_pj(self, processor_j: int, prim_susp_j):
         """Checks responsiveness and liveness of processor j."""
@@ -116,13 +145,18 @@ class FailureDetectorModule:
             if self.prim == self.id:
                 self.cnt = 0
             if(not self.prim_susp[self.id]):
-                beat_abv_thresh = self.prim not in self.fd_set
+                beat_abv_thresh = not contains(self.fd_set, self.prim)
                 cntr_abv_thresh = self.cnt > CNT_THRESHOLD
                 self.prim_susp[self.id] = beat_abv_thresh or cntr_abv_thresh
                 if beat_abv_thresh:
                     logger.debug("Suspecting unresponsive primary")
                 if cntr_abv_thresh:
                     logger.debug("Suspecting non-progressing primary")
+                if self.prim_susp[self.id]:
+                    time_to_suspicion.labels(
+                        self.id, self.prim,
+                        "beat" if beat_abv_thresh else "cnt").set(
+                            time.time() - self.prim_progress_at)
 
         elif not self.allow_service():
             self.reset()
@@ -135,6 +169,7 @@ class FailureDetectorModule:
         self.cnt = 0
         self.prim_susp = [False for i in range(self.number_of_nodes)]
         self.cur_check_req = []
+        self.prim_progress_at = time.time()
 
     # Interface functions
     def suspected(self):
@@ -162,19 +197,10 @@ class FailureDetectorModule:
                                          Function.GET_CURRENT_VIEW,
                                          processor_id)
 
-    def get_pend_reqs(self):
-        """Calls get_pend_reqs in Replication module"""
-        pend_reqs = deepcopy(self.resolver.execute(
-                        Module.REPLICATION_MODULE,
-                        Function.GET_PEND_REQS))
-        if pend_reqs == VIEW_CHANGE:
-            # There has been a view_change
-            # The replication module takes care to check the progress of the
-            # new primary
-            # Hence this module can "accept" the progress
-            return []
-        else:
-            return pend_reqs
+    def get_pend_snapshot(self):
+        """Calls get_pend_snapshot in Replication module"""
+        return self.resolver.execute(Module.REPLICATION_MODULE,
+                                     Function.GET_PEND_SNAPSHOT)
 
     def allow_service(self):
         """Calls allow_service in View Establishment module"""
@@ -191,19 +217,16 @@ class FailureDetectorModule:
 
         Line 15-19
         """
-        # Check progress
-        exist_progress = False
-        if len(self.cur_check_req) == 0:
-            exist_progress = True
-        else:
-            for req in self.cur_check_req:
-                if req not in self.get_pend_reqs():
-                    exist_progress = True
-                    break
+        # Check progress, some request in cur_check_req has left the pending
+        # requests
+        pend_reqs = self.get_pend_snapshot()
+        exist_progress = (len(self.cur_check_req) == 0 or
+                          not pend_reqs.issuperset(self.cur_check_req))
         # If there has been progress, reset the cnt
         if exist_progress:
             self.cnt = 0
-            self.cur_check_req = deepcopy(self.get_pend_reqs())
+            self.prim_progress_at = time.time()
+            self.cur_check_req = list(pend_reqs)
         # The primary has not made progress, increase our own counter
         else:
             self.cnt += 1
@@ -216,14 +239,14 @@ class FailureDetectorModule:
         self.beat[processor_j] = 0
         self.beat[self.id] = 0
 
-        new_fd_set = {processor_j, self.id}
+        fd_set = 1 << processor_j | 1 << self.id
         for other_processor in range(self.number_of_nodes):
             if other_processor == self.id or other_processor == processor_j:
                 continue
             self.beat[other_processor] += 1
             if self.beat[other_processor] < BEAT_THRESHOLD:
-                new_fd_set.add(other_processor)
-        self.fd_set = deepcopy(new_fd_set)
+                fd_set |= 1 << other_processor
+        self.fd_set = fd_set
 
     # Functions to send messages to other nodes
 
@@ -8,9 +8,11 @@ import logging
 # local
 from copy import deepcopy
 from modules.algorithm_module import AlgorithmModule
+from modules.bitmask import from_ids, to_ids, popcount
 from resolve.enums import Function, Module
 from modules.enums import PrimaryMonitoringEnums as enums
-from modules.constants import (V_STATUS, PRIM, NEED_CHANGE, NEED_CHG_SET)
+from modules.constants import (V_STATUS, PRIM, NEED_CHANGE, NEED_CHG_SET,
+                               EVENT_DRIVEN_REPLICATION)
 from resolve.enums import MessageType
 import conf.config as conf
 from communication.zeromq.rate_limiter import throttle
@@ -23,7 +25,8 @@ logger = logging.getLogger(__name__)
 # vcm = {v_status: {OK, NO_SERVICE or V_CHANGE},
 #       prim: current primary id,
 #       need_change: boolean,
-#       need_chg_set: set of processors that need change}
+#       need_chg_set: bitmask of processors that need change, see
+#                     modules/bitmask.py}
 
 
 class PrimaryMonitoringModule(AlgorithmModule):
@@ -39,11 +42,13 @@ class PrimaryMonitoringModule(AlgorithmModule):
         self.vcm = [{V_STATUS: enums.OK,
                     PRIM: -1,
                     NEED_CHANGE: False,
-                    NEED_CHG_SET: set()} for i in range(n)]
+                    NEED_CHG_SET: 0} for i in range(n)]
         self.self_stab = os.getenv("NON_SELF_STAB") is None
         # Metric gathering
         self.allow_service_denied = -1
         self.mock_prim = 0
+        # no_view_change last seen by the replication module
+        self.no_change = None
 
         # Injection of starting state for integration tests
         if os.getenv("INTEGRATION_TEST") or os.getenv("INJECT_START_STATE"):
@@ -62,7 +67,7 @@ class PrimaryMonitoringModule(AlgorithmModule):
                         self.vcm[self.id][NEED_CHANGE] = deepcopy(
                                                         data["need_change"])
                     if "need_chg_set" in data:
-                        self.vcm[self.id][NEED_CHG_SET] = deepcopy(
+                        self.vcm[self.id][NEED_CHG_SET] = from_ids(
                                                         data["need_chg_set"])
 
     def run(self, testing=False):
@@ -78,6 +83,8 @@ class PrimaryMonitoringModule(AlgorithmModule):
             self.lock.acquire()
             # Metric time
             start_time = time.time()
+            # apply the messages received since the last iteration
+            self.resolver.deliver_msgs(Module.PRIMARY_MONITORING_MODULE)
             if self.vcm[self.id][PRIM] != self.get_current_view(self.id):
                 self.clean_state()
 
@@ -146,6 +153,9 @@ class PrimaryMonitoringModule(AlgorithmModule):
                 if self.allow_service_denied == -1:
                     self.allow_service_denied = time.time()
 
+            if EVENT_DRIVEN_REPLICATION:
+                self.wake_replication()
+
             # Emit run time metric
             run_time = time.time() - start_time
             run_method_time.labels(self.id,
@@ -162,6 +172,13 @@ class PrimaryMonitoringModule(AlgorithmModule):
             throttle()
 
     # Help functions for run-method
+    def wake_replication(self):
+        """Wakes up the replication module if no_view_change changed."""
+        no_change = self.no_view_change()
+        if no_change != self.no_change:
+            self.no_change = no_change
+            self.resolver.wake(Module.REPLICATION_MODULE)
+
     def get_number_of_processors_in_no_service(self):
         """Returns the number of processors which is in NO_SERVICE."""
         processors = 0
@@ -173,14 +190,14 @@ class PrimaryMonitoringModule(AlgorithmModule):
 
     def update_need_chg_set(self):
         """Updates the set of processors which requires a change."""
-        processor_set = set()
+        view = self.get_current_view(self.id)
+        mask = 0
         for processor_id, processor_vcm in enumerate(self.vcm):
             if (processor_vcm[NEED_CHANGE] and
-                self.get_current_view(self.id) == self.get_current_view(
-                                                        processor_id)):
-                processor_set.add(processor_id)
+                    view == self.get_current_view(processor_id)):
+                mask |= 1 << processor_id
 
-        self.vcm[self.id][NEED_CHG_SET] = deepcopy(processor_set)
+        self.vcm[self.id][NEED_CHG_SET] = mask
 
     # Macros
     def clean_state(self):
@@ -195,37 +212,28 @@ class PrimaryMonitoringModule(AlgorithmModule):
         is size_processors and each memeber have an intersection of
         need_chg_set of at least 3f+1.
         """
-        prim_dct = {}
-
-        # Counting how many processors has the same primary
+        # masks of the processors with the same primary
+        prim_masks = {}
         for processor_id, vcm_tuple in enumerate(self.vcm):
-            if vcm_tuple[PRIM] not in prim_dct:
-                prim_dct[vcm_tuple[PRIM]] = {processor_id}
-            else:
-                prim_dct[vcm_tuple[PRIM]].add(processor_id)
-
-        # Get the set that satisify the condition of having equal or more
-        # processors than size_processors
-        # If there is no such set we will get an empty set
-        processor_set = set()
-        for k, v in prim_dct.items():
-            if len(v) >= size_processors:
-                processor_set = v
-            # Check the intersection of needChgSet
-            need_chg_set_intersection = set()
-            for processor_id in processor_set:
-                if len(need_chg_set_intersection) == 0:
-                    need_chg_set_intersection = self.vcm[
-                                                    processor_id][NEED_CHG_SET]
-                else:
-                    need_chg_set_intersection.intersection(
-                        self.vcm[processor_id][NEED_CHG_SET])
-
+            prim_masks[vcm_tuple[PRIM]] = (
+                prim_masks.get(vcm_tuple[PRIM], 0) | 1 << processor_id)
+
+        for mask in prim_masks.values():
+            if popcount(mask) < size_processors:
+                continue
+            # Check the intersection of needChgSet, which is the
+            # need_chg_set of the first processor in the set that has a
+            # non-empty one. The processors are taken in the order of a set
+            # of their ids, as when the sets were not bitmasks.
+            intersection = 0
+            for processor_id in set(to_ids(mask)):
+                if self.vcm[processor_id][NEED_CHG_SET]:
+                    intersection = self.vcm[processor_id][NEED_CHG_SET]
+                    break
             # Check if the intersection is large enough
-            if (len(need_chg_set_intersection) >=
+            if (popcount(intersection) >=
                     (self.number_of_nodes - 2 * self.number_of_byzantine)):
-
-                    return True
+                return True
         return False
 
     # Interface functions
@@ -250,7 +258,7 @@ class PrimaryMonitoringModule(AlgorithmModule):
         return ({V_STATUS: enums.OK,
                 PRIM: self.get_current_view(id),
                 NEED_CHANGE: False,
-                NEED_CHG_SET: set()}
+                NEED_CHG_SET: 0}
                 )
 
     # Functions to send messages to other nodes
@@ -265,10 +273,10 @@ class PrimaryMonitoringModule(AlgorithmModule):
             "type": MessageType.PRIMARY_MONITORING_MESSAGE,
             "sender": self.id,
             "data": {
-                    "vcm": deepcopy(self.vcm[self.id]),
+                    "vcm": self.vcm[self.id],
                         }
                 }
-        self.resolver.broadcast(msg)
+        self.resolver.broadcast(msg, skip_unchanged=True)
 
     def receive_msg(self, msg):
         """Method description.
@@ -277,8 +285,12 @@ class PrimaryMonitoringModule(AlgorithmModule):
         processor j
         """
         j = msg["sender"]
-        if j != self.id:
-            self.vcm[j] = deepcopy(msg["data"]["vcm"])
+        vcm = msg["data"]["vcm"]
+        if type(vcm[NEED_CHG_SET]) is not int or vcm[NEED_CHG_SET] < 0:
+            logger.info(f"Not a valid vcm from node {j}: {vcm}")
+        elif j != self.id:
+            # decoded from the message, no one else holds it
+            self.vcm[j] = vcm
 
     # Function to extract data
     def get_data(self):
@@ -289,5 +301,5 @@ class PrimaryMonitoringModule(AlgorithmModule):
             "v_status": deepcopy(vcm[V_STATUS].name),
             "prim": deepcopy(vcm[PRIM]),
             "need_change": deepcopy(vcm[NEED_CHANGE]),
-            "need_chg_set": deepcopy(vcm[NEED_CHG_SET])
+            "need_chg_set": to_ids(vcm[NEED_CHG_SET])
         }
@@ -0,0 +1,237 @@
+"""Delta synchronization of replica structures between nodes.
+
+Instead of sending its whole replica structure every round, a node keeps a
+version counter for its own structure and a short history of frozen
+snapshots of it, which share their entries with the structure. Every node
+acknowledges the version it has applied from each peer in its own
+replication messages, and a node then only sends each peer the
+fields that changed since the version that peer acknowledged. rep_state and
+r_log are sent as (drop, suffix) deltas, i.e. the number of entries removed
+from the front and the entries appended since that version. Entries of
+rep_state are only removed from the front when they are sealed into a
+checkpoint, which is sent along as a changed field.
+
+A full replica structure is sent whenever a peer has not acknowledged a
+version still in the history, and periodically to every peer, such that
+corrupted delta state on either side of a link is eventually overwritten.
+"""
+
+# standard
+from collections import OrderedDict
+from copy import copy
+import random
+import logging
+
+# local
+from modules.constants import FULL_SNAPSHOT_INTERVAL, DELTA_HISTORY
+from .models.replica_structure import ReplicaStructure
+
+# globals
+logger = logging.getLogger(__name__)
+
+# fields sent as (drop, suffix) deltas along with the max drop to look for,
+# the max drop of rep_state is the number of entries sealed since the base
+LIST_FIELDS = {"rep_state": 0, "r_log": None}
+# fields sent as a whole if changed
+VALUE_FIELDS = ("pend_reqs", "req_q", "last_req", "seq_num", "con_flag",
+                "view_changed", "prim", "checkpoint")
+FULL = "full"
+
+
+def list_delta(base, cur, max_drop=None):
+    """Returns (drop, suffix) such that base[drop:] + suffix == cur.
+
+    Drops up to max_drop entries (all if None) are considered before
+    falling back to replacing the entire list.
+    """
+    limit = len(base) if max_drop is None else min(max_drop, len(base))
+    for drop in range(limit + 1):
+        kept = len(base) - drop
+        if kept <= len(cur) and cur[:kept] == base[drop:]:
+            return (drop, cur[kept:])
+    return (len(base), list(cur))
+
+
+def apply_list_delta(base, delta):
+    """Applies a (drop, suffix) delta to base and returns the new list."""
+    drop, suffix = delta
+    return base[drop:] + list(suffix)
+
+
+class DeltaGossip:
+    """Keeps track of versions sent to and received from other nodes."""
+
+    def __init__(self, id, n):
+        """Initializes the delta gossip state."""
+        self.id = id
+        self.number_of_nodes = n
+
+        # random epoch to tell versions of different incarnations apart
+        self.epoch = random.getrandbits(32)
+        self.version = 0
+        self.history = OrderedDict()  # version -> frozen own structure
+        self.acked = {}  # node id -> version of ours the node has applied
+        self.sends_since_full = {}  # node id -> messages since full snapshot
+
+        # last structures received from each node, version -> structure,
+        # such that deltas sent before our latest ack arrived still apply
+        self.mirrors = {}
+        # versions we have applied from each node, sent to all nodes
+        self.acks = [None for i in range(n)]
+
+    def snapshot(self, rs: ReplicaStructure) -> ReplicaStructure:
+        """Returns a frozen snapshot of rs to send and compute deltas against.
+
+        The snapshot shares its entries with rs, only the lists and request
+        pairs owned by rs are copied.
+        """
+        snapshot = rs.clone()
+        snapshot.freeze()
+        return snapshot
+
+    def update_version(self, rs: ReplicaStructure) -> bool:
+        """Bumps the own version if rs changed since the last snapshot.
+
+        Returns True if it did.
+        """
+        snapshot = self.snapshot(rs)
+        if self.history and next(reversed(self.history.values())) == snapshot:
+            return False
+        self.version += 1
+        self.history[self.version] = snapshot
+        while len(self.history) > DELTA_HISTORY:
+            self.history.popitem(last=False)
+        return True
+
+    def outgoing(self, rs: ReplicaStructure, node_ids):
+        """Returns the data to send to each node as [(node_ids, data)].
+
+        Nodes that should get the same data are grouped together so the
+        data only has to be serialized once per group.
+        """
+        self.update_version(rs)
+        version = (self.epoch, self.version)
+        acks = list(self.acks)
+
+        groups = OrderedDict()
+        for j in node_ids:
+            base = self.acked.get(j)
+            sends = self.sends_since_full.get(j, 0) + 1
+            if (base is None or base[0] != self.epoch or
+                    base[1] not in self.history or
+                    sends >= FULL_SNAPSHOT_INTERVAL):
+                # sender queues do not replace a full structure with a
+                # later delta (see Payload.is_full), so it will be sent
+                key = FULL
+                sends = 0
+            else:
+                key = base[1]
+            self.sends_since_full[j] = sends
+            groups.setdefault(key, []).append(j)
+
+        res = []
+        for key, ids in groups.items():
+            if key == FULL:
+                data = {"own_replica_structure": self.history[self.version],
+                        "version": version}
+            else:
+                data = {"delta": self.delta(key, rs, version)}
+            data["acks"] = acks
+            res.append((ids, data))
+        return res
+
+    def delta(self, base_version, rs: ReplicaStructure, version):
+        """Returns the delta from own base_version to the current rs."""
+        base = self.history[base_version]
+        cur = self.history[self.version]
+        lists = {}
+        for f, max_drop in LIST_FIELDS.items():
+            if f == "rep_state":
+                max_drop = max(0, cur.get_checkpoint().length -
+                               base.get_checkpoint().length)
+            if getattr(base, f) != getattr(cur, f):
+                lists[f] = list_delta(getattr(base, f), getattr(cur, f),
+                                      max_drop)
+        fields = {f: getattr(cur, f) for f in VALUE_FIELDS
+                  if getattr(base, f) != getattr(cur, f)}
+        return {"base": (self.epoch, base_version), "version": version,
+                "lists": lists, "fields": fields}
+
+    def receive(self, j, data):
+        """Handles replication data from node j.
+
+        Returns the frozen replica structure of node j, or None if the data
+        could not be applied.
+        """
+        self.record_ack(j, data.get("acks"))
+
+        if "own_replica_structure" in data:
+            rs = data["own_replica_structure"]
+            if isinstance(rs, ReplicaStructure):
+                rs.freeze()
+            version = data.get("version")
+            # deltas j sent before it got our ack of this version are still
+            # based on older mirrors, which are evicted as usual
+            self.mirrors.setdefault(j, OrderedDict())
+            self.add_mirror(j, version, rs)
+            return rs
+
+        if "delta" in data:
+            delta = data["delta"]
+            mirror = self.mirrors.get(j, {}).get(delta.get("base"))
+            if mirror is None:
+                # keep acking the version we have, the sender will either
+                # send a delta based on it or a full replica structure
+                logger.debug(f"Ignoring delta from {j} with unknown base")
+                return None
+            try:
+                rs = self.apply_delta(mirror, delta)
+            except (KeyError, TypeError, ValueError) as e:
+                logger.error(f"Got invalid delta from node {j}: {e}")
+                return None
+            rs.freeze()
+            self.add_mirror(j, delta["version"], rs)
+            return rs
+        return None
+
+    def add_mirror(self, j, version, rs: ReplicaStructure):
+        """Stores rs as version of node j's structure and acks it."""
+        self.acks[j] = version
+        if version is None:
+            return
+        mirrors = self.mirrors[j]
+        mirrors[version] = rs
+        mirrors.move_to_end(version)
+        while len(mirrors) > DELTA_HISTORY:
+            mirrors.popitem(last=False)
+
+    def latest(self, j):
+        """Returns the last structure received from node j, if any."""
+        mirrors = self.mirrors.get(j)
+        if not mirrors:
+            return None
+        return next(reversed(mirrors.values()))
+
+    def apply_delta(self, mirror: ReplicaStructure, delta):
+        """Returns a new replica structure with delta applied on mirror."""
+        rs = copy(mirror)
+        for f, list_d in delta["lists"].items():
+            if f not in LIST_FIELDS:
+                raise ValueError(f"Field {f} can not be delta encoded")
+            setattr(rs, f, apply_list_delta(getattr(mirror, f), list_d))
+        if delta["lists"].get("rep_state", (0,))[0] == 0:
+            # rep_state of the mirror is a prefix of the new rep_state
+            rs.set_rep_state_digests(mirror.get_rep_state_digests())
+        for f, value in delta["fields"].items():
+            if f not in VALUE_FIELDS:
+                raise ValueError(f"Field {f} can not be delta encoded")
+            setattr(rs, f, value)
+        return rs
+
+    def record_ack(self, j, acks):
+        """Stores the version of ours that node j reports having applied."""
+        if (isinstance(acks, list) and len(acks) == self.number_of_nodes and
+                0 <= j < self.number_of_nodes):
+            ack = acks[self.id]
+            valid = isinstance(ack, tuple) and len(ack) == 2
+            self.acked[j] = ack if valid else None
@@ -0,0 +1,264 @@
+"""Stable checkpoints of replica states.
+
+A replica state is kept as a checkpoint, which identifies a sealed prefix
+of the state by its length and digest, and the live entries after it. Once
+n - 2f replicas agree on the digest of a prefix, the replication module
+seals it and drops its entries, so only the checkpoint and the live
+entries are stored and sent.
+
+Checkpoint digests are sent between nodes, so unlike the StateDigests they
+do not depend on hash(). They are a chain of BLAKE2 digests over the repr
+of blocks of CHECKPOINT_INTERVAL entries, and a checkpoint is only taken
+at the end of a block. Two states can then be compared at the longer of
+their checkpoints by sealing the blocks of the other state up to it.
+"""
+
+# standard
+from hashlib import blake2b
+
+# local
+from modules.constants import CHECKPOINT_INTERVAL
+from .state_digests import StateDigests
+from .value import Value
+
+
+class Checkpoint(Value):
+    """Identifies the sealed prefix of a state by (length, digest)."""
+
+    __slots__ = ("length", "digest")
+    FIELDS = __slots__
+
+    def __init__(self, length: int, digest: bytes):
+        """Initializes a checkpoint."""
+        self.init_fields(length, digest)
+
+    def hash_key(self):
+        """Returns the values the hash is computed from."""
+        return (self.length, self.digest)
+
+    def __eq__(self, other):
+        """Overrides the default implementation."""
+        if other is self:
+            return True
+        if type(other) is type(self):
+            return (self.length == other.length and
+                    self.digest == other.digest)
+        return False
+
+    # defining __eq__ resets __hash__
+    __hash__ = Value.__hash__
+
+    def __str__(self):
+        """Overrides the default implementation."""
+        return f"Checkpoint - length: {self.length}, digest: " + \
+            f"{self.digest.hex()}"
+
+    def to_dct(self):
+        """Converts a checkpoint to a corresponding dictionary."""
+        return {"length": self.length, "digest": self.digest.hex()}
+
+    def seal(self, entries) -> "Checkpoint":
+        """Returns the checkpoint of this prefix extended by entries."""
+        block = repr(list(entries)).encode()
+        digest = blake2b(self.digest + block, digest_size=16).digest()
+        return Checkpoint(self.length + len(entries), digest)
+
+
+# checkpoint of the empty prefix
+GENESIS = Checkpoint(0, b"")
+
+
+def block_checkpoints(checkpoint: Checkpoint, entries, checkpoints=None):
+    """Returns the checkpoints of the full blocks of a state.
+
+    The first checkpoint is checkpoint itself, the following ones seal a
+    block of CHECKPOINT_INTERVAL entries each. checkpoints, if given, are
+    the checkpoints of a prefix of entries and are extended in place.
+    """
+    if not checkpoints or checkpoints[0] != checkpoint:
+        checkpoints = [checkpoint]
+    blocks = len(entries) // CHECKPOINT_INTERVAL
+    while len(checkpoints) <= blocks:
+        start = (len(checkpoints) - 1) * CHECKPOINT_INTERVAL
+        checkpoints.append(checkpoints[-1].seal(
+            entries[start:start + CHECKPOINT_INTERVAL]))
+    return checkpoints
+
+
+class State:
+    """A replica state: a checkpoint and the live entries after it.
+
+    digests are the StateDigests of the entries, if known. The block
+    checkpoints of the state (see block_checkpoints) are computed when
+    needed, by calling source if given. A state with the GENESIS checkpoint
+    equals the list of its entries.
+    """
+
+    __slots__ = ("checkpoint", "entries", "digests", "source",
+                 "_checkpoints")
+
+    def __init__(self, entries, checkpoint: Checkpoint = GENESIS,
+                 digests: StateDigests = None, source=None):
+        """Initializes a state."""
+        self.checkpoint = checkpoint
+        self.entries = entries
+        self.digests = digests
+        self.source = source
+        self._checkpoints = None
+
+    def __len__(self):
+        """Returns the length of the whole state, sealed prefix included."""
+        return self.checkpoint.length + len(self.entries)
+
+    def __eq__(self, other):
+        """Returns True if other is the same state."""
+        if isinstance(other, State):
+            return (self.checkpoint == other.checkpoint and
+                    self.entries == other.entries)
+        if isinstance(other, list):
+            return self.checkpoint == GENESIS and self.entries == other
+        return False
+
+    def __ne__(self, other):
+        """Overrides the default implementation."""
+        return not self.__eq__(other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        """Overrides the default implementation."""
+        return f"State({self.entries!r}, {self.checkpoint})"
+
+    def checkpoints(self):
+        """Returns the block checkpoints of the state."""
+        if self._checkpoints is None:
+            if self.source is not None:
+                self._checkpoints = self.source()
+            else:
+                self._checkpoints = block_checkpoints(self.checkpoint,
+                                                      self.entries)
+        return self._checkpoints
+
+    def checkpoint_at(self, length: int):
+        """Returns the checkpoint of the prefix with length, if known.
+
+        Only the own checkpoint and the ends of full blocks after it are
+        known, None is returned for other lengths.
+        """
+        offset = length - self.checkpoint.length
+        if offset == 0:
+            return self.checkpoint
+        if (offset < 0 or offset > len(self.entries) or
+                offset % CHECKPOINT_INTERVAL):
+            return None
+        return self.checkpoints()[offset // CHECKPOINT_INTERVAL]
+
+    def truncated(self, length: int):
+        """Returns the prefix of the state with length.
+
+        Returns None if the prefix ends within the sealed prefix.
+        """
+        if length == 0:
+            return State([])
+        count = length - self.checkpoint.length
+        if count < 0:
+            return None
+        digests = None
+        if self.digests is not None:
+            digests = StateDigests(self.digests.digests, count)
+        return State(self.entries[:count], self.checkpoint, digests)
+
+
+def as_state(state, digests: StateDigests = None) -> State:
+    """Returns state as a State, a list is a state without checkpoint."""
+    if isinstance(state, State):
+        return state
+    return State(state, GENESIS, digests)
+
+
+def align(a: State, b: State):
+    """Returns the offsets of the entries of a and b at the same position.
+
+    Both states are compared at the longer of their checkpoints, returns
+    None if their prefixes up to it differ or are not known.
+    """
+    length = max(a.checkpoint.length, b.checkpoint.length)
+    at_a = a.checkpoint_at(length)
+    if at_a is None or at_a != b.checkpoint_at(length):
+        return None
+    return (length - a.checkpoint.length, length - b.checkpoint.length)
+
+
+def segments_differ(a: State, start_a: int, b: State, start_b: int,
+                    count: int) -> bool:
+    """Returns True if the digests of the segments of a and b differ.
+
+    False if the digests of either state are not known.
+    """
+    return (a.digests is not None and b.digests is not None and
+            a.digests.segment(start_a, start_a + count) !=
+            b.digests.segment(start_b, start_b + count))
+
+
+def segments_equal(a: State, start_a: int, b: State, start_b: int,
+                   count: int) -> bool:
+    """Returns True if count entries of a and b from the starts are equal.
+
+    Segments are ruled out by their digests, if known, and equal digests
+    are confirmed by comparing the entries (see state_digests).
+    """
+    if segments_differ(a, start_a, b, start_b, count):
+        return False
+    return (a.entries[start_a:start_a + count] ==
+            b.entries[start_b:start_b + count])
+
+
+def is_prefix_of(a: State, b: State) -> bool:
+    """Returns True if a is a prefix of b.
+
+    States that are prefixes of each other but can not be compared since
+    one ends within the sealed prefix of the other are not prefixes.
+    """
+    if len(a) > len(b):
+        return False
+    if len(a) == 0:
+        return True
+    offsets = align(a, b)
+    if offsets is None:
+        return False
+    start_a, start_b = offsets
+    return segments_equal(a, start_a, b, start_b,
+                          len(a.entries) - start_a)
+
+
+def common_prefix_length(a: State, b: State):
+    """Returns the length of the common prefix of a and b.
+
+    Returns None if it is not known, since it ends within the sealed
+    prefix of one of the states.
+    """
+    if len(a) == 0 or len(b) == 0:
+        return 0
+    offsets = align(a, b)
+    if offsets is None:
+        return None
+    start_a, start_b = offsets
+    high = min(len(a.entries) - start_a, len(b.entries) - start_b)
+    if a.digests is not None and b.digests is not None:
+        # the length found by the digests is an upper bound, exact if the
+        # entries up to it are equal
+        low = 0
+        while low < high:
+            mid = (low + high + 1) // 2
+            if segments_differ(a, start_a, b, start_b, mid):
+                high = mid - 1
+            else:
+                low = mid
+        high = low
+    low = 0
+    if segments_equal(a, start_a, b, start_b, high):
+        low = high
+    else:
+        while a.entries[start_a + low] == b.entries[start_b + low]:
+            low += 1
+    return max(a.checkpoint.length, b.checkpoint.length) + low
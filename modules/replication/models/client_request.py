@@ -5,19 +5,36 @@ where t is a totally-ordered timestamp (local to c) and o is the
 requested operation.
 """
 
+# standard
+from weakref import WeakValueDictionary
+
 # local
 from .operation import Operation
+from .value import Value
+from modules.constants import INTERN_CLIENT_REQUESTS
 from modules.enums import OperationEnums
 
+# globals
+# (client_id, timestamp, operation) -> the client request in use
+_interned = WeakValueDictionary()
+
+
+class ClientRequest(Value):
+    """Models a request as used in the Replication module.
 
-class ClientRequest(object):
-    """Models a request as used in the Replication module."""
+    Client requests are immutable.
+    """
+
+    __slots__ = ("client_id", "timestamp", "operation", "__weakref__")
+    FIELDS = ("client_id", "timestamp", "operation")
 
     def __init__(self, client_id, timestamp, operation: Operation):
         """Initializes a client request with the required data."""
-        self.client_id = client_id
-        self.timestamp = timestamp
-        self.operation = operation
+        self.init_fields(client_id, timestamp, operation)
+
+    def hash_key(self):
+        """Returns the values the hash is computed from."""
+        return (self.client_id, self.timestamp)
 
     def get_client_id(self):
         """Returns the ID of the client that sent the reuest."""
@@ -44,21 +61,37 @@ class ClientRequest(object):
 
     def __eq__(self, other):
         """Overrides the default implementation"""
+        if other is self:
+            return True
         if type(other) is type(self):
-            return (self.client_id == other.get_client_id() and
-                    self.timestamp == other.get_timestamp() and
-                    self.operation == other.get_operation())
+            return (self._hash == other._hash and
+                    self.client_id == other.client_id and
+                    self.timestamp == other.timestamp and
+                    self.operation == other.operation)
         return False
 
-    def __ne__(self, other):
-        """Overrides the default implementation."""
-        return not self.__eq__(other)
-
-    def __hash__(self):
-        """Overrides the default implementation"""
-        return hash((self.client_id, self.timestamp))
+    # defining __eq__ resets __hash__
+    __hash__ = Value.__hash__
 
     def to_dct(self):
         """Converts a client request to a corresponding dictionary."""
         return {"client_id": self.client_id, "timestamp": self.timestamp,
                 "operation": self.operation.to_dct()}
+
+
+def intern_client_request(client_request: ClientRequest) -> ClientRequest:
+    """Returns the client request in use that equals client_request.
+
+    Identical client requests received from different nodes then share one
+    object, which saves memory and makes comparing them an identity check.
+    Requests are interned as long as they are in use, and not at all if
+    INTERN_CLIENT_REQUESTS is off or the request is unhashable.
+    """
+    if not INTERN_CLIENT_REQUESTS:
+        return client_request
+    try:
+        key = (client_request.client_id, client_request.timestamp,
+               client_request.operation)
+        return _interned.setdefault(key, client_request)
+    except TypeError:
+        return client_request
@@ -5,15 +5,19 @@ from typing import List
 
 # local
 from modules.enums import OperationEnums
+from .value import Value
 
 
-class Operation(object):
+class Operation(Value):
     """Models operations that can be performed on the state
 
     Operations should be specified along with a list of arguments by clients
-    when sending requests to BFTList.
+    when sending requests to BFTList. Operations are immutable.
     """
 
+    __slots__ = ("op_type", "args")
+    FIELDS = __slots__
+
     def __init__(self, op_type: OperationEnums, *args):
         """Initializes an operation."""
         if type(op_type) == str:
@@ -23,8 +27,11 @@ class Operation(object):
                 raise ValueError(f"op_type {op_type} is not valid")
         if type(op_type) != OperationEnums:
             raise ValueError(f"op_type {op_type} is not a OperationEnum")
-        self.op_type = op_type
-        self.args = args
+        self.init_fields(op_type, args)
+
+    def hash_key(self):
+        """Returns the values the hash is computed from."""
+        return (self.op_type, self.args)
 
     def get_type(self):
         """Returns the type of operation to execute."""
@@ -50,11 +57,17 @@ class Operation(object):
 
     def __eq__(self, other):
         """Overrides the default implementation"""
+        if other is self:
+            return True
         if type(other) is type(self):
-            return (self.get_type() == other.get_type() and
+            return (self._hash == other._hash and
+                    self.op_type == other.op_type and
                     self.args == other.args)
         return False
 
+    # defining __eq__ resets __hash__
+    __hash__ = Value.__hash__
+
     def to_dct(self):
         """Converts an operation to a corresponding dictionary."""
         return {"type": self.op_type.name, "args": list(self.args)}
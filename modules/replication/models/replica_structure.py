@@ -5,37 +5,83 @@ rLog, (pending req. queue) pendReqs, (requests under process queue) reqQ,
 (last per client executed request) lastReq, (last assigned sq. num.) seqn,
 (conflict flag) conFlag⟩, where repState is the replica’s state
 (the replicate) which is an ordered sequence log.
+
+The state is kept as a checkpoint of its sealed prefix and the entries
+after it, rep_state (see checkpoint).
+
+Replica structures share their contents instead of copying them, following
+these ownership rules:
+- Requests, client requests, operations, rep_state entries, r_log entries
+  and last_req entries are never changed once created, so they are shared
+  freely between structures.
+- A structure owns its lists and its req_q pairs, whose status sets are
+  changed in place. Setters therefore copy the lists they are given, and
+  the req_q pairs, but not the entries.
+- Structures received from other nodes are frozen. They are shared with
+  the delta gossip and must not be changed, a changed version is made from
+  a copy (copy.copy), which is not frozen.
 """
 
 # standard
 from typing import List, Dict
-from copy import deepcopy
+from copy import copy
 import logging
 
 # local
-from modules.constants import (REQUEST, REPLY, STATUS, X_SET, SIGMA)
+from modules.constants import (REQUEST, REPLY, STATUS, X_SET, SIGMA,
+                               CHECKPOINT_INTERVAL)
 from .request import Request, ClientRequest
+from .state_digests import StateDigests
+from .checkpoint import Checkpoint, State, GENESIS, block_checkpoints
+from .request_index import RequestIndex, request_of
 from metrics.state import client_req_added_to_pending
 
 logger = logging.getLogger(__name__)
 
 
+def own_req_pair(req_pair: Dict) -> Dict:
+    """Returns a copy of req_pair with its own status set."""
+    req_pair = dict(req_pair)
+    if STATUS in req_pair:
+        req_pair[STATUS] = set(req_pair[STATUS])
+    return req_pair
+
+
 class ReplicaStructure(object):
     """Models a replica structure as used in the Replication module."""
 
+    # digests of rep_state (see state_digests), and the rep_state list they
+    # were computed for, cached per structure and never sent to other nodes
+    _digests = None
+    _digests_of = None
+    # indexes of req_q, r_log and pend_reqs (see request_index), rebuilt
+    # when they do not cover the current lists
+    _req_q_index = None
+    _r_log_index = None
+    _pend_reqs_index = None
+    # True for structures received from other nodes, see freeze
+    _frozen = False
+    # block checkpoints of the state and the rep_state they are of
+    _checkpoints = None
+    _checkpoints_of = None
+    # default for structures decoded from nodes without checkpoints
+    checkpoint = GENESIS
+
     def __init__(self, id, number_of_clients=6, rep_state=[], r_log=[],
                  pend_reqs=[], req_q=[], last_req=[],
-                 seq_num=-1, con_flag=False, view_changed=False, prim=0):
+                 seq_num=-1, con_flag=False, view_changed=False, prim=0,
+                 checkpoint=GENESIS):
         """Initializes a replica structure with its default state."""
         self.id = id
-        self.rep_state = deepcopy(rep_state)
-        self.r_log = deepcopy(r_log)
-        self.pend_reqs = deepcopy(pend_reqs)
-        self.req_q = deepcopy(req_q)
+        self.checkpoint = checkpoint
+        self.rep_state = list(rep_state)
+        self.r_log = list(r_log)
+        self.pend_reqs = list(pend_reqs)
+        self.req_q = [own_req_pair(x) for x in req_q]
         if last_req == []:
             self.last_req = [-1 for i in range(number_of_clients)]
         else:
-            self.last_req = deepcopy(last_req)
+            self.last_req = copy(last_req)
         self.seq_num = seq_num
         self.con_flag = con_flag
         self.view_changed = view_changed
@@ -44,27 +90,142 @@ class ReplicaStructure(object):
 
     def set_replica_structure(self, rs):
         """Setting some of the replica structure to the input rs."""
-        self.rep_state = deepcopy(rs.get_rep_state())
-        self.r_log = deepcopy(rs.get_r_log())
-        self.pend_reqs = deepcopy(rs.get_pend_reqs())
-        self.req_q = deepcopy(rs.get_req_q())
-        self.last_req = deepcopy(rs.get_last_req())
-        self.seq_num = deepcopy(rs.get_seq_num())
+        self.set_state(rs.get_state())
+        self.set_r_log(rs.get_r_log())
+        self.set_pend_reqs(rs.get_pend_reqs())
+        self.set_req_q(rs.get_req_q())
+        self.last_req = copy(rs.get_last_req())
+        self.seq_num = rs.get_seq_num()
         self.con_flag = False
         self.view_changed = False
-        self.prim = deepcopy(rs.get_prim())
+        self.prim = rs.get_prim()
+
+    def clone(self):
+        """Returns a copy of this structure sharing no lists with it."""
+        rs = ReplicaStructure(self.id, self.number_of_clients)
+        rs.set_replica_structure(self)
+        rs.con_flag = self.con_flag
+        rs.view_changed = self.view_changed
+        return rs
+
+    def freeze(self):
+        """Marks this structure as shared, such that it can not be changed.
+
+        Changing a frozen structure raises a ValueError.
+        """
+        self._frozen = True
+
+    def is_frozen(self) -> bool:
+        """Returns True if this structure is frozen."""
+        return self._frozen
+
+    def check_mutable(self):
+        """Raises a ValueError if this structure is frozen."""
+        if self._frozen:
+            raise ValueError(f"Replica structure {self.id} is frozen")
 
     def get_id(self) -> int:
         """Returns the id associated with this processor."""
         return self.id
 
     def get_rep_state(self):
-        """Returns the state reported by this processor."""
+        """Returns the state reported by this processor after checkpoint."""
         return self.rep_state
 
-    def set_rep_state(self, rep_state):
-        """Returns the state reported by this processor."""
-        self.rep_state = deepcopy(rep_state)
+    def set_rep_state(self, rep_state, digests: StateDigests = None):
+        """Sets the state reported by this processor after checkpoint.
+
+        digests are the digests of rep_state or of a prefix of it, if known.
+        """
+        self.check_mutable()
+        self.rep_state = list(rep_state)
+        self.set_rep_state_digests(digests)
+
+    def get_rep_state_digests(self) -> StateDigests:
+        """Returns the digests of rep_state, or None if not hashable.
+
+        Digests are computed once and then extended with entries appended
+        to rep_state, either in place or by setting rep_state along with
+        the digests of its prefix. Entries are never changed in place.
+        Extending builds new digests, so frozen structures can be read by
+        the receiver thread and the replication loop at once.
+        """
+        digests = self._digests
+        if (self._digests_of is not self.rep_state or digests is None or
+                len(digests) > len(self.rep_state)):
+            digests = StateDigests.of(self.rep_state)
+        elif len(digests) < len(self.rep_state):
+            digests = digests.extend(self.rep_state[len(digests):])
+        self._digests = digests
+        self._digests_of = self.rep_state
+        return digests
+
+    def get_checkpoint(self) -> Checkpoint:
+        """Returns the checkpoint of the sealed prefix of the state."""
+        return self.checkpoint
+
+    def state_length(self) -> int:
+        """Returns the length of the state, sealed prefix included."""
+        return self.checkpoint.length + len(self.rep_state)
+
+    def get_state(self) -> State:
+        """Returns the state, i.e. the checkpoint and rep_state."""
+        return State(self.rep_state, self.checkpoint,
+                     self.get_rep_state_digests(), self.get_checkpoints)
+
+    def set_state(self, state):
+        """Sets the checkpoint and rep_state to those of state.
+
+        state is a State or a list, a state without checkpoint.
+        """
+        if not isinstance(state, State):
+            state = State(state)
+        self.check_mutable()
+        self.checkpoint = state.checkpoint
+        self.set_rep_state(state.entries, state.digests)
+
+    def get_checkpoints(self):
+        """Returns the block checkpoints of the state.
+
+        They are computed once and extended with entries appended to
+        rep_state in place, see block_checkpoints.
+        """
+        checkpoints = self._checkpoints
+        if self._checkpoints_of is not self.rep_state:
+            checkpoints = None
+        checkpoints = block_checkpoints(self.checkpoint, self.rep_state,
+                                        checkpoints)
+        self._checkpoints = checkpoints
+        self._checkpoints_of = self.rep_state
+        return checkpoints
+
+    def seal(self, checkpoint: Checkpoint):
+        """Seals the prefix of the state up to checkpoint.
+
+        checkpoint must be one of the block checkpoints of the state. The
+        entries before it are dropped from rep_state.
+        """
+        self.check_mutable()
+        checkpoints = self.get_checkpoints()
+        drop = checkpoint.length - self.checkpoint.length
+        if (drop <= 0 or drop > len(self.rep_state) or
+                checkpoints[drop // CHECKPOINT_INTERVAL] != checkpoint):
+            raise ValueError(f"{checkpoint} is not a checkpoint of the state")
+        self.checkpoint = checkpoint
+        self.rep_state = self.rep_state[drop:]
+        self._digests = None
+        self._digests_of = None
+        self._checkpoints = checkpoints[drop // CHECKPOINT_INTERVAL:]
+        self._checkpoints_of = self.rep_state
+
+    def set_rep_state_digests(self, digests: StateDigests):
+        """Sets the digests of rep_state or of a prefix of it."""
+        if digests is not None and len(digests) <= len(self.rep_state):
+            self._digests = digests
+            self._digests_of = self.rep_state
+        else:
+            self._digests = None
+            self._digests_of = None
 
     def get_r_log(self) -> List[Dict]:
         """Returns the request execution log
@@ -81,19 +242,23 @@ class ReplicaStructure(object):
         { REQUEST: req, STATUS: set(st) : st ∈ ⟨PRE−PREP, PREP, COMMIT⟩},
         where req is of type Request
         """
+        self.check_mutable()
         self.validate_log_entry(req_pair)
+        index = self.r_log_index()
         self.r_log.append(req_pair)
+        index.added(req_pair)
 
         while len(self.r_log) > 3 * SIGMA * self.number_of_clients:
             # We have reached or max length, remove the olderst req
-            req_with_lowest_seq_num = None
-            for req_pair in self.r_log:
-                if (req_with_lowest_seq_num is None or
-                   req_pair[REQUEST].get_seq_num() <
-                        req_with_lowest_seq_num[REQUEST].get_seq_num()):
-                    req_with_lowest_seq_num = req_pair
-            self.r_log = [x for x in self.r_log if x !=
-                          req_with_lowest_seq_num]
+            lowest = index.lowest()
+            if lowest is None:
+                lowest = self.r_log[0][REQUEST]
+            # remove the first entry of the request and its duplicates
+            positions = self.positions(self.r_log, lowest, index) or [0]
+            entry = self.r_log[positions[0]]
+            self.remove_positions(
+                self.r_log, [i for i in positions if self.r_log[i] == entry],
+                index)
 
     def set_r_log(self, r_log: List):
         """Sets the r_log for this processor.
@@ -101,14 +266,12 @@ class ReplicaStructure(object):
         NOTE that no validation of r_log is done, this is mainly used for
         testing purposes.
         """
-        self.r_log = deepcopy(r_log)
+        self.check_mutable()
+        self.r_log = list(r_log)
 
     def exist_in_r_log(self, req: Request):
         """Returns true if request exist in r_log."""
-        for applied_req in self.r_log:
-            if applied_req[REQUEST] == req:
-                return True
-        return False
+        return req in self.r_log_index()
 
     def get_pend_reqs(self) -> List[ClientRequest]:
         """Returns the requests received from clients, all ClientRequests
@@ -120,24 +283,31 @@ class ReplicaStructure(object):
 
     def extend_pend_reqs(self, req: [ClientRequest]):
         """Adds a list of ClientRequests to pend_reqs."""
+        self.check_mutable()
+        index = self.pend_reqs_index()
         for r in req:
-            if r not in self.pend_reqs:
-                self.pend_reqs.append(deepcopy(r))
+            if r not in index:
+                self.pend_reqs.append(r)
+                index.added(r)
                 # notify state metric that client request added to pend_reqs
                 client_req_added_to_pending(r, len(self.pend_reqs))
 
         while len(self.pend_reqs) > SIGMA * self.number_of_clients:
             # We have reached or max length, remove the olderst req
-            self.pend_reqs.pop(0)
+            index.removed(self.pend_reqs.pop(0))
 
     def remove_from_pend_reqs(self, req: ClientRequest):
         """Removes the first occurrence of req from pend_reqs."""
-        if req in self.pend_reqs:
+        self.check_mutable()
+        index = self.pend_reqs_index()
+        if req in index:
             self.pend_reqs.remove(req)
+            index.removed(req)
 
     def set_pend_reqs(self, pend_reqs: List[ClientRequest]):
         """Sets the pend_reqs for this processor."""
-        self.pend_reqs = deepcopy(pend_reqs)
+        self.check_mutable()
+        self.pend_reqs = list(pend_reqs)
 
     def set_req_q(self, req_q: List[Dict]):
         """Sets the req_q for this processor.
@@ -145,7 +315,8 @@ class ReplicaStructure(object):
         NOTE that no validation is done on the performed req_q. This is mainly
         used for testing purposes.
         """
-        self.req_q = deepcopy(req_q)
+        self.check_mutable()
+        self.req_q = [own_req_pair(x) for x in req_q]
 
     def get_req_q(self) -> List[Dict]:
         """Returns the requests that are in process along with their status."""
@@ -153,30 +324,89 @@ class ReplicaStructure(object):
 
     def add_to_req_q(self, req_pair: Dict):
         """Adds a request pair to the req_q."""
+        self.check_mutable()
         self.validate_req_pair(req_pair)
-        if not self.req_already_exist(req_pair[REQUEST]):
-            self.req_q.append(deepcopy(req_pair))
+        index = self.req_q_index()
+        if req_pair[REQUEST] not in index:
+            req_pair = own_req_pair(req_pair)
+            self.req_q.append(req_pair)
+            index.added(req_pair)
 
         while len(self.req_q) > SIGMA * self.number_of_clients:
             # We have reached or max length, remove the olderst req
-            req_with_lowest_seq_num = None
-            for req_pair in self.req_q:
-                if (req_with_lowest_seq_num is None or
-                   req_pair[REQUEST].get_seq_num() <
-                        req_with_lowest_seq_num[REQUEST].get_seq_num()):
-                    req_with_lowest_seq_num = req_pair
-            self.remove_from_req_q(req_with_lowest_seq_num[REQUEST])
+            lowest = index.lowest()
+            if lowest is None:
+                lowest = self.req_q[0][REQUEST]
+            self.remove_from_req_q(lowest)
 
     def req_already_exist(self, req: Request):
         """Checks if the request exist in req_q."""
-        for req_pair in self.req_q:
-            if req_pair[REQUEST] == req:
-                return True
-        return False
+        return req in self.req_q_index()
 
     def remove_from_req_q(self, req):
         """Removes all occurrences of req from req_q."""
-        self.req_q = [x for x in self.req_q if x[REQUEST] != req]
+        self.check_mutable()
+        index = self.req_q_index()
+        if req in index:
+            self.remove_positions(self.req_q,
+                                  self.positions(self.req_q, req, index),
+                                  index)
+
+    def renew_req(self, req_pair: Dict, view: int, seq_num: int):
+        """Assigns a new view and sequence number to a request in req_q.
+
+        The request is replaced since requests are shared with other
+        structures.
+        """
+        self.check_mutable()
+        index = self.req_q_index()
+        index.removed(req_pair)
+        req_pair[REQUEST] = Request(req_pair[REQUEST].get_client_request(),
+                                    view, seq_num,
+                                    req_pair[REQUEST].get_batch())
+        index.added(req_pair)
+
+    def req_q_index(self) -> RequestIndex:
+        """Returns the index of req_q, built if it does not cover req_q."""
+        if self._req_q_index is None or \
+                not self._req_q_index.covers(self.req_q):
+            self._req_q_index = RequestIndex(self.req_q, request_of, True)
+        return self._req_q_index
+
+    def r_log_index(self) -> RequestIndex:
+        """Returns the index of r_log, built if it does not cover r_log."""
+        if self._r_log_index is None or \
+                not self._r_log_index.covers(self.r_log):
+            self._r_log_index = RequestIndex(self.r_log, request_of, True)
+        return self._r_log_index
+
+    def pend_reqs_index(self) -> RequestIndex:
+        """Returns the index of pend_reqs, built if it does not cover it."""
+        if self._pend_reqs_index is None or \
+                not self._pend_reqs_index.covers(self.pend_reqs):
+            self._pend_reqs_index = RequestIndex(self.pend_reqs)
+        return self._pend_reqs_index
+
+    def positions(self, entries: List[Dict], req, index: RequestIndex):
+        """Returns the positions of the entries with req in entries.
+
+        Stops at the last entry with req, which is usually close to the
+        front for the request with the lowest sequence number.
+        """
+        positions = []
+        count = index.count(req)
+        for i, entry in enumerate(entries):
+            if entry[REQUEST] == req:
+                positions.append(i)
+                if len(positions) == count:
+                    break
+        return positions
+
+    def remove_positions(self, entries: List, positions: List[int],
+                         index: RequestIndex):
+        """Removes the entries at positions, in increasing order."""
+        for i in reversed(positions):
+            index.removed(entries.pop(i))
 
     def get_last_req(self) -> List:
         """Returns a list of the last executed requests for each client
@@ -190,17 +420,16 @@ class ReplicaStructure(object):
         """Update the last executed request for client with client_id."""
         # print(f"Setting last_req to {client_id}, {request} {reply}")
         # self.last_req[int(client_id)] = {
-        #     REQUEST: deepcopy(request), REPLY: deepcopy(reply)
+        #     REQUEST: request, REPLY: reply
         # }
+        self.check_mutable()
         # Account for dynamic size of client set
         try:
             self.last_req[client_id] = {REQUEST: request, REPLY: reply}
         except IndexError:
             for i in range(len(self.last_req), client_id + 1):
                 self.last_req.append(None)
-            self.last_req[client_id] = {
-                REQUEST: deepcopy(request), REPLY: deepcopy(reply)
-            }
+            self.last_req[client_id] = {REQUEST: request, REPLY: reply}
 
     def get_seq_num(self) -> int:
         """Returns the last assigned sequence number for this processor."""
@@ -208,10 +437,12 @@ class ReplicaStructure(object):
 
     def inc_seq_num(self):
         """Increments the sequence number by 1 for this processor."""
+        self.check_mutable()
         self.seq_num += 1
 
     def set_seq_num(self, seq_num: int):
         """Sets the sequence number for this processor."""
+        self.check_mutable()
         self.seq_num = seq_num
 
     def get_con_flag(self) -> bool:
@@ -220,6 +451,7 @@ class ReplicaStructure(object):
 
     def set_con_flag(self, con_flag: bool):
         """Updates the con_flag value of this processor."""
+        self.check_mutable()
         self.con_flag = con_flag
 
     def get_view_changed(self) -> bool:
@@ -228,6 +460,7 @@ class ReplicaStructure(object):
 
     def set_view_changed(self, view_changed: bool):
         """Update view_changed of this processor."""
+        self.check_mutable()
         self.view_changed = view_changed
 
     def get_prim(self) -> int:
@@ -236,16 +469,17 @@ class ReplicaStructure(object):
 
     def set_prim(self, prim: int):
         """Update what node this processor considers to be the primary."""
+        self.check_mutable()
         self.prim = prim
 
     def is_def_prefix(self) -> bool:
         """Returns True if data used for prefix finding is set to default."""
-        return (self.rep_state == [] and self.r_log == [] and
+        return (self.is_rep_state_default() and self.r_log == [] and
                 self.pend_reqs == [] and self.req_q == [])
 
     def is_def_state(self) -> bool:
         """Returns True if all processor data is set to default."""
-        return (self.rep_state == [] and self.r_log == [] and
+        return (self.is_rep_state_default() and self.r_log == [] and
                 self.pend_reqs == [] and self.req_q == [] and
                 self.last_req == {} and self.seq_num == 0 and
                 self.con_flag is False and self.view_changed is False and
@@ -253,14 +487,17 @@ class ReplicaStructure(object):
 
     def is_rep_state_default(self) -> bool:
         """Returns True if the processors state is set to default."""
-        return self.rep_state == []
+        return self.rep_state == [] and self.checkpoint == GENESIS
 
     def reset_state(self):
         """Resets the entire replica_structure to its default."""
+        self.check_mutable()
         self.__init__(self.id)
 
     def set_to_tee(self):
         """Sets the entire replica structure to TEE."""
+        self.check_mutable()
+        self.checkpoint = GENESIS
         self.rep_state = []
         self.r_log = []
         self.pend_reqs = []
@@ -276,7 +513,7 @@ class ReplicaStructure(object):
 
         This means that the current state of this replica is the default.
         """
-        return (self.rep_state == [] and self.r_log == [] and
+        return (self.is_rep_state_default() and self.r_log == [] and
                 self.pend_reqs == [] and self.req_q == [] and
                 self.last_req == {} and self.seq_num == -1 and
                 self.con_flag is False and self.view_changed is False and
@@ -310,10 +547,20 @@ class ReplicaStructure(object):
         if type(req) != Request or type(x_set) != set:
             raise ValueError(f"Illegal values in log_entry dict")
 
+    def __getstate__(self):
+        """Leaves cached digests and indexes out of copies and JSON."""
+        return {k: v for k, v in self.__dict__.items()
+                if not k.startswith("_")}
+
+    def __setstate__(self, state):
+        """Restores the state returned by __getstate__."""
+        self.__dict__.update(state)
+
     def __eq__(self, other):
         """Overrides the default implementation."""
         if type(other) == type(self):
-            return (self.rep_state == other.get_rep_state() and
+            return (self.checkpoint == other.get_checkpoint() and
+                    self.rep_state == other.get_rep_state() and
                     self.r_log == other.get_r_log() and
                     self.pend_reqs == other.get_pend_reqs() and
                     self.req_q == other.get_req_q() and
@@ -325,7 +572,8 @@ class ReplicaStructure(object):
 
     def __str__(self):
         """Override default __str__."""
-        return f"ReplicaStructure: id: {self.id}, rep_state:" + \
+        return f"ReplicaStructure: id: {self.id}, checkpoint: " + \
+               f"{self.checkpoint}, rep_state:" + \
                f" {self.rep_state}, r_log: {self.r_log}, pend_reqs: " + \
                f"{self.pend_reqs}, req_q: {self.req_q}, last_req: " + \
                f"{self.last_req}, seq_num: {self.seq_num}, con_flag: " + \
@@ -1,68 +1,82 @@
 """Request class and helpers.
 
 An assigned request takes the form req = ⟨(request) q, (view) v,
-(seq. num.) sq⟩.
+(seq. num.) sq⟩. A primary batching client requests assigns the sequence
+number to q and the client requests in batch, which are executed together.
 """
 
 # local
 from .client_request import ClientRequest
+from .value import Value
 
 
-class Request(object):
-    """Models a request as used in the Replication module."""
+class Request(Value):
+    """Models a request as used in the Replication module.
 
-    def __init__(self, client_request: ClientRequest, view: int, seq_num: int):
+    Requests are immutable, a request with a new view and sequence number
+    is a new request.
+    """
+
+    __slots__ = ("client_request", "view", "seq_num", "batch")
+    FIELDS = __slots__
+
+    def __init__(self, client_request: ClientRequest, view: int, seq_num: int,
+                 batch=()):
         """Initializes a request object."""
-        if type(client_request) != ClientRequest:
+        batch = tuple(batch)
+        if any(type(c) != ClientRequest for c in (client_request,) + batch):
             raise ValueError("Arg client_request must be a ClientRequest")
-        self.client_request = client_request
-        self.view = view
-        self.seq_num = seq_num
+        self.init_fields(client_request, view, seq_num, batch)
+
+    def hash_key(self):
+        """Returns the values the hash is computed from."""
+        return (self.client_request.client_id, self.view, self.seq_num)
 
     def get_client_request(self) -> ClientRequest:
         """Returns the client request associated with this request."""
         return self.client_request
 
+    def get_batch(self) -> tuple:
+        """Returns the client requests batched with the client request."""
+        return self.batch
+
+    def get_client_requests(self) -> tuple:
+        """Returns all client requests of this request, in execution order."""
+        return (self.client_request,) + self.batch
+
     def get_view(self) -> int:
         """Returns the view associated with this request."""
         return self.view
 
-    def set_view(self, view: int):
-        """Updates the view of this request."""
-        self.view = view
-
     def get_seq_num(self) -> int:
         """Returns the sequence number associated with this request."""
         return self.seq_num
 
-    def set_seq_num(self, seq_num: int):
-        """Returns the sequence number associated with this request."""
-        self.seq_num = seq_num
-
     def __eq__(self, other):
         """Overrides the default implementation."""
-        if type(other) == type(self):
-            return (self.client_request == other.get_client_request() and
-                    self.view == other.get_view() and
-                    self.seq_num == other.get_seq_num())
+        if other is self:
+            return True
+        if type(other) is type(self):
+            return (self._hash == other._hash and
+                    self.seq_num == other.seq_num and
+                    self.view == other.view and
+                    self.client_request == other.client_request and
+                    self.batch == other.batch)
         return False
 
-    def __ne__(self, other):
-        """Overrides the default implementation."""
-        return not self.__eq__(other)
+    # defining __eq__ resets __hash__
+    __hash__ = Value.__hash__
 
     def __str__(self):
         """Overrides the default implementation."""
-        return (f"Request - client_request: {str(self.client_request)}, " +
+        text = (f"Request - client_request: {str(self.client_request)}, " +
                 f"view: {self.view}, seq_num: {self.seq_num}")
-
-    def __hash__(self):
-        """Overrides the default implementation"""
-        return hash((self.client_request.get_client_id(),
-                    self.view,
-                    self.seq_num))
+        if self.batch:
+            text += f", batch: {list(map(str, self.batch))}"
+        return text
 
     def to_dct(self):
         """Converts a request to a corresponding dictionary."""
         return {"client_request": self.client_request.to_dct(),
-                "view": self.view, "seq_num": self.seq_num}
+                "view": self.view, "seq_num": self.seq_num,
+                "batch": [c.to_dct() for c in self.batch]}
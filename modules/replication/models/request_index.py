@@ -0,0 +1,136 @@
+"""Index of the requests in a list of a replica structure.
+
+The lists of a replica structure (req_q, r_log and pend_reqs) are kept as
+plain lists, since they are returned by the getters and sent to other
+nodes as they are. An index counts the entries of one such list per
+request and, for lists of requests with sequence numbers, keeps a heap of
+the requests by sequence number. Membership checks and finding the request
+with the lowest sequence number then do not scan the list.
+"""
+
+# standard
+from collections import deque
+import heapq
+
+# local
+from modules.constants import REQUEST
+
+
+def request_of(entry):
+    """Returns the request of a request pair or log entry."""
+    return entry[REQUEST]
+
+
+def entry_of(entry):
+    """Returns the entry itself, used for lists of client requests."""
+    return entry
+
+
+class RequestIndex:
+    """Counts the entries of a list per request.
+
+    The index covers the list as long as entries are only added to and
+    removed from it along with calls to added and removed.
+    """
+
+    def __init__(self, entries, key=entry_of, ordered=False):
+        """Builds the index of entries.
+
+        key returns the request of an entry. If ordered, the requests are
+        also kept in a heap by sequence number.
+        """
+        self.entries = entries
+        self.key = key
+        self.ordered = ordered
+        self.counts = {}
+        self.size = 0
+        # entries in the order added, as (seq_num, order, request) in a
+        # heap, and the orders of the entries of each request
+        self.heap = []
+        self.pushed = 0
+        self.orders = {}
+        self.order_of = {}  # id of entry -> order
+        for entry in entries:
+            self.added(entry)
+
+    def covers(self, entries) -> bool:
+        """Returns True if the index is up to date with entries."""
+        return entries is self.entries and len(entries) == self.size
+
+    def added(self, entry):
+        """Updates the index with an entry added to the list."""
+        self.size += 1
+        try:
+            req = self.key(entry)
+            self.counts[req] = self.counts.get(req, 0) + 1
+            seq_num = req.get_seq_num() if self.ordered else None
+        except (KeyError, TypeError, AttributeError):
+            # invalid entries are not indexed, they equal no request
+            return
+        if self.ordered:
+            self.pushed += 1
+            self.order_of[id(entry)] = self.pushed
+            self.orders.setdefault(req, deque()).append(self.pushed)
+            if isinstance(seq_num, int):
+                heapq.heappush(self.heap, (seq_num, self.pushed, req))
+            if len(self.heap) > 2 * self.size + 16:
+                self.compact()
+
+    def removed(self, entry):
+        """Updates the index with an entry removed from the list."""
+        self.size -= 1
+        try:
+            req = self.key(entry)
+            count = self.counts.get(req, 0) - 1
+        except (KeyError, TypeError):
+            return
+        if count > 0:
+            self.counts[req] = count
+        else:
+            self.counts.pop(req, None)
+        order = self.order_of.pop(id(entry), None)
+        orders = self.orders.get(req)
+        if order is not None and orders is not None and order in orders:
+            orders.remove(order)
+            if not orders:
+                del self.orders[req]
+
+    def count(self, req) -> int:
+        """Returns the number of entries with req."""
+        try:
+            return self.counts.get(req, 0)
+        except TypeError:
+            return 0
+
+    def __contains__(self, req):
+        """Returns True if an entry has req."""
+        return self.count(req) > 0
+
+    def lowest(self):
+        """Returns the request with the lowest sequence number, or None.
+
+        Of requests with the same sequence number, the one of the entry
+        added first is returned.
+        """
+        while self.heap:
+            if self.valid(self.heap[0]):
+                return self.heap[0][2]
+            heapq.heappop(self.heap)
+        return None
+
+    def valid(self, item) -> bool:
+        """Returns True if a heap item is of the first entry of a request.
+
+        Items of removed entries, of later entries of the same request and
+        of requests whose sequence number has changed are not valid.
+        """
+        seq_num, order, req = item
+        orders = self.orders.get(req)
+        return (orders is not None and orders[0] == order and
+                req.get_seq_num() == seq_num)
+
+    def compact(self):
+        """Drops the heap items of entries no longer in the list."""
+        self.heap = [item for item in self.heap
+                     if item[1] in self.orders.get(item[2], ())]
+        heapq.heapify(self.heap)
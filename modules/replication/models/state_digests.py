@@ -0,0 +1,119 @@
+"""Rolling prefix digests of replica states.
+
+The digest of a state [x_1, ..., x_k] is the polynomial hash
+(h(x_1) * B^(k-1) + ... + h(x_k)) mod P, where h is consistent with == and
+the base B is drawn at random by every process. The digests of all
+prefixes of a state are kept, so two states can be ruled out as prefixes
+with a single comparison and the digest of any segment of a state can be
+computed in O(log k).
+
+Different digests mean different states, but equal digests do not mean
+equal states: hash() is not collision resistant, e.g. hash(2) equals
+hash(2 + P), and a Byzantine node can choose the entries it sends. Equal
+digests must always be confirmed by comparing the entries.
+
+Digests are only compared within a process and are never sent to other
+nodes.
+"""
+
+# standard
+import random
+
+# the Mersenne prime 2^61 - 1, also the modulus of hash() for numbers
+MODULUS = (1 << 61) - 1
+BASE = random.randrange(1 << 32, MODULUS - 1)
+
+
+def item_digest(item):
+    """Returns the digest of a single state entry.
+
+    Raises TypeError if the entry is not hashable.
+    """
+    h = hash(item)
+    if h == -2 and item == -1:
+        # hash() maps -1 to -2 since -1 is an error code in CPython
+        h = -1
+    return h % MODULUS
+
+
+def roll(digest, items):
+    """Returns the digest of a state with digest extended by items."""
+    for item in items:
+        digest = (digest * BASE + item_digest(item)) % MODULUS
+    return digest
+
+
+class StateDigests:
+    """The digests of all prefixes of a state.
+
+    digests[k] is the digest of state[:k]. The list of digests is never
+    changed once built, so it can be used by the receiver thread and the
+    replication loop at the same time. Extending the digests builds a new
+    list, and entries past length + 1 belong to states extending the state.
+    """
+
+    __slots__ = ("digests", "length")
+
+    def __init__(self, digests=None, length=0):
+        """Initializes the digests of the empty state."""
+        self.digests = [0] if digests is None else digests
+        self.length = length
+
+    @classmethod
+    def of(cls, state):
+        """Returns the digests of state, or None if it is not hashable."""
+        return cls().extend(state)
+
+    def extend(self, items):
+        """Returns the digests of the state extended with items.
+
+        The digests are copied, the list of these digests is left as it is.
+        Returns None if an item is not hashable.
+        """
+        digests = self.digests[:self.length + 1]
+        digest = digests[-1]
+        try:
+            for item in items:
+                digest = (digest * BASE + item_digest(item)) % MODULUS
+                digests.append(digest)
+        except TypeError:
+            return None
+        return StateDigests(digests, len(digests) - 1)
+
+    def __len__(self):
+        """Returns the length of the state."""
+        return self.length
+
+    def digest(self, length=None):
+        """Returns the digest of the prefix with length, default all."""
+        if length is None:
+            length = self.length
+        return self.digests[length]
+
+    def segment(self, start, end):
+        """Returns the digest of state[start:end]."""
+        return (self.digests[end] - self.digests[start] *
+                pow(BASE, end - start, MODULUS)) % MODULUS
+
+    def is_prefix_of(self, other) -> bool:
+        """Returns True if the state may be a prefix of the state of other.
+
+        False is certain, True must be confirmed by comparing the entries.
+        """
+        return (self.length <= other.length and
+                self.digests[self.length] == other.digests[self.length])
+
+    def common_prefix_length(self, other) -> int:
+        """Returns an upper bound of the common prefix length of the states.
+
+        The bound is the length, unless digests of different prefixes are
+        equal, so it must be confirmed by comparing the entries.
+        """
+        low, high = 0, min(self.length, other.length)
+        while low < high:
+            mid = (low + high + 1) // 2
+            if self.digests[mid] == other.digests[mid]:
+                low = mid
+            else:
+                high = mid - 1
+        return low
@@ -0,0 +1,69 @@
+"""Base class of the immutable request model objects.
+
+Operations, client requests and requests are shared between replica
+structures, modules and decoded messages, so they are never changed once
+created. They keep their fields in slots and compute their hash once.
+"""
+
+
+def cached_hash(key):
+    """Returns hash(key), or None if key is unhashable."""
+    try:
+        return hash(key)
+    except TypeError:
+        return None
+
+
+class Value(object):
+    """Immutable value with the fields FIELDS and a cached hash.
+
+    Subclasses set their fields with init_fields and define hash_key.
+    """
+
+    __slots__ = ("_hash",)
+    FIELDS = ()
+
+    def init_fields(self, *values):
+        """Sets the fields to values and caches the hash."""
+        for field, value in zip(self.FIELDS, values):
+            object.__setattr__(self, field, value)
+        object.__setattr__(self, "_hash", cached_hash(self.hash_key()))
+
+    def hash_key(self):
+        """Returns the values the hash is computed from."""
+        raise NotImplementedError
+
+    def __setattr__(self, name, value):
+        """Raises an AttributeError, values are immutable."""
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        """Raises an AttributeError, values are immutable."""
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __hash__(self):
+        """Returns the cached hash."""
+        if self._hash is None:
+            # raises the TypeError of the unhashable field
+            return hash(self.hash_key())
+        return self._hash
+
+    def __ne__(self, other):
+        """Overrides the default implementation."""
+        return not self.__eq__(other)
+
+    def __copy__(self):
+        """Returns self, there is no need to copy immutable values."""
+        return self
+
+    def __deepcopy__(self, memo):
+        """Returns self, there is no need to copy immutable values."""
+        return self
+
+    def __getstate__(self):
+        """Returns the fields, used by jsonpickle and pickle."""
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def __setstate__(self, state):
+        """Sets the fields from a state returned by __getstate__."""
+        self.init_fields(*[state[field] for field in self.FIELDS])
@@ -1,9 +1,9 @@
 """Contains code related to the Replication module."""
 
 # standard
-import itertools
 import logging
-from copy import deepcopy
+from collections import Counter
+from copy import copy
 import time
 import os
 from typing import List, Tuple
@@ -12,17 +12,32 @@ from typing import List, Tuple
 from modules.algorithm_module import AlgorithmModule
 from modules.enums import ReplicationEnums, OperationEnums
 from modules.constants import (MAXINT, SIGMA, X_SET,
-                               REQUEST, STATUS, VIEW_CHANGE)
+                               REQUEST, STATUS, VIEW_CHANGE, DELTA_GOSSIP,
+                               BATCH_SIZE, BATCH_TIMEOUT, ADAPTIVE_WINDOW,
+                               EVENT_DRIVEN_REPLICATION,
+                               REPLICATION_MAX_IDLE, SKIP_UNCHANGED)
 from resolve.enums import Module, Function, MessageType
+from resolve.timed_lock import TimedLock
 import conf.config as conf
 from .models.replica_structure import ReplicaStructure
 from .models.request import Request
 from .models.client_request import ClientRequest
 from .models.operation import Operation
+from .models.state_digests import StateDigests, roll
+from .models.checkpoint import State, as_state
+from .models import checkpoint
+from .delta import DeltaGossip
+from .support import SupportIndex
+from .window import SeqNumWindow
 import modules.byzantine as byz
 from communication.zeromq.rate_limiter import throttle
-from metrics.messages import run_method_time
-from metrics.state import state_length, client_req_executed
+from communication.refresh import RefreshFilter
+from metrics.messages import (run_method_time, run_method_cpu_time,
+                              idle_iterations, rep_gossip_msgs, msgs_skipped)
+from metrics.state import (state_length, client_req_executed,
+                           checkpoint_length, live_state_length,
+                           batch_size, batch_wait_time, batch_config,
+                           seq_num_window)
 
 # globals
 logger = logging.getLogger(__name__)
@@ -61,6 +76,30 @@ class ReplicationModule(AlgorithmModule):
             # type: List[ReplicaStructure]
         # Support for non-self-stab
         self.self_stab = os.getenv("NON_SELF_STAB") is None
+        # versions of replica structures sent to and received from nodes
+        self.gossip = DeltaGossip(id, n)
+        # versions sent to each node, to skip sending them unchanged
+        self.refresh = RefreshFilter()
+        # structures received from other nodes and client requests injected
+        # since the start of the iteration, swapped into rep at the start of
+        # the next one (see swap_buffers). The iteration itself only reads
+        # and writes rep, so it does not block the receiver or the API.
+        self.buffer_lock = TimedLock("replication_buffers")
+        self.received = {}  # node id -> replica structure
+        self.injected = []
+        # support of requests among the structures of other nodes
+        self.support = SupportIndex(id, n, f)
+        # time the primary started waiting for the current batch to fill up
+        self.batch_started = None
+        batch_config.labels(id, "size").set(BATCH_SIZE)
+        batch_config.labels(id, "timeout").set(BATCH_TIMEOUT)
+        # window of sequence numbers assigned ahead when primary
+        self.window = SeqNumWindow(
+            k if ADAPTIVE_WINDOW else SIGMA * k, SIGMA * k)
+        # pending requests as of the last iteration, see get_pend_snapshot,
+        # and the own version and structures they were taken from
+        self.pend_snapshot = frozenset()
+        self.pend_snapshot_of = None
 
         # Injection of starting state for integration tests
         if os.getenv("INTEGRATION_TEST") or os.getenv("INJECT_START_STATE"):
@@ -73,7 +112,7 @@ class ReplicationModule(AlgorithmModule):
                 if rep is not None and len(rep) == n:
                     self.rep = rep
                 if byz.is_byzantine():
-                    self.byz_rep = deepcopy(rep[self.id])
+                    self.byz_rep = rep[self.id].clone()
                     self.byz_client_request = ClientRequest(0, 666, Operation(
                                                 "APPEND", 666))
                     self.byz_req = Request(self.byz_client_request, self.id,
@@ -99,6 +138,9 @@ class ReplicationModule(AlgorithmModule):
             self.lock.acquire()
             # Metric time
             start_time = time.time()
+            start_cpu_time = time.thread_time()
+            # apply the messages received since the last iteration
+            self.swap_buffers()
 
             # Only execute of self-stablizing
             if self.self_stab:
@@ -155,8 +197,8 @@ class ReplicationModule(AlgorithmModule):
                                                   is_default_prefix)) or
                      self.rep[self.id].is_def_state() or self.delayed())):
                     # set own rep_state and r_log to consolidated values
-                    self.rep[self.id].set_rep_state(deepcopy(X_rep_state))
-                    self.rep[self.id].set_r_log(deepcopy(X_r_log))
+                    self.rep[self.id].set_state(X_rep_state)
+                    self.rep[self.id].set_r_log(X_r_log)
                 # A byzantine node does not care if it is in conflict or stale
                 if not byz.is_byzantine():
                     if self.stale_rep() or self.conflict():
@@ -187,22 +229,24 @@ class ReplicationModule(AlgorithmModule):
                     if (prim_id == self.id and not (byz.is_byzantine() and
                         byz.get_byz_behavior() ==
                             byz.STOP_ASSIGNING_SEQNUMS)):
-                        for req in self.unassigned_reqs():
-                            if self.rep[self.id].get_seq_num() < \
-                                    (self.last_exec() +
-                                        (SIGMA * self.number_of_clients)):
+                        held_back = 0
+                        for batch in self.unassigned_batches():
+                            req = batch[0]
+                            if self.window.allows(
+                                    self.rep[self.id].get_seq_num(),
+                                    self.last_exec()):
                                 if byz.is_byzantine():
                                     if (byz.get_byz_behavior() ==
                                             byz.ASSIGN_DIFFERENT_SEQNUMS):
                                         self.byz_rep.set_seq_num(
                                             self.byz_rep.get_seq_num() + 3)
                                         byz_req = Request(
-                                            deepcopy(req),
+                                            req,
                                             prim_id,
                                             self.byz_rep.get_seq_num()
                                         )
                                         byz_req_pair = {
-                                            REQUEST: deepcopy(byz_req),
+                                            REQUEST: byz_req,
                                             STATUS: {
                                                 ReplicationEnums.PRE_PREP,
                                                 ReplicationEnums.PREP
@@ -232,7 +276,8 @@ class ReplicationModule(AlgorithmModule):
                                 req = Request(
                                     req,
                                     prim_id,
-                                    self.rep[self.id].get_seq_num()
+                                    self.rep[self.id].get_seq_num(),
+                                    batch[1:]
                                 )
 
                                 req_pair = {
@@ -243,19 +288,28 @@ class ReplicationModule(AlgorithmModule):
                                     }
                                 }
                                 self.rep[self.id].add_to_req_q(req_pair)
+                                self.window.assigned(req.get_seq_num())
+                            else:
+                                held_back += len(batch)
+                        self.window.held_back(held_back)
+                        seq_num_window.labels(self.id).set(self.window.size)
 
                     else:
                         # wait for prim or process reqs where 3f+1
                         # agree on seqnum
 
-                        for client_req in self.known_pend_reqs():
+                        known_pend_reqs = self.known_pend_reqs()
+                        for client_req in known_pend_reqs:
                             # Check if any request should get PRE_PREP
                             if self.accept_req_preprep(client_req, prim_id):
                                 # Find the actual request from prim
                                 for req_pair in self.rep[prim_id].get_req_q():
                                     req = req_pair[REQUEST]
                                     if (req.get_client_request() ==
-                                        client_req and req.get_view() ==
+                                        client_req and
+                                        self.batch_known(req,
+                                                         known_pend_reqs) and
+                                        req.get_view() ==
                                         prim_id and self.last_exec() <
                                             req.get_seq_num() <=
                                             (self.last_exec() +
@@ -305,8 +359,9 @@ class ReplicationModule(AlgorithmModule):
                                 ReplicationEnums.PREP,
                                 ReplicationEnums.COMMIT}}
                             self.rep[self.id].add_to_req_q(new_req_pair)
-                        self.rep[self.id].remove_from_pend_reqs(
-                            request.get_client_request())
+                        for client_req in request.get_client_requests():
+                            self.rep[self.id].remove_from_pend_reqs(
+                                client_req)
 
                     # Find all request that should be executed
                     for request in self.supported_reqs(
@@ -320,96 +375,244 @@ class ReplicationModule(AlgorithmModule):
                                     self.last_exec() + 1)):
                             self.commit({REQUEST: request,
                                          X_SET: x_set})
+                    self.seal_checkpoint()
+
+            # the own structure changed, its own predicates may hold now
+            own_changed = self.gossip.update_version(self.rep[self.id])
+            changed = EVENT_DRIVEN_REPLICATION and own_changed
+            self.update_pend_snapshot()
 
             # Emit run time metric
             run_time = time.time() - start_time
             run_method_time.labels(self.id,
                                    Module.REPLICATION_MODULE).set(
                                        run_time)
+            run_method_cpu_time.labels(self.id,
+                                       Module.REPLICATION_MODULE).set(
+                                           time.thread_time() -
+                                           start_cpu_time)
             self.lock.release()
             # Stopping the while loop, used for testing purpose
             if(testing):
                 break
             self.send_msg()
             throttle()
+            if EVENT_DRIVEN_REPLICATION and not changed:
+                self.wait_for_change()
+
+    def update_pend_snapshot(self):
+        """Takes the pending requests if a replica structure changed.
+
+        The own structure is changed in place, so its changes are told by
+        the version of the delta gossip. The structures of other nodes are
+        replaced when they change. See get_pend_snapshot.
+        """
+        taken_of = (self.gossip.version, list(self.rep))
+        last = self.pend_snapshot_of
+        if (last is not None and last[0] == taken_of[0] and
+                len(last[1]) == len(taken_of[1]) and
+                all(a is b for a, b in zip(last[1], taken_of[1]))):
+            return
+        pend_reqs = self.get_pend_reqs()
+        if pend_reqs == VIEW_CHANGE:
+            pend_reqs = []
+        self.pend_snapshot = frozenset(pend_reqs)
+        self.pend_snapshot_of = taken_of
+
+    def wait_for_change(self):
+        """Blocks until a change or for at most REPLICATION_MAX_IDLE.
+
+        Changes are messages from other nodes, client requests and changes
+        of the view or primary monitoring, see Resolver.wake. The loop
+        still runs every REPLICATION_MAX_IDLE seconds, so the replica
+        structures keep being gossiped and checked without changes.
+        """
+        if not self.resolver.wait_for_change(Module.REPLICATION_MODULE,
+                                             REPLICATION_MAX_IDLE):
+            idle_iterations.labels(self.id, Module.REPLICATION_MODULE).inc()
 
     def send_msg(self):
-        """Broadcasts its own replica_structure to other nodes."""
-        for j in conf.get_other_nodes():
-            if (byz.is_byzantine() and
-               (byz.get_byz_behavior() ==
-                    byz.WRONG_CCSP or
-                    (byz.get_byz_behavior() ==
-                        byz.ASSIGN_DIFFERENT_SEQNUMS and
-                        j % 2 == 1))):
+        """Broadcasts its own replica_structure to other nodes.
+
+        The replica structure is serialized once for all nodes, or once for
+        each group of nodes that get the same delta, see DeltaGossip.
+        Per-node messages are only built when acting Byzantine.
+        """
+        if (byz.is_byzantine() and
+           byz.get_byz_behavior() in [byz.WRONG_CCSP,
+                                      byz.ASSIGN_DIFFERENT_SEQNUMS]):
+            for j in conf.get_other_nodes():
+                if (byz.get_byz_behavior() == byz.WRONG_CCSP or
+                        j % 2 == 1):
+                    rep = self.byz_rep
+                else:
+                    rep = self.rep[self.id]
                 msg = {
                     "type": MessageType.REPLICATION_MESSAGE,
                     "sender": self.id,
-                    "data": {"own_replica_structure": self.byz_rep}
+                    "data": {"own_replica_structure": rep}
                 }
-            else:
+                self.resolver.send_to_node(j, msg)
+        elif DELTA_GOSSIP:
+            others = [j for j in range(self.number_of_nodes) if j != self.id]
+            # the acks of the gossip are updated by receive_rep_msg
+            with self.buffer_lock:
+                if SKIP_UNCHANGED:
+                    others = self.changed_for(others)
+                outgoing = []
+                if others:
+                    outgoing = self.gossip.outgoing(self.rep[self.id],
+                                                    others)
+            for node_ids, data in outgoing:
                 msg = {
                     "type": MessageType.REPLICATION_MESSAGE,
                     "sender": self.id,
-                    "data": {"own_replica_structure": deepcopy(
-                                                        self.rep[self.id])}
+                    "data": data
                 }
-            self.resolver.send_to_node(j, msg)
+                self.resolver.broadcast(msg, node_ids)
+                kind = "delta" if "delta" in data else "full"
+                rep_gossip_msgs.labels(self.id, kind).inc(len(node_ids))
+        else:
+            msg = {
+                "type": MessageType.REPLICATION_MESSAGE,
+                "sender": self.id,
+                "data": {"own_replica_structure": self.rep[self.id]}
+            }
+            self.resolver.broadcast(msg, skip_unchanged=True)
+
+    def changed_for(self, node_ids):
+        """Returns the nodes to send the own replica structure to.
+
+        Nodes that were sent the current version and acks less than
+        REFRESH_INTERVAL ago are left out. Called with buffer_lock held.
+        """
+        self.gossip.update_version(self.rep[self.id])
+        key = (self.gossip.version, tuple(self.gossip.acks))
+        changed = []
+        for j in node_ids:
+            if self.refresh.should_send(
+                    j, MessageType.REPLICATION_MESSAGE, key):
+                changed.append(j)
+            else:
+                msgs_skipped.labels(self.id, j,
+                                    MessageType.REPLICATION_MESSAGE).inc()
+        return changed
 
     def receive_rep_msg(self, msg):
         """Logic for receiving a replication message from another node
 
-        The resolver calls this function when a REPLICATION_MESSAGE arrives
-        and this function updates the information about the sending node's
-        state if allowed.
+        The resolver calls this function in the receiver thread when a
+        REPLICATION_MESSAGE arrives. The structure of the sending node is
+        kept until the start of the next iteration, see swap_buffers.
         """
-        if (self.resolver.execute(
-                Module.VIEW_ESTABLISHMENT_MODULE,
-                Function.ALLOW_SERVICE)):
-            j = int(msg["sender"])                           # id of sender
-            rep = deepcopy(msg["data"]["own_replica_structure"])  # rep data
-            if (self.resolver.execute(
-                    Module.PRIMARY_MONITORING_MODULE,
-                    Function.NO_VIEW_CHANGE)):
-                self.rep[j] = deepcopy(rep)
+        j = int(msg["sender"])                           # id of sender
+        if j == self.id:
+            return
+        # rep data, the full structure or a delta applied on the last one.
+        # It is decoded from the message so no other node or module holds
+        # it, the gossip keeps it as base for the next delta and freezes
+        # it, as the structures of other nodes are never changed in place.
+        # The acks and mirrors of the gossip are shared with send_msg, so
+        # they are only used with buffer_lock held.
+        with self.buffer_lock:
+            rep = self.gossip.receive(j, msg["data"])
+            if rep is not None:
+                self.received[j] = rep
+
+    def swap_buffers(self):
+        """Applies the structures and requests received since last called.
+
+        Only the newest structure from each node is applied, and only if
+        allowed by the view establishment and primary monitoring modules.
+        """
+        with self.buffer_lock:
+            received, self.received = self.received, {}
+            injected, self.injected = self.injected, []
+        if injected:
+            self.rep[self.id].extend_pend_reqs(injected)
+        if not received or not self.resolver.execute(
+                Module.VIEW_ESTABLISHMENT_MODULE, Function.ALLOW_SERVICE):
+            return
+        no_view_change = self.resolver.execute(
+            Module.PRIMARY_MONITORING_MODULE, Function.NO_VIEW_CHANGE)
+        for j, rep in received.items():
+            if no_view_change:
+                self.rep[j] = rep
             else:
-                self.rep[j].set_rep_state(rep.get_rep_state())
+                self.rep[j] = copy(self.rep[j])
+                self.rep[j].set_state(rep.get_state())
 
     def commit(self, req_pair):
         """Commits a request."""
         request: Request = req_pair[REQUEST]
         reply = self.apply(request)
-        client_id = request.get_client_request().get_client_id()
-        # update last executed request
-        self.rep[self.id].update_last_req(client_id, request, reply)
+        self.window.committed(request.get_seq_num())
+        for client_req in request.get_client_requests():
+            client_id = client_req.get_client_id()
+            # update last executed request
+            self.rep[self.id].update_last_req(client_id, request, reply)
+            # remove request from pend_reqs
+            self.rep[self.id].remove_from_pend_reqs(client_req)
         # append to rLog
         self.rep[self.id].add_to_r_log(req_pair)
 
-        # remove request from pend_reqs and req_q
-        self.rep[self.id].remove_from_pend_reqs(request.get_client_request())
+        # remove request from req_q
         self.rep[self.id].remove_from_req_q(request)
 
-        # notify state metric that request has been committed
-        client_req_executed(
-            request.get_client_request(),
-            len(self.rep[self.id].get_rep_state()),
-            len(self.rep[self.id].get_pend_reqs())
-        )
+        # notify state metric that requests have been committed
+        for client_req in request.get_client_requests():
+            client_req_executed(
+                client_req,
+                self.rep[self.id].state_length(),
+                len(self.rep[self.id].get_pend_reqs())
+            )
 
         self.resolver.on_req_exec(request.get_seq_num())
 
     def apply(self, req: Request):
-        """Applies a request and returns the resulting state."""
-        current_state = self.rep[self.id].get_rep_state()
-        operation = req.get_client_request().get_operation()
-        # Metod execute in operation is state machine specific
-        new_state = operation.execute(current_state)
-        self.rep[self.id].set_rep_state(new_state)
+        """Applies a request and returns the resulting state.
+
+        The operations of all client requests in a batch are applied
+        together.
+        """
+        new_state = self.rep[self.id].get_rep_state()
+        # digests of the current state, extended with the applied entries
+        digests = self.rep[self.id].get_rep_state_digests()
+        for client_req in req.get_client_requests():
+            operation = client_req.get_operation()
+            # Metod execute in operation is state machine specific
+            new_state = operation.execute(new_state)
+            # state length can only increment by 1 for each APPEND request
+            state_length.inc()
+        self.rep[self.id].set_rep_state(new_state, digests)
         logger.info(f"Applying request {req}.")
-        # state length can only increment by 1 for each APPEND request
-        state_length.inc()
         return new_state
 
+    def seal_checkpoint(self):
+        """Seals the longest prefix of the own state agreed on by n - 2f.
+
+        Only checkpoints at the end of blocks of the own state are sealed
+        (see checkpoint.block_checkpoints), and at least as many entries as
+        the requests the r_log is bounded to can append are kept after the
+        checkpoint, so the corresponding r_log of a prefix can still be
+        found.
+        """
+        own = self.rep[self.id]
+        retain = 3 * SIGMA * self.number_of_clients * BATCH_SIZE
+        sealable = own.state_length() - retain
+        states = [rs.get_state() for rs in self.rep]
+        for cp in reversed(own.get_checkpoints()[1:]):
+            if cp.length > sealable:
+                continue
+            agreed = [s for s in states if s.checkpoint_at(cp.length) == cp]
+            if len(agreed) >= (self.number_of_nodes -
+                               2 * self.number_of_byzantine):
+                own.seal(cp)
+                break
+        checkpoint_length.labels(self.id).set(
+            own.get_checkpoint().length)
+        live_state_length.labels(self.id).set(len(own.get_rep_state()))
+
     # Macros
     def flush_local(self):
         """Resets all local variables."""
@@ -486,46 +689,62 @@ class ReplicationModule(AlgorithmModule):
         Returns a set of replica states, and corresponding r_logs
         which has the longest prefix at at least required_processors.
         Returns empty if non-existing. State machine specific method.
+
+        The states of a set of processors are all prefixes of each other
+        (see are_prefixes) iff the processors all have default prefix
+        values, or all states are prefixes of the longest state in the set.
+        So instead of checking every combination of required_processors
+        processors, only the group of processors with default values and,
+        for each processor, the group of processors with a state that is a
+        prefix of its state are considered. Among the sets with the longest
+        common prefix, the first one in the order of combinations of the
+        processors is returned.
         """
         dct = {}
         # Get all replica states
         for replica_structure in self.rep:
             dct[replica_structure.get_id()] = {
-                "REP_STATE": replica_structure.get_rep_state(),
+                "REP_STATE": replica_structure.get_state(),
                 "R_LOG": replica_structure.get_r_log()
             }
-        # Find a set of replica states that all are prefixes of each other
-        # All possible combinations (of size required_processors) of replica
-        # states
-        candidates = []
-        for processor_set in itertools.combinations(
-                    dct, required_processors):
-            all_states_are_prefixes = True
-            # Check if prefixes for all combinations in the set of processors
-            for id_A, id_B in itertools.combinations(processor_set, 2):
-                if not self.are_prefixes(id_A, id_B):
-                    # Move on to next combination of replica states
-                    all_states_are_prefixes = False
-                    break
-            # All replica states of the processors were prefixes to each other
-            if(all_states_are_prefixes):
-                candidates.append(list(processor_set))
-
-        # Found all possible candidates of processors
-        # Want to return the ones with the longest prefix of rep_states
+        ids = list(dct)
+        is_def = {id: self.rep[id].is_def_prefix() for id in ids}
+
+        # Groups of processors in which all replica states are prefixes of
+        # each other, every such set is a subset of one of these groups
+        groups = [[id for id in ids if is_def[id]]]
+        for top in ids:
+            if not is_def[top]:
+                top_state = dct[top]["REP_STATE"]
+                groups.append([id for id in ids if not is_def[id] and
+                               self.is_prefix_of(dct[id]["REP_STATE"],
+                                                 top_state)])
+
+        # The common prefix of a set is its shortest state, so the longest
+        # prefix in a group is the required_processors:th longest state
         longest_prefix_found = -1
+        for group in groups:
+            if len(group) >= required_processors > 0:
+                lengths = sorted([len(dct[id]["REP_STATE"]) for id in group],
+                                 reverse=True)
+                longest_prefix_found = max(longest_prefix_found,
+                                           lengths[required_processors - 1])
+
+        # Groups are in the order of ids, so the first set in a group is
+        # its first required_processors processors with long enough states
+        position = {id: i for i, id in enumerate(ids)}
+        first = None
         returning_processors = []
-        for processors in candidates:
-            states = []
-            for id in processors:
-                states.append(dct[id]["REP_STATE"])
-            prefixes = self.find_prefix(states)
-            if prefixes is not None:
-                length = len(prefixes)
-            else:
-                length = -1
-            if length > longest_prefix_found:
-                longest_prefix_found = length
+        for group in groups:
+            processors = [id for id in group if
+                          len(dct[id]["REP_STATE"]) >= longest_prefix_found]
+            if len(processors) < required_processors or \
+                    required_processors <= 0:
+                continue
+            processors = processors[:required_processors]
+            positions = [position[id] for id in processors]
+            if first is None or positions < first:
+                first = positions
                 returning_processors = processors
 
         returning_states = []
@@ -553,12 +772,14 @@ class ReplicationModule(AlgorithmModule):
             return False
         else:
             # Return the normal prefix check
-            return self.prefixes(self.rep[processor_A].get_rep_state(),
-                                 self.rep[processor_B].get_rep_state())
+            return self.prefixes(self.rep[processor_A].get_state(),
+                                 self.rep[processor_B].get_state())
 
-    def check_new_X_prefix(self, id, X_rep, is_default_prefix):
+    def check_new_X_prefix(self, id, X_rep, is_default_prefix,
+                           X_digests: StateDigests = None):
         """Checks the new prefix rep_state (X_rep) proposed.
 
+        X_digests are the digests of X_rep, if known.
         State machine specific method.
         """
         if self.rep[id].is_def_prefix():
@@ -567,7 +788,8 @@ class ReplicationModule(AlgorithmModule):
             # Own rep is not default value
             return False
         else:
-            return self.prefixes(self.rep[id].get_rep_state(), X_rep)
+            return self.prefixes(self.rep[id].get_state(), X_rep,
+                                 None, X_digests)
 
     def get_ds_state(self) -> Tuple[List, List]:
         """Method description.
@@ -586,6 +808,9 @@ class ReplicationModule(AlgorithmModule):
         if X[0] == -1:
             return X
         is_default_prefix = X[2]
+        X_digests = None
+        if not isinstance(X[0], State):
+            X_digests = StateDigests.of(X[0])
         # Find default replica structures and prefixes to/of X
         for replica_structure in self.rep:
             if(replica_structure.is_rep_state_default()):
@@ -593,7 +818,8 @@ class ReplicationModule(AlgorithmModule):
                 continue
             if self.check_new_X_prefix(replica_structure.get_id(),
                                        X[0],
-                                       is_default_prefix):
+                                       is_default_prefix,
+                                       X_digests):
                 processors_prefix_X += 1
 
         # Checks if the sets are in the correct size span
@@ -611,14 +837,15 @@ class ReplicationModule(AlgorithmModule):
         Returns true if request queue contains two copies of a client request
         with different sequence numbers or views.
         """
-        # Create all possible 2-combinations of the requests
-        for request_pair1, request_pair2 in itertools.combinations(
-                self.rep[self.id].get_req_q(), 2):
-            if(request_pair1[REQUEST].get_client_request() ==
-                    request_pair2[REQUEST].get_client_request() and
-                    # the sequence number or view number is different
-                    request_pair1[REQUEST] != request_pair2[REQUEST]):
-                return True
+        # request of each client request, client requests of batches
+        # included
+        requests = {}
+        for request_pair in self.rep[self.id].get_req_q():
+            request = request_pair[REQUEST]
+            for client_req in request.get_client_requests():
+                # the sequence number, view number or batch is different
+                if requests.setdefault(client_req, request) != request:
+                    return True
         return False
 
     def stale_req_seqn(self):
@@ -632,17 +859,14 @@ class ReplicationModule(AlgorithmModule):
         Returns true if a request exists in request queue less than
         2f+1 times (the request is unsupported).
         """
-        for request in self.rep[self.id].get_req_q():
-            processors_supporting = 0
-            my_request = request[REQUEST]
-            client_request = my_request.get_client_request()
-            # get replica states of all other processors
-            for replica_structure in self.rep:
-                # for all request in their request queue
-                for req_pair in replica_structure.get_req_q():
-                    if(client_request ==
-                            req_pair[REQUEST].get_client_request()):
-                        processors_supporting += 1
+        self.support.refresh(self.rep)
+        req_q = self.rep[self.id].get_req_q()
+        own = Counter([x[REQUEST].get_client_request() for x in req_q])
+        for request in req_q:
+            client_request = request[REQUEST].get_client_request()
+            processors_supporting = (
+                self.support.client_reqs[client_request] +
+                own[client_request])
             if(processors_supporting < (self.number_of_nodes - 3 *
                                         self.number_of_byzantine)):
                 return True
@@ -667,17 +891,12 @@ class ReplicationModule(AlgorithmModule):
         Returns the set of requests in request queue and in the message queue
         of 3f+1 other processors.
         """
-        request_count = {}
-
-        for rs in self.rep:
-            for req in rs.get_pend_reqs():
-                if req in request_count:
-                    request_count[req] += 1
-                else:
-                    request_count[req] = 1
-
-        known_reqs = {k: v for (k, v) in request_count.items() if v >= (
-                        self.number_of_nodes - 2 * self.number_of_byzantine)}
+        self.support.refresh(self.rep)
+        known_reqs = dict.fromkeys(self.support.pend.reached)
+        for req, count in Counter(self.rep[self.id].get_pend_reqs()).items():
+            if self.support.pend[req] + count >= (
+                    self.number_of_nodes - 2 * self.number_of_byzantine):
+                known_reqs[req] = None
         return list(known_reqs.keys())
 
     def known_reqs(self, status):
@@ -691,17 +910,15 @@ class ReplicationModule(AlgorithmModule):
         if type(status) is not set:
             raise ValueError("status arg must be a set")
 
+        self.support.refresh(self.rep)
+        others = self.support.status[self.index_status(status)]
+        req_q = self.rep[self.id].get_req_q()
+        own = Counter([x[REQUEST] for x in req_q if status <= x[STATUS]])
         request_set = []
-        for req_pair in self.rep[self.id].get_req_q():
-            processor_set = 0
-            if status <= req_pair[STATUS]:
-                for replication_structure in self.rep:
-                    for request_pair in replication_structure.get_req_q():
-                        if(req_pair[REQUEST] == request_pair[REQUEST] and
-                           status <= request_pair[STATUS]):
-                            processor_set += 1
-            if processor_set >= (self.number_of_nodes - 2 *
-                                 self.number_of_byzantine):
+        for req_pair in req_q:
+            if (status <= req_pair[STATUS] and
+                    others[req_pair[REQUEST]] + own[req_pair[REQUEST]] >=
+                    (self.number_of_nodes - 2 * self.number_of_byzantine)):
                 request_set.append(req_pair)
         return request_set
 
@@ -710,31 +927,33 @@ class ReplicationModule(AlgorithmModule):
 
         or req_q with status "status" of 3f+1 processors.
         """
-        known_reqs = {}
+        self.support.refresh(self.rep)
+        others = self.support.supported[self.index_status(status)]
+        known_reqs = dict.fromkeys(others.reached)
+        # requests in own r_log are filtered out below, so only own req_q
+        # can add requests
+        own = Counter([x[REQUEST] for x in self.rep[self.id].get_req_q()
+                       if status <= x[STATUS]])
+        for req, count in own.items():
+            if others[req] + count >= (self.number_of_nodes - 2 *
+                                       self.number_of_byzantine):
+                known_reqs[req] = None
 
-        for replica_structure in self.rep:
-            for req_pair in replica_structure.get_req_q():
-                if status <= req_pair[STATUS]:
-                    if req_pair[REQUEST] in known_reqs:
-                        known_reqs[req_pair[REQUEST]] += 1
-                    else:
-                        known_reqs[req_pair[REQUEST]] = 1
-
-            for applied_req in replica_structure.get_r_log():
-                    if applied_req[REQUEST] in known_reqs:
-                        known_reqs[applied_req[REQUEST]] += 1
-                    else:
-                        known_reqs[applied_req[REQUEST]] = 1
-
-        known_reqs = {k: v for (k, v) in known_reqs.items()
-                      if v >= (self.number_of_nodes - 2 *
-                               self.number_of_byzantine)}
         # Filter out all request that processor_i has already applied
         for applied_req in self.rep[self.id].get_r_log():
             if applied_req[REQUEST] in known_reqs:
                 del known_reqs[applied_req[REQUEST]]
         return list(known_reqs.keys())
 
+    def index_status(self, status):
+        """Returns status as a key of the status sets in the support index.
+
+        Raises ValueError if status is not a set of ReplicationEnums.
+        """
+        if not status <= set(ReplicationEnums):
+            raise ValueError(f"status {status} is not a set of statuses")
+        return frozenset(status)
+
     def delayed(self):
         """Method description.
 
@@ -752,7 +971,7 @@ class ReplicationModule(AlgorithmModule):
         for the request.
         """
         for y in self.msg({ReplicationEnums.PRE_PREP}, prim):
-            if y.get_client_request() == request:
+            if request in y.get_client_requests():
                 return True
         return False
 
@@ -764,30 +983,61 @@ class ReplicationModule(AlgorithmModule):
         for the requests.
         """
         request_set = []
+        known = [c for x in self.known_reqs({ReplicationEnums.PREP,
+                                             ReplicationEnums.COMMIT})
+                 for c in x[REQUEST].get_client_requests()]
         for req in self.rep[self.id].get_pend_reqs():
             if (not self.exists_preprep_msg(
                     req, self.rep[self.id].get_prim()) and
-                    req not in list(map(lambda x:
-                                        x[REQUEST].get_client_request(),
-                                        self.known_reqs(
-                                            {ReplicationEnums.PREP,
-                                             ReplicationEnums.COMMIT}))
-                                    )):
+                    req not in known):
                     request_set.append(req)
         return request_set
 
+    def unassigned_batches(self):
+        """Returns the unassigned requests in batches of BATCH_SIZE.
+
+        A last batch that is not full is held back until it has waited
+        BATCH_TIMEOUT ms to fill up.
+        """
+        reqs = self.unassigned_reqs()
+        batches = [reqs[i:i + BATCH_SIZE]
+                   for i in range(0, len(reqs), BATCH_SIZE)]
+        now = time.time()
+        waited = 0
+        if batches and len(batches[-1]) < BATCH_SIZE:
+            if self.batch_started is None:
+                self.batch_started = now
+            waited = now - self.batch_started
+            if waited * 1000 < BATCH_TIMEOUT:
+                batches.pop()
+            else:
+                self.batch_started = None
+        elif self.batch_started is not None:
+            waited = now - self.batch_started
+            self.batch_started = None
+        if batches:
+            batch_size.labels(self.id).set(len(batches[-1]))
+            batch_wait_time.labels(self.id).set(waited)
+        return batches
+
+    def batch_known(self, req: Request, known_pend_reqs):
+        """True if the client requests batched in req are all known."""
+        return all(c in known_pend_reqs for c in req.get_batch())
+
     def accept_req_preprep(self, request: ClientRequest, prim: int):
         """Method description.
 
         True if PRE_PREP msg from prim exists and the content is the same for
         3f+1 processors in the same view and sequence number.
         """
+        known_pend_reqs = self.known_pend_reqs()
         # Processor i knows of the request and there exists a pre_prep_message
-        if (request in self.known_pend_reqs() and
+        if (request in known_pend_reqs and
            self.exists_preprep_msg(request, prim)):
             # The request should be acknowledged by other processors
             for req_pair in self.rep[prim].get_req_q():
                 if (req_pair[REQUEST].get_client_request() == request and
+                   self.batch_known(req_pair[REQUEST], known_pend_reqs) and
                    req_pair[REQUEST].get_view() == prim and
                    self.last_exec() < req_pair[REQUEST].get_seq_num() <=
                         (self.last_exec() + SIGMA * self.number_of_clients)):
@@ -842,18 +1092,15 @@ class ReplicationModule(AlgorithmModule):
         Returns the set of processors that have reported to commit to the
         request or have the request in their executed request log.
         """
-        processor_set = set()
-        for replica_structure in self.rep:
-            id = replica_structure.get_id()
-            # Checks if the processor has reported to commit the request
-            if request in self.msg({ReplicationEnums.COMMIT}, id):
-                processor_set.add(id)
-                continue
-            # Checks if the request is in the processors executed request log
-            for request_pair in replica_structure.get_r_log():
-                if request == request_pair[REQUEST]:
-                    processor_set.add(id)
-                    break
+        self.support.refresh(self.rep)
+        processor_set = self.support.nodes_committed(request)
+        # Checks if the processor has reported to commit the request or if
+        # the request is in its executed request log
+        if (any(x[REQUEST] == request and
+                ReplicationEnums.COMMIT in x[STATUS]
+                for x in self.rep[self.id].get_req_q()) or
+                self.rep[self.id].exist_in_r_log(request)):
+            processor_set.add(self.id)
         return processor_set
 
     # Methods added
@@ -878,11 +1125,30 @@ class ReplicationModule(AlgorithmModule):
                 return True
         return False
 
-    def prefixes(self, sq_log_A, sq_log_B):
+    def prefixes(self, sq_log_A, sq_log_B, digests_A: StateDigests = None,
+                 digests_B: StateDigests = None):
         """Returns true if sequence log A and sequence log B are prefixes.
 
+        If the digests of both logs are given, logs that are not prefixes
+        are ruled out by comparing the digests of the shorter log and the
+        prefix of the longer log, equal digests are confirmed by comparing
+        the entries. If one of the logs is a State, they are compared after
+        the longer of their checkpoints (see checkpoint.is_prefix_of).
         State machine specific method.
         """
+        if isinstance(sq_log_A, State) or isinstance(sq_log_B, State):
+            state_A = as_state(sq_log_A, digests_A)
+            state_B = as_state(sq_log_B, digests_B)
+            if len(state_A) <= len(state_B):
+                return checkpoint.is_prefix_of(state_A, state_B)
+            return checkpoint.is_prefix_of(state_B, state_A)
+        if digests_A is not None and digests_B is not None:
+            if len(digests_A) <= len(digests_B):
+                return (digests_A.is_prefix_of(digests_B) and
+                        sq_log_B[:len(sq_log_A)] == sq_log_A)
+            return (digests_B.is_prefix_of(digests_A) and
+                    sq_log_A[:len(sq_log_B)] == sq_log_B)
+
         # Go throug sequence log A to see if A is a prefix or B
         for index, item in enumerate(sq_log_A):
             # We have reached the end of sq_log_B and therefore B is a prefix
@@ -899,13 +1165,24 @@ class ReplicationModule(AlgorithmModule):
         # Log A has run out of items and is therefore a prefix of B
         return True
 
-    def is_prefix_of(self, sq_log_A, sq_log_B):
+    def is_prefix_of(self, sq_log_A, sq_log_B,
+                     digests_A: StateDigests = None,
+                     digests_B: StateDigests = None):
         """Returns True if sq_log_A is a prefix of sq_log_B.
 
+        If the digests of both logs are given, sq_log_A is ruled out by
+        comparing digests and equal digests are confirmed by comparing the
+        entries.
         State machine specific method.
         """
         if len(sq_log_A) > len(sq_log_B):
             return False
+        if isinstance(sq_log_A, State) or isinstance(sq_log_B, State):
+            return checkpoint.is_prefix_of(as_state(sq_log_A, digests_A),
+                                           as_state(sq_log_B, digests_B))
+        if digests_A is not None and digests_B is not None:
+            return (digests_A.is_prefix_of(digests_B) and
+                    sq_log_B[:len(sq_log_A)] == sq_log_A)
 
         # Check entries in A to see that they match entries in B
         for index, item in enumerate(sq_log_A):
@@ -973,7 +1250,7 @@ class ReplicationModule(AlgorithmModule):
                 self.rep[self.id].set_to_tee()
             # update values accordingly
             else:
-                self.rep[self.id].set_rep_state(X[0])
+                self.rep[self.id].set_state(X[0])
                 self.rep[self.id].set_r_log(X[1])
                 self.rep[self.id].set_view_changed(False)
 
@@ -1036,6 +1313,16 @@ class ReplicationModule(AlgorithmModule):
         else:
             return(VIEW_CHANGE)
 
+    def get_pend_snapshot(self):
+        """Returns the pending requests as of the last iteration.
+
+        The requests are the ones of get_pend_reqs, or none after a view
+        change, in a frozenset taken when the structures changed. The Failure
+        Detector looks the requests it checks up in it instead of copying
+        the pending requests for each of them.
+        """
+        return self.pend_snapshot
+
     def rep_request_reset(self):
         """Method description.
 
@@ -1099,12 +1386,11 @@ class ReplicationModule(AlgorithmModule):
 
         for req in self.rep[self.id].get_req_q():
             if req in reqs_need_pre_prep:
-                # current view is equal to self.id since we are primary
-                req[REQUEST].set_view(self.id)
-
-                # Increment sequence number and assign
+                # Increment sequence number and assign, current view is
+                # equal to self.id since we are primary
                 self.rep[self.id].inc_seq_num()
-                req[REQUEST].set_seq_num(self.rep[self.id].get_seq_num())
+                self.rep[self.id].renew_req(req, self.id,
+                                            self.rep[self.id].get_seq_num())
                 # Add PREP since node is primary and do not need to validate
                 # PRE_PREP - message
                 req[STATUS].add(ReplicationEnums.PREP)
@@ -1146,25 +1432,47 @@ class ReplicationModule(AlgorithmModule):
         """Returns the corresponding r_log to the prefix_state.
 
         Processors_r_log is a list of r_logs corresponding to the processors
-        which rep_state has prefix_state as prefix.
+        which rep_state has prefix_state as prefix. The state produced by
+        each r_log is compared to the end of prefix_state by its digest and
+        only compared entry by entry if the digests are equal. Only the
+        entries after the checkpoint of a State are compared.
         State machine specific method.
         """
+        prefix_digests = None
+        if isinstance(prefix_state, State):
+            prefix_digests = prefix_state.digests
+            prefix_state = prefix_state.entries
+        if prefix_digests is None:
+            prefix_digests = StateDigests.of(prefix_state)
         for single_r_log in processors_r_log:
             # for entries in itertools.combinations(
             # single_r_log, len(prefix_state)):
                 # execute all reqs in this combination
             state = []
+            digest = 0
             # for e in entries:
             for index, req in enumerate(single_r_log):
-                op = req[REQUEST].get_client_request().get_operation()
-                if type(op) is not Operation:
-                    raise ValueError(f"Operation {op} in r_log entry is \
-                                        not of type Operation")
-                state = op.execute(state)
+                length = len(state)
+                for client_req in req[REQUEST].get_client_requests():
+                    op = client_req.get_operation()
+                    if type(op) is not Operation:
+                        raise ValueError(f"Operation {op} in r_log entry is \
+                                            not of type Operation")
+                    state = op.execute(state)
             # Since r_log is bounded, the execution of all operation in the
             # current r_log will give the "end" of the rep_state (the last
             # elements in the list)
-                if state == prefix_state[len(prefix_state) - len(state):]:
+                start = len(prefix_state) - len(state)
+                if prefix_digests is not None:
+                    try:
+                        digest = roll(digest, state[length:])
+                    except TypeError:
+                        prefix_digests = None
+                    else:
+                        if (start < 0 or digest != prefix_digests.segment(
+                                start, len(prefix_state))):
+                            continue
+                if state == prefix_state[start:]:
                     # found correct r_log entries
                     # entries is tuple -> convert to list
                     # return list(entries)
@@ -1174,8 +1482,44 @@ class ReplicationModule(AlgorithmModule):
     def find_prefix(self, rep_states: List):
         """Finds the prefix of a list of replica states.
 
+        If all states are the rep_state of a processor, the length of the
+        prefix is found by comparing digests of prefixes of the states and
+        confirmed by comparing the entries.
+        States are compared after the longer of their checkpoints, and no
+        prefix is found if it ends within the sealed prefix of a state.
         State machine specific method.
         """
+        if any(isinstance(state, State) for state in rep_states):
+            states = [as_state(state) for state in rep_states]
+            shortest = min(states, key=len)
+            length = len(shortest)
+            for state in states:
+                common = checkpoint.common_prefix_length(shortest, state)
+                if common is None:
+                    return None
+                length = min(length, common)
+            if len(shortest) > 0 and length == 0:
+                return None
+            # keep the prefix after the longest checkpoint within it
+            longest = max([state for state in states
+                           if state.checkpoint.length <= length],
+                          key=lambda state: state.checkpoint.length)
+            return longest.truncated(length)
+
+        digests = self.known_rep_state_digests(rep_states)
+        if digests:
+            shortest = min(rep_states, key=len)
+            length = len(shortest)
+            for d in digests:
+                length = min(length, digests[0].common_prefix_length(d))
+            prefix = shortest[:length]
+            # the length is an upper bound, it is exact if all states
+            # have the prefix, otherwise the entries are compared below
+            if all(state[:length] == prefix for state in rep_states):
+                if len(shortest) > 0 and length == 0:
+                    return None
+                return prefix
+
         prefix = None
 
         # find shortest rep state
@@ -1200,6 +1544,22 @@ class ReplicationModule(AlgorithmModule):
 
         return prefix
 
+    def known_rep_state_digests(self, rep_states: List):
+        """Returns the digests of rep_states if all are processor states.
+
+        Returns None if a state is not the rep_state of any processor or
+        its digests are not known.
+        """
+        by_state = {id(rs.get_rep_state()): rs for rs in self.rep}
+        digests = []
+        for state in rep_states:
+            rs = by_state.get(id(state))
+            d = rs.get_rep_state_digests() if rs is not None else None
+            if d is None:
+                return None
+            digests.append(d)
+        return digests
+
     def check_new_v_state(self, prim):
         """Method description.
 
@@ -1270,10 +1630,9 @@ class ReplicationModule(AlgorithmModule):
         """
         # check that new state is prefix to 3f+1 processors
         count = 0
-        prim_state = self.rep[prim].get_rep_state()
+        prim_state = self.rep[prim].get_state()
         for rs in self.rep:
-            rep_state = rs.get_rep_state()
-            if self.is_prefix_of(prim_state, rep_state):
+            if self.is_prefix_of(prim_state, rs.get_state()):
                 count += 1
         if count < (self.number_of_nodes - 2 * self.number_of_byzantine):
             return False
@@ -1281,8 +1640,8 @@ class ReplicationModule(AlgorithmModule):
         # check r_log
         state = []
         for e in self.rep[prim].get_r_log():
-            op = e[REQUEST].get_client_request().get_operation()
-            state = op.execute(state)
+            for client_req in e[REQUEST].get_client_requests():
+                state = client_req.get_operation().execute(state)
 
         return state == self.rep[prim].get_rep_state()
 
@@ -1291,27 +1650,20 @@ class ReplicationModule(AlgorithmModule):
 
         but are unknown to processor i, meaning it does not exists in req_q.
         """
-        reqs_count = {}
-        for rs in self.rep:
-            # No need to look through more than n - 3f since unknown
-            # requests will then not be supported
-            # (if not found before, then the request can't have 3f+1 nodes
-            # supporting it)
-            for req_pairs in rs.get_req_q():
-                if {ReplicationEnums.PREP} <= req_pairs[STATUS]:
-                    # The request has PREP_message
-                    for rp in self.rep[self.id].get_req_q():
-                        if rp[REQUEST] != req_pairs[REQUEST]:
-                            # Request does not exist in own req_q, count i
-                            if req_pairs[REQUEST] in reqs_count:
-                                reqs_count[req_pairs[REQUEST]] += 1
-                            else:
-                                reqs_count[req_pairs[REQUEST]] = 1
-        # Get all supported requests
-        supported_reqs = {k: v for (k, v) in reqs_count.items() if v >= (
-                                    self.number_of_nodes - 2 *
-                                    self.number_of_byzantine)}
-        return list(supported_reqs.keys())
+        self.support.refresh(self.rep)
+        others = self.support.status[frozenset({ReplicationEnums.PREP})]
+        req_q = self.rep[self.id].get_req_q()
+        own = Counter([x[REQUEST] for x in req_q])
+        own_prep = Counter([x[REQUEST] for x in req_q
+                            if {ReplicationEnums.PREP} <= x[STATUS]])
+        supported_reqs = []
+        for req in dict.fromkeys(list(others.counts) + list(own_prep)):
+            # Every processor with a PREP message for the request counts
+            # once for each request in own req_q that is not the request
+            count = (others[req] + own_prep[req]) * (len(req_q) - own[req])
+            if count >= (self.number_of_nodes - 2 * self.number_of_byzantine):
+                supported_reqs.append(req)
+        return supported_reqs
 
     # Function to extract data
     def get_data(self):
@@ -1320,6 +1672,7 @@ class ReplicationModule(AlgorithmModule):
         return {
             "id": self.id,
             "rep_state": rep.get_rep_state(),
+            "checkpoint": rep.get_checkpoint(),
             "pend_reqs": rep.get_pend_reqs(),
             # get status name instead of int
             "req_q": list(map(lambda x: {
@@ -1335,10 +1688,18 @@ class ReplicationModule(AlgorithmModule):
         }
 
     def inject_client_req(self, req: ClientRequest):
-        """Injects a client request to pend_reqs."""
+        """Injects a client request to pend_reqs.
+
+        The request is added at the start of the next iteration, see
+        swap_buffers. Returns the pending requests including it.
+        """
         # check if this is first client req - if so, start counting msgs sent
-        if len(self.rep[self.id].get_rep_state()) == 0:
+        if self.rep[self.id].state_length() == 0:
             self.resolver.on_experiment_start()
 
-        self.rep[self.id].extend_pend_reqs([req])
-        return self.rep[self.id].get_pend_reqs()
+        with self.buffer_lock:
+            self.injected.append(req)
+        pend_reqs = list(self.rep[self.id].get_pend_reqs())
+        if req not in pend_reqs:
+            pend_reqs.append(req)
+        return pend_reqs
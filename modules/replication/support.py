@@ -0,0 +1,174 @@
+"""Index of the support of requests among the replica structures of nodes.
+
+The replication module repeatedly asks how many nodes report a request in
+their pend_reqs, req_q (with some status) or r_log. Instead of scanning the
+replica structures of all nodes for every such question, the index keeps
+these counts for the structures of the other nodes and updates them only
+for the fields that are replaced. The structures of other nodes are never
+changed in place, so a field that is the same object as when it was
+indexed has the same contents.
+
+The own replica structure is changed in place while the module runs, so
+it is not indexed and the module adds its contribution when querying.
+"""
+
+# standard
+from itertools import combinations
+import logging
+
+# local
+from modules.constants import REQUEST, STATUS, SUPPORT_INDEX_REBUILD
+from modules.enums import ReplicationEnums
+
+# globals
+logger = logging.getLogger(__name__)
+
+# fields of a replica structure that are indexed
+FIELDS = ("pend_reqs", "req_q", "r_log")
+# status sets that requests can be queried with
+STATUSES = [frozenset(c) for k in range(len(ReplicationEnums) + 1)
+            for c in combinations(ReplicationEnums, k)]
+
+
+class QuorumCounter:
+    """Counts keys and keeps track of the keys counted at least quorum times.
+
+    reached is a dict used as an ordered set.
+    """
+
+    def __init__(self, quorum):
+        """Initializes an empty counter."""
+        self.quorum = quorum
+        self.counts = {}
+        self.reached = {}
+
+    def add(self, key, delta=1):
+        """Adds delta to the count of key."""
+        count = self.counts.get(key, 0) + delta
+        if count:
+            self.counts[key] = count
+        else:
+            self.counts.pop(key, None)
+        if count >= self.quorum:
+            self.reached[key] = None
+        else:
+            self.reached.pop(key, None)
+
+    def __getitem__(self, key):
+        """Returns the count of key."""
+        return self.counts.get(key, 0)
+
+
+def statuses_of(status):
+    """Returns the status sets that are subsets of status."""
+    status = set(status) & set(ReplicationEnums)
+    return [s for s in STATUSES if s <= status]
+
+
+class SupportIndex:
+    """Support of requests among the replica structures of other nodes."""
+
+    def __init__(self, id, n, f):
+        """Initializes an empty index for the node with id."""
+        self.id = id
+        self.number_of_nodes = n
+        self.number_of_byzantine = f
+        quorum = n - 2 * f
+        # client requests in pend_reqs
+        self.pend = QuorumCounter(quorum)
+        # requests in req_q with at least the status, per status set
+        self.status = {s: QuorumCounter(quorum) for s in STATUSES}
+        # requests in req_q with at least the status or in r_log
+        self.supported = {s: QuorumCounter(quorum) for s in STATUSES}
+        # client requests in req_q
+        self.client_reqs = QuorumCounter(n - 3 * f)
+        # request -> {node id: entries} for requests in req_q with COMMIT
+        # status or in r_log
+        self.committers = {}
+
+        # node id -> {field: indexed list}
+        self.indexed = {}
+        # node id -> {field: [(counter, key)]} counted for the field
+        self.counted = {}
+        self.refreshes = 0
+
+    def refresh(self, rep):
+        """Updates the index with the fields of rep that were replaced.
+
+        The index is rebuilt from scratch every SUPPORT_INDEX_REBUILD
+        refreshes, so that it converges even if its state is corrupted.
+        """
+        self.refreshes += 1
+        if self.refreshes >= SUPPORT_INDEX_REBUILD:
+            self.rebuild()
+        for j, rs in enumerate(rep):
+            if j == self.id:
+                continue
+            indexed = self.indexed.setdefault(j, {})
+            for field in FIELDS:
+                lst = getattr(rs, field)
+                if indexed.get(field) is not lst:
+                    self.update(j, field, lst)
+                    indexed[field] = lst
+        for j in [j for j in self.indexed if j >= len(rep)]:
+            for field in FIELDS:
+                self.update(j, field, [])
+            del self.indexed[j]
+
+    def rebuild(self):
+        """Clears the index, which is rebuilt by the next refresh."""
+        self.__init__(self.id, self.number_of_nodes,
+                      self.number_of_byzantine)
+
+    def update(self, j, field, lst):
+        """Replaces the counts of field of node j with those of lst."""
+        counted = self.counted.setdefault(j, {})
+        for counter, key in counted.get(field, []):
+            self.count(counter, key, j, -1)
+        counts = []
+        for entry in lst:
+            try:
+                counts.extend(self.counts_of(field, entry))
+            except (KeyError, TypeError, AttributeError) as e:
+                logger.debug(f"Not indexing invalid {field} entry: {e}")
+        for counter, key in counts:
+            self.count(counter, key, j, 1)
+        counted[field] = counts
+
+    def counts_of(self, field, entry):
+        """Returns the (counter, key) pairs to count for an entry."""
+        if field == "pend_reqs":
+            hash(entry)
+            return [(self.pend, entry)]
+        req = entry[REQUEST]
+        hash(req)
+        if field == "r_log":
+            return [(self.supported[s], req) for s in STATUSES] + \
+                [(self.committers, req)]
+        status = statuses_of(entry[STATUS])
+        counts = [(self.status[s], req) for s in status]
+        counts += [(self.supported[s], req) for s in status]
+        client_req = req.get_client_request()
+        hash(client_req)
+        counts.append((self.client_reqs, client_req))
+        if ReplicationEnums.COMMIT in entry[STATUS]:
+            counts.append((self.committers, req))
+        return counts
+
+    def count(self, counter, key, j, delta):
+        """Adds delta to the count of key by node j in counter."""
+        if counter is not self.committers:
+            counter.add(key, delta)
+            return
+        nodes = self.committers.setdefault(key, {})
+        entries = nodes.get(j, 0) + delta
+        if entries:
+            nodes[j] = entries
+        else:
+            nodes.pop(j, None)
+            if not nodes:
+                self.committers.pop(key, None)
+
+    def nodes_committed(self, req):
+        """Returns the other nodes with req committed or in their r_log."""
+        return set(self.committers.get(req, {}))
@@ -0,0 +1,76 @@
+"""Adaptive window of sequence numbers the primary assigns ahead.
+
+The primary assigns sequence numbers up to last_exec() + window. The window
+is kept between number_of_clients and SIGMA * number_of_clients, the fixed
+window of the algorithm, so req_q and r_log stay within their bounds and
+the other nodes accept every assigned request as before.
+
+The window is adapted from the commit latency of the requests the node has
+assigned and the number of requests the window held back. While requests
+are held back and commits take no longer than WINDOW_LATENCY_TOLERANCE
+times the base latency, the lowest commit latency seen lately, the window
+grows by one per commit. When commits take longer it is halved, at most
+once per window of requests assigned.
+"""
+
+# standard
+import time
+
+# local
+from modules.constants import WINDOW_LATENCY_TOLERANCE
+
+# the base latency rises by this factor per commit, to follow a slower
+# network
+BASE_LATENCY_DECAY = 1.01
+
+
+class SeqNumWindow:
+    """Window of sequence numbers between min_size and max_size."""
+
+    def __init__(self, min_size: int, max_size: int):
+        """Initializes the window at max_size."""
+        self.min_size = min(min_size, max_size)
+        self.max_size = max_size
+        self.size = max_size
+        # times the requests in flight were assigned, by seq num
+        self.assigned_at = {}
+        self.base_latency = None
+        # requests held back by the window in the last assignment round
+        self.backlog = 0
+        # the window is not shrunk again for requests assigned before
+        self.shrunk_at = -1
+        self.last_assigned = -1
+
+    def allows(self, seq_num: int, last_exec: int) -> bool:
+        """Returns True if seq_num can be assigned after last_exec."""
+        return seq_num < last_exec + self.size
+
+    def assigned(self, seq_num: int, now: float = None):
+        """Records that seq_num was assigned."""
+        self.assigned_at[seq_num] = time.time() if now is None else now
+        self.last_assigned = max(self.last_assigned, seq_num)
+
+    def held_back(self, count: int):
+        """Records the number of requests the window held back."""
+        self.backlog = count
+
+    def committed(self, seq_num: int, now: float = None):
+        """Adapts the window to the commit latency of seq_num, if known."""
+        for s in [s for s in self.assigned_at if s < seq_num]:
+            # committed without this node seeing it, or a previous view
+            del self.assigned_at[s]
+        start = self.assigned_at.pop(seq_num, None)
+        if start is None or self.min_size == self.max_size:
+            return
+        latency = (time.time() if now is None else now) - start
+        if self.base_latency is None or latency < self.base_latency:
+            self.base_latency = latency
+        else:
+            self.base_latency *= BASE_LATENCY_DECAY
+
+        if latency > WINDOW_LATENCY_TOLERANCE * self.base_latency:
+            if seq_num > self.shrunk_at:
+                self.size = max(self.min_size, self.size // 2)
+                self.shrunk_at = self.last_assigned
+        elif self.backlog > 0:
+            self.size = min(self.max_size, self.size + 1)
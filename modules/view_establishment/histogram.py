@@ -0,0 +1,110 @@
+"""Snapshot of the views of all nodes, grouped for the predicates.
+
+The predicates of PredicatesAndAction each scan the views of all nodes and
+check whether every node is stale. While the View Establishment module
+searches for the current case, the views and phases do not change, so they
+are grouped once into a ViewHistogram: the nodes with each view pair and
+phase, the nodes with each next and current view and the stale nodes. The
+predicates then look up the nodes they need instead of scanning the views.
+"""
+
+# standard
+from collections import Counter
+
+# local
+from modules.enums import ViewEstablishmentEnums as enums
+from modules.constants import CURRENT, NEXT
+
+
+class ViewHistogram:
+    """The views and phases of all nodes, grouped by value.
+
+    Raises KeyError or TypeError if a view pair lacks a view or holds a
+    value that can not be grouped, the predicates then scan the views.
+    """
+
+    def __init__(self, pred_and_action):
+        """Groups the views of pred_and_action and the phases of the nodes."""
+        self.pred_and_action = pred_and_action
+        views = pred_and_action.views
+        get_phs = pred_and_action.view_module.get_phs
+        self.number_of_nodes = len(views)
+        self.phs = [get_phs(k) for k in range(self.number_of_nodes)]
+        self.keys = [frozenset(vpair.items()) for vpair in views]
+
+        # nodes that are not stale, by (view pair, phase) and view pair
+        self.same = {}
+        # nodes that are not stale, by next view, current view and phase
+        self.by_next = {}
+        self.by_current = {}
+        self.by_phs = {}
+        # all nodes by next view, and the ones with current view TEE
+        self.all_by_next = {}
+        self.tee_by_next = {}
+        for k, vpair in enumerate(views):
+            current, next_view = vpair[CURRENT], vpair[NEXT]
+            self.all_by_next.setdefault(next_view, set()).add(k)
+            if current == enums.TEE:
+                self.tee_by_next.setdefault(next_view, set()).add(k)
+            if pred_and_action.stale_v(k):
+                continue
+            self.same.setdefault((self.keys[k], self.phs[k]), set()).add(k)
+            self.same.setdefault((self.keys[k], None), set()).add(k)
+            self.by_next.setdefault(next_view, set()).add(k)
+            self.by_current.setdefault(current, set()).add(k)
+            self.by_phs.setdefault(self.phs[k], set()).add(k)
+        self.next_counts = Counter(vpair[NEXT] for vpair in views)
+        # sizes of same_v_set and transit_set, by view pair and phase of the
+        # node and the phase and mode of the transition
+        self.transit_sizes = {}
+
+    def same_v_set(self, node_j, phase):
+        """See PredicatesAndAction.same_v_set, the set must not be changed."""
+        same = self.same.get((self.keys[node_j], phase), set())
+        if phase != 1:
+            return same
+        vpair = self.pred_and_action.views[node_j]
+        if vpair[CURRENT] == enums.TEE:
+            tee = self.all_by_next.get(vpair[NEXT], set())
+        else:
+            tee = self.tee_by_next.get(vpair[NEXT], set())
+        return same | tee
+
+    def transit_set(self, node_j, phase, mode):
+        """See PredicatesAndAction.transit_set.
+
+        Returns None for an invalid phase or mode.
+        """
+        vpair = self.pred_and_action.views[node_j]
+        if mode == enums.REMAIN:
+            nodes = self.by_next.get(vpair[CURRENT], set())
+        elif mode == enums.FOLLOW and phase == 0:
+            if vpair[CURRENT] != enums.TEE:
+                next_view = (vpair[CURRENT] + 1) % self.number_of_nodes
+            else:
+                next_view = enums.DF_VIEW
+            nodes = self.by_next.get(next_view, set())
+        elif mode == enums.FOLLOW and phase == 1:
+            nodes = self.by_current.get(vpair[NEXT], set())
+        else:
+            return None
+        return nodes - self.by_phs.get(phase, set())
+
+    def transit_sizes_of(self, node_j, phase, mode):
+        """Returns the sizes of the same_v_set and transit_set of node_j.
+
+        Returns (same, transit, union) sizes, with the same_v_set in the
+        phase of node_j, or None for an invalid phase or mode. Nodes with
+        the same view pair and phase share the result.
+        """
+        key = (self.keys[node_j], self.phs[node_j], phase, mode)
+        if key not in self.transit_sizes:
+            same = self.same_v_set(node_j, self.phs[node_j])
+            transit = self.transit_set(node_j, phase, mode)
+            self.transit_sizes[key] = None if transit is None else (
+                len(same), len(transit), len(same | transit))
+        return self.transit_sizes[key]
+
+    def count_next(self, next_view) -> int:
+        """Returns the number of nodes with next_view as next view."""
+        return self.next_counts[next_view]
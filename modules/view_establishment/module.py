@@ -9,12 +9,16 @@ from itertools import compress
 
 # local
 from modules.algorithm_module import AlgorithmModule
+from modules.bitmask import from_ids, to_ids, popcount
 from modules.view_establishment.predicates import PredicatesAndAction
+from modules.view_establishment.record import (
+    as_record, from_record, split_msg_data)
 from modules.enums import ViewEstablishmentEnums
 from resolve.enums import MessageType
 from resolve.enums import Module
 import conf.config as conf
-from modules.constants import (VIEWS, PHASE, WITNESSES, CURRENT, NEXT, VCHANGE)
+from modules.constants import (VIEWS, PHASE, WITNESSES, CURRENT, NEXT, VCHANGE,
+                               EVENT_DRIVEN_REPLICATION)
 import modules.byzantine as byz
 from communication.zeromq.rate_limiter import throttle
 
@@ -44,7 +48,10 @@ class ViewEstablishmentModule(AlgorithmModule):
         self.number_of_nodes = n
         self.id = id
         self.number_of_byzantine = f
-        self.witnesses_set = set()
+        # bitmask of the witnessed processors, see modules/bitmask.py
+        self.witnesses_set = 0
+        # service and view last seen by the replication module
+        self.service = None
 
         # Injection of starting state for integration tests
         if os.getenv("INTEGRATION_TEST") or os.getenv("INJECT_START_STATE"):
@@ -79,11 +86,15 @@ class ViewEstablishmentModule(AlgorithmModule):
             self.lock.acquire()
             # Metric time
             start_time = time.time()
+            # apply the messages received since the last iteration
+            self.resolver.deliver_msgs(Module.VIEW_ESTABLISHMENT_MODULE)
             if(self.pred_and_action.need_reset()):
                 self.pred_and_action.reset_all()
             self.witnesses[self.id] = self.noticed_recent_value()
-            self.witnesses_set = self.witnesses_set.union(self.get_witnesses())
+            self.witnesses_set |= self.get_witnesses()
             if (self.witnes_seen()):
+                # the views do not change until a predicate holds
+                self.pred_and_action.take_snapshot()
                 case = 0
                 # Find the current case by testing the predicates and
                 # moving to next case if not fulfilled
@@ -95,12 +106,16 @@ class ViewEstablishmentModule(AlgorithmModule):
                         case))
                 ):
                     case += 1
+                self.pred_and_action.drop_snapshot()
                 # Onces a predicates is fulfilled, perfom action if valid case
                 if(self.pred_and_action.auto_max_case(self.phs[self.id]) >=
                         case):
                     self.pred_and_action.automation(
                         ViewEstablishmentEnums.ACTION, self.phs[self.id], case)
 
+            if EVENT_DRIVEN_REPLICATION:
+                self.wake_replication()
+
             # Emit run time metric
             run_time = time.time() - start_time
             run_method_time.labels(self.id,
@@ -115,6 +130,13 @@ class ViewEstablishmentModule(AlgorithmModule):
             self.send_msg()
             throttle()
 
+    def wake_replication(self):
+        """Wakes up the replication module if the service or view changed."""
+        service = (self.allow_service(), self.get_current_view(self.id))
+        if service != self.service:
+            self.service = service
+            self.resolver.wake(Module.REPLICATION_MODULE)
+
     # Macros
     def echo_no_witn(self, processor_k):
         """Method description.
@@ -135,12 +157,11 @@ class ViewEstablishmentModule(AlgorithmModule):
         processor i has been witnessed.
         """
         if(self.witnesses[self.id]):
-            processor_set = set()
-            for processor_id in self.witnesses_set:
+            processor_set = 0
+            for processor_id in to_ids(self.witnesses_set):
                 if(self.echo[self.id] == self.echo[processor_id]):
-                    processor_set.add(processor_id)
-            processor_set.union({self.id})
-            return (len(processor_set) >= (
+                    processor_set |= 1 << processor_id
+            return (popcount(processor_set) >= (
                             self.number_of_nodes - self.number_of_byzantine))
 
         return False
@@ -158,7 +179,7 @@ class ViewEstablishmentModule(AlgorithmModule):
         """Use to reset the module."""
         self.phs = [0 for i in range(self.number_of_nodes)]
         self.witnesses = [False for i in range(self.number_of_nodes)]
-        self.witnesses_set = set()
+        self.witnesses_set = 0
 
     # Help methods for the while true loop
     def noticed_recent_value(self):
@@ -178,11 +199,10 @@ class ViewEstablishmentModule(AlgorithmModule):
         """Method description.
 
         Returns the set of processors that processor i knows that they have
-        been witnessed.
+        been witnessed, as a bitmask.
         """
-        processor_set = set(compress(range(len(self.witnesses)),
-                            self.witnesses))
-        return processor_set
+        return from_ids(compress(range(len(self.witnesses)),
+                                 self.witnesses))
 
     # Methods to communicate with Algorithm 2 (View Establishment Module)
     def get_current_view(self, processor_k):
@@ -205,73 +225,51 @@ class ViewEstablishmentModule(AlgorithmModule):
 
         Calls the Resolver to send a message containing the phase, view and
         witnesses of processor i and what processor wants to echo about
-        processor j to processor_j
+        processor j to processor_j. Both are sent as records, see
+        modules/view_establishment/record.py.
         """
         # stay silent if node configured to be unresponsive
         if byz.is_byzantine() and byz.get_byz_behavior() == byz.UNRESPONSIVE:
             return
 
+        # node_i's own data, the same for all nodes
+        views, v_change = self.pred_and_action.get_info(self.id)
+        own_record = as_record(self.phs[self.id], self.witnesses[self.id],
+                               views, v_change)
+        # update own echo instead of sending message
+        self.echo[self.id] = {
+            VIEWS: views,
+            PHASE: self.phs[self.id],
+            WITNESSES: self.witnesses[self.id],
+            VCHANGE: v_change
+        }
+
         nodes = conf.get_nodes()
         for node_j, _ in nodes.items():
-            # update own echo instead of sending message
             if node_j == self.id:
-                predicate_info = self.pred_and_action.get_info(self.id)
-                self.echo[self.id] = {
-                    VIEWS: predicate_info[0],
-                    PHASE: self.phs[self.id],
-                    WITNESSES: self.witnesses[self.id],
-                    VCHANGE: predicate_info[1]
-                }
-            else:
-                # node_i's own data
-                pred_and_action_own_data = self.pred_and_action.get_info(
-                                                self.id)
-                own_data = [deepcopy(self.phs[self.id]),
-                            deepcopy(self.witnesses[self.id]),
-                            deepcopy(pred_and_action_own_data[0]),
-                            deepcopy(pred_and_action_own_data[1])
-                            ]
-                pred_and_action_about_data = self.pred_and_action.get_info(
-                                                node_j)
-                # what node_i thinks about node_j
-                about_data = [deepcopy(self.phs[node_j]),
-                              deepcopy(self.witnesses[node_j]),
-                              deepcopy(pred_and_action_about_data[0]),
-                              deepcopy(pred_and_action_about_data[1])
-                              ]
-
-                # Overwriting own_data to send different views to different
-                # nodes, to trick them
-                # if acting Byzantine with different_views - behaviour
-                if byz.is_byzantine():
-                    if byz.get_byz_behavior() == byz.DIFFERENT_VIEWS:
-                        if (node_j % 2 == 0):
-                            own_data = [0,
-                                        True,
-                                        {CURRENT: 1, NEXT: 1},
-                                        False
-                                        ]
-                        else:
-                            own_data = [0,
-                                        True,
-                                        {CURRENT: 2, NEXT: 2},
-                                        False
-                                        ]
-                    elif byz.get_byz_behavior() == byz.FORCING_RESET:
-                        own_data = [0,
-                                    True,
-                                    self.pred_and_action.RST_PAIR,
-                                    False
-                                    ]
-
-                msg = {"type": MessageType.VIEW_ESTABLISHMENT_MESSAGE,
-                       "sender": self.id,
-                       "data": {
-                                "own_data": deepcopy(own_data),
-                                "about_data": deepcopy(about_data)
-                            }
-                       }
-                self.resolver.send_to_node(node_j, msg)
+                continue
+            # what node_i thinks about node_j
+            views, v_change = self.pred_and_action.get_info(node_j)
+            about_record = as_record(self.phs[node_j],
+                                     self.witnesses[node_j], views, v_change)
+            node_own_record = own_record
+
+            # Overwriting own_data to send different views to different
+            # nodes, to trick them
+            # if acting Byzantine with different_views - behaviour
+            if byz.is_byzantine():
+                if byz.get_byz_behavior() == byz.DIFFERENT_VIEWS:
+                    view = 1 if node_j % 2 == 0 else 2
+                    node_own_record = as_record(
+                        0, True, {CURRENT: view, NEXT: view}, False)
+                elif byz.get_byz_behavior() == byz.FORCING_RESET:
+                    node_own_record = as_record(
+                        0, True, self.pred_and_action.RST_PAIR, False)
+
+            msg = {"type": MessageType.VIEW_ESTABLISHMENT_MESSAGE,
+                   "sender": self.id,
+                   "data": node_own_record + about_record}
+            self.resolver.send_to_node(node_j, msg, skip_unchanged=True)
 
     def receive_msg(self, msg):
         """Method description.
@@ -283,24 +281,23 @@ class ViewEstablishmentModule(AlgorithmModule):
         """
         # id of sender
         j = msg["sender"]
-        # j's own data
-        j_own_data = deepcopy(msg["data"]["own_data"])
-        # what j thinks about me
-        j_about_data = deepcopy(msg["data"]["about_data"])
+        # j's own data and what j thinks about me, new lists and view pairs
+        # built from the records, so no one else holds them
+        own_record, about_record = split_msg_data(msg["data"])
+        j_own_data = from_record(own_record)
+        j_about_data = from_record(about_record)
 
         if(self.pred_and_action.valid(j_own_data)):
             self.echo[j] = {
-                PHASE: deepcopy(j_about_data[0]),
-                WITNESSES: deepcopy(j_about_data[1]),
-                VIEWS: deepcopy(j_about_data[2]),
-                VCHANGE: deepcopy(j_about_data[3])
+                PHASE: j_about_data[0],
+                WITNESSES: j_about_data[1],
+                VIEWS: j_about_data[2],
+                VCHANGE: j_about_data[3]
             }
 
-            self.phs[j] = deepcopy(j_own_data[0])
-            self.witnesses[j] = deepcopy(j_own_data[1])
-            self.pred_and_action.set_info(deepcopy(j_own_data[2]),
-                                          deepcopy(j_own_data[3]),
-                                          j)
+            self.phs[j] = j_own_data[0]
+            self.witnesses[j] = j_own_data[1]
+            self.pred_and_action.set_info(j_own_data[2], j_own_data[3], j)
         else:
             logger.info(f"Not a valid message from " +
                         f"node {j}: {j_own_data}")
@@ -314,7 +311,7 @@ class ViewEstablishmentModule(AlgorithmModule):
             "views": self.pred_and_action.views,
             "vChange": self.pred_and_action.vChange,
             "witnesses": self.witnesses,
-            "witnesses_set": self.witnesses_set,
+            "witnesses_set": to_ids(self.witnesses_set),
             "echo": self.echo,
             "primary": self.get_current_view(self.id)
         }
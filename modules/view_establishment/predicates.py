@@ -8,6 +8,7 @@ import logging
 from resolve.enums import Function, Module
 from modules.enums import ViewEstablishmentEnums as enums
 from modules.constants import CURRENT, NEXT
+from .histogram import ViewHistogram
 
 # metrics
 from metrics.convegence_latency import view_established
@@ -35,6 +36,24 @@ class PredicatesAndAction():
         self.resolver = resolver
         self.vChange = [False for i in range(n)]
         self.RST_PAIR = {CURRENT: enums.TEE, NEXT: enums.DF_VIEW}
+        # views grouped for the predicates while they do not change, see
+        # take_snapshot
+        self.histogram = None
+
+    def take_snapshot(self):
+        """Groups the views for the predicates until drop_snapshot.
+
+        The views and phases must not change in between.
+        """
+        try:
+            self.histogram = ViewHistogram(self)
+        except (KeyError, TypeError):
+            # a view pair that can not be grouped, scan the views
+            self.histogram = None
+
+    def drop_snapshot(self):
+        """Lets the predicates scan the views again."""
+        self.histogram = None
 
     # Macros
     def stale_v(self, node_k):
@@ -89,6 +108,9 @@ class PredicatesAndAction():
         (and phase if passed)
         and if node j is not stale.
         """
+        histogram = self.histogram
+        if histogram is not None:
+            return set(histogram.same_v_set(node_j, phase))
         processor_set = set()
         for processor_id, view_pair in enumerate(self.views):
             # check if either have current as TEE and same next, if so they are
@@ -116,6 +138,12 @@ class PredicatesAndAction():
         Checks if 3f+1 processors have reported to remain in
         or transiting to the phase.
         """
+        histogram = self.histogram
+        sizes = None if histogram is None else histogram.transit_sizes_of(
+            node_j, phase, mode)
+        if sizes is not None:
+            return sizes[2] >= (self.number_of_nodes -
+                                2 * self.number_of_byzantine)
         return(len(
             self.same_v_set(node_j, self.view_module.get_phs(node_j))
             .union(self.transit_set(node_j, phase, mode))) >=
@@ -132,6 +160,11 @@ class PredicatesAndAction():
         - Returns the set of nodes that will support
         to enums.FOLLOW to a new view or to a view change.
         """
+        histogram = self.histogram
+        transit = None if histogram is None else histogram.transit_set(
+            node_j, phase, mode)
+        if transit is not None:
+            return transit
         processor_set_transit = set()
         for processor_id, view_pair in enumerate(self.views):
             if(self.view_module.get_phs(processor_id) != phase and
@@ -185,6 +218,12 @@ class PredicatesAndAction():
         Checks if 4f+1 nodes are willing to move to a view change (phase 0)
         or to a new view (phase 1).
         """
+        histogram = self.histogram
+        sizes = None if histogram is None else histogram.transit_sizes_of(
+            self.id, phase, mode)
+        if sizes is not None:
+            return sizes[0] + sizes[1] >= (self.number_of_nodes -
+                                           self.number_of_byzantine)
         return (len(self.same_v_set(
                 self.id, self.view_module.get_phs(self.id))) +
                 len(self.transit_set(self.id, phase, mode)) >=
@@ -372,11 +411,15 @@ class PredicatesAndAction():
     def changeable(self):
         """Returns if there is enough support for a view change."""
         vchange_true_set = len([v for (v) in self.vChange if v is True])
-        already_phase_1_set = 0
-        for view_pair in self.views:
-            if view_pair[NEXT] == ((
-                    self.views[self.id][CURRENT] + 1) % self.number_of_nodes):
-                already_phase_1_set += 1
+        next_view = (self.views[self.id][CURRENT] + 1) % self.number_of_nodes
+        histogram = self.histogram
+        if histogram is not None:
+            already_phase_1_set = histogram.count_next(next_view)
+        else:
+            already_phase_1_set = 0
+            for view_pair in self.views:
+                if view_pair[NEXT] == next_view:
+                    already_phase_1_set += 1
         return (vchange_true_set + already_phase_1_set) >= (
                                     self.number_of_nodes -
                                     self.number_of_byzantine)
@@ -0,0 +1,39 @@
+"""Compact records of the view establishment data sent between nodes.
+
+Every message of the View Establishment module carries the phase, witness
+flag, view pair and vChange flag of the sender (own data) and what the
+sender knows about the same of the receiver (about data). Each of them is
+sent as a record, a flat tuple
+
+    (phs, witness, current view, next view, vChange)
+
+of ints, bools and enums, and a message as the own record followed by the
+about record. Records are immutable, so the own record is built once per
+iteration and shared by the messages to all nodes.
+"""
+
+# local
+from modules.constants import CURRENT, NEXT
+
+RECORD_LENGTH = 5
+
+
+def as_record(phs, witness, vpair, v_change) -> tuple:
+    """Returns the record of a phase, witness flag, view pair and vChange."""
+    return (phs, witness, vpair.get(CURRENT), vpair.get(NEXT), v_change)
+
+
+def from_record(record):
+    """Returns [phs, witness, view pair, vChange] of record.
+
+    Raises ValueError if record is not a record.
+    """
+    if type(record) is not tuple or len(record) != RECORD_LENGTH:
+        raise ValueError(f"Not a view establishment record: {record}")
+    phs, witness, current, next_view, v_change = record
+    return [phs, witness, {CURRENT: current, NEXT: next_view}, v_change]
+
+
+def split_msg_data(data):
+    """Returns the own and about records of the data of a message."""
+    return (data[:RECORD_LENGTH], data[RECORD_LENGTH:])
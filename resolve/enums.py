@@ -33,6 +33,7 @@ class Function(Enum):
     GET_PEND_REQS = 5
     REP_REQUEST_RESET = 6
     NEED_FLUSH = 7
+    GET_PEND_SNAPSHOT = 10
 
     # Primary Monitoring Module
     NO_VIEW_CHANGE = 8
@@ -2,7 +2,7 @@
 
 # standard
 import logging
-from threading import Lock, Thread
+from threading import Event, Lock, Thread
 import os
 import requests
 import time
@@ -13,8 +13,15 @@ from resolve.enums import Function, Module, MessageType, SystemStatus
 from conf.config import get_nodes
 from modules.replication.models.client_request import ClientRequest
 from communication.zeromq import rate_limiter
+from communication.coalescing_queue import CoalescingQueue
+from communication.refresh import RefreshFilter
+from communication.zeromq.message import Payload
+from resolve.timed_lock import TimedLock
 from metrics.messages import (msg_rtt, msg_sent_size, msgs_sent, bytes_sent,
-                              msgs_during_exp, bytes_during_exp)
+                              msgs_during_exp, bytes_during_exp,
+                              inbound_queue_size, dispatch_wait_time,
+                              msgs_skipped)
+from modules.constants import SKIP_UNCHANGED
 
 # globals
 logger = logging.getLogger(__name__)
@@ -34,9 +41,24 @@ class Resolver:
 
         # locks used to avoid race conditions with modules
         self.view_est_lock = Lock()
-        self.replication_lock = Lock()
+        self.replication_lock = TimedLock("replication")
         self.prim_mon_lock = Lock()
 
+        # received messages waiting to be delivered to the module, drained
+        # by the module thread at the start of each iteration. Messages carry
+        # the state of the sender, so only the newest one from each sender
+        # is kept. Replication messages are applied by the receiver, see
+        # ReplicationModule.receive_rep_msg.
+        self.inbound = {
+            Module.VIEW_ESTABLISHMENT_MODULE: CoalescingQueue(),
+            Module.PRIMARY_MONITORING_MODULE: CoalescingQueue()
+        }
+        # set when something a module loop depends on has changed, see
+        # wait_for_change
+        self.wakeups = {Module.REPLICATION_MODULE: Event()}
+        # state messages sent to each node, to skip sending them unchanged
+        self.refresh = RefreshFilter()
+
         self.own_comm_ready = False
         self.other_comm_ready = False
         self.system_status = SystemStatus.BOOTING
@@ -137,6 +159,8 @@ class Resolver:
         module = self.modules[Module.REPLICATION_MODULE]
         if func == Function.GET_PEND_REQS:
             return module.get_pend_reqs()
+        elif func == Function.GET_PEND_SNAPSHOT:
+            return module.get_pend_snapshot()
         elif func == Function.REP_REQUEST_RESET:
             return module.rep_request_reset()
         elif func == Function.REPLICA_FLUSH:
@@ -165,60 +189,105 @@ class Resolver:
             raise ValueError("Bad function parameter")
 
     # inter-node communication methods
-    def send_to_node(self, node_id, msg_dct, fd_msg=False):
+    def send_to_node(self, node_id, msg_dct, fd_msg=False,
+                     skip_unchanged=False):
         """Sends a message to a given node.
 
-        Message should be a dictionary, which will be serialized to json
+        Message should be a dictionary, which will be serialized
         and converted to a byte object before sent over the links to
-        the other node.
+        the other node. If skip_unchanged, the message is not sent if the
+        node was sent the same message recently, see should_send.
         """
         if node_id not in self.senders and node_id not in self.fd_senders:
             logger.error(f"Non-existing sender for node {node_id}")
 
+        if self.silent_to_node(node_id):
+            return
+
+        try:
+            if fd_msg:
+                self.fd_senders[node_id].add_msg_to_queue(msg_dct)
+            else:
+                payload = Payload(msg_dct)
+                if skip_unchanged and not self.should_send(node_id, payload):
+                    return
+                self.senders[node_id].add_msg_to_queue(payload)
+        except Exception as e:
+            logger.error(f"Something went wrong when sending msg {msg_dct} " +
+                         f"to node {node_id}. Error: {e}")
+
+    def broadcast(self, msg_dct, node_ids=None, skip_unchanged=False):
+        """Broadcasts a message to all nodes, or to the nodes in node_ids.
+
+        The message is serialized once and the same bytes are added to the
+        queue of every sender channel, so later changes to msg_dct do not
+        affect the message sent. If skip_unchanged, the message is not sent
+        to nodes recently sent the same message, see should_send.
+        """
+        try:
+            payload = Payload(msg_dct)
+        except Exception as e:
+            logger.error(f"Something went wrong when encoding msg {msg_dct}" +
+                         f". Error: {e}")
+            return
+        for node_id, sender in self.senders.items():
+            if ((node_ids is None or node_id in node_ids) and
+                    not self.silent_to_node(node_id) and
+                    (not skip_unchanged or
+                     self.should_send(node_id, payload))):
+                sender.add_msg_to_queue(payload)
+
+    def should_send(self, node_id, payload: Payload) -> bool:
+        """Returns False if node_id was recently sent the same payload.
+
+        Payloads are compared by a digest of their data, the same data is
+        sent again every REFRESH_INTERVAL seconds (see RefreshFilter).
+        """
+        if not SKIP_UNCHANGED:
+            return True
+        msg_type = payload.get_msg_type()
+        if self.refresh.should_send(node_id, msg_type, payload.get_digest()):
+            return True
+        msgs_skipped.labels(os.getenv("ID"), node_id, msg_type).inc()
+        return False
+
+    def silent_to_node(self, node_id):
+        """Returns True if no messages should be sent to node_id.
+
+        This is the case if this node is Byzantine and configured to be
+        unresponsive to that node.
+        """
         if byz.is_byzantine():
             # don't send messages if Byzantine and UNRESPONSIVE
             if byz.get_byz_behavior() == byz.UNRESPONSIVE:
-                return
+                return True
             # Only send message to half of the nodes if Byzantine and
             # UNRESPONSIVE_TO_SOME
             if (byz.get_byz_behavior() == byz.UNRESPONSIVE_TO_HALF and
                (node_id % 2 != 0)):
-                return
-
-        try:
-            sender = (self.senders[node_id] if not fd_msg else
-                      self.fd_senders[node_id])
-            sender.add_msg_to_queue(msg_dct)
-        except Exception as e:
-            logger.error(f"Something went wrong when sending msg {msg_dct} " +
-                         f"to node {node_id}. Error: {e}")
+                return True
+        return False
 
-    def broadcast(self, msg_dct):
-        """Broadcasts a message to all nodes."""
-        for node_id, _ in self.senders.items():
-            self.send_to_node(node_id, msg_dct)
+    def dispatch_msg(self, msg, received_at: float = None):
+        """Routes received message to the correct module.
 
-    def dispatch_msg(self, msg):
-        """Routes received message to the correct module."""
+        Messages to modules running in their own loop are put in the
+        inbound queue of the module, such that the receiver never waits for
+        a module to finish its iteration. See deliver_msgs. received_at is
+        the time the message was read from the socket, default now.
+        Replication messages are decoded right away into a buffer the
+        replication module swaps in at the start of its next iteration.
+        """
         msg_type = msg["type"]
         if msg_type == MessageType.VIEW_ESTABLISHMENT_MESSAGE:
-            try:
-                self.view_est_lock.acquire()
-                self.modules[Module.VIEW_ESTABLISHMENT_MODULE].receive_msg(msg)
-            finally:
-                self.view_est_lock.release()
+            self.enqueue_msg(Module.VIEW_ESTABLISHMENT_MODULE, msg,
+                             received_at)
         elif msg_type == MessageType.REPLICATION_MESSAGE:
-            try:
-                self.replication_lock.acquire()
-                self.modules[Module.REPLICATION_MODULE].receive_rep_msg(msg)
-            finally:
-                self.replication_lock.release()
+            self.modules[Module.REPLICATION_MODULE].receive_rep_msg(msg)
+            self.wake(Module.REPLICATION_MODULE)
         elif msg_type == MessageType.PRIMARY_MONITORING_MESSAGE:
-            try:
-                self.prim_mon_lock.acquire()
-                self.modules[Module.PRIMARY_MONITORING_MODULE].receive_msg(msg)
-            finally:
-                self.prim_mon_lock.release()
+            self.enqueue_msg(Module.PRIMARY_MONITORING_MODULE, msg,
+                             received_at)
         elif msg_type == MessageType.FAILURE_DETECTOR_MESSAGE:
             self.modules[Module.FAILURE_DETECTOR_MODULE].receive_msg(msg)
         elif msg_type == MessageType.EVENT_DRIVEN_FD_MESSAGE:
@@ -227,6 +296,63 @@ class Resolver:
             logger.warning(f"Message with invalid type {msg_type} cannot be" +
                            " dispatched")
 
+    def enqueue_msg(self, module, msg, received_at: float = None):
+        """Adds a received message to the inbound queue of module.
+
+        Replaces the queued message from the same sender, if any, which
+        keeps the receipt time of the message it replaces.
+        """
+        queue = self.inbound[module]
+        queue.put(msg, msg.get("sender"), queued_at=received_at)
+        inbound_queue_size.labels(os.getenv("ID"), module).set(queue.qsize())
+        self.wake(module)
+
+    def wake(self, module):
+        """Wakes up the loop of module if it waits for a change."""
+        event = self.wakeups.get(module)
+        if event is not None:
+            event.set()
+
+    def wait_for_change(self, module, timeout) -> bool:
+        """Blocks until module is woken up or for at most timeout seconds.
+
+        Returns True if woken up. Changes after this returns wake up the
+        next call, so a module checking for changes after calling this
+        misses none.
+        """
+        event = self.wakeups[module]
+        woken = event.wait(timeout)
+        event.clear()
+        return woken
+
+    def deliver_msgs(self, module):
+        """Delivers all messages in the inbound queue of module.
+
+        Called by the module thread at the start of its iteration, while
+        holding the lock of the module.
+        """
+        queue = self.inbound[module]
+        if queue.empty():
+            return
+        receive = self.modules[module].receive_msg
+        received_at = None
+        while True:
+            item = queue.get_timed()
+            if item is None:
+                break
+            received_at, msg = item
+            try:
+                receive(msg)
+            except Exception as e:
+                logger.error(f"Error when delivering msg {msg} to module " +
+                             f"{module}. Error: {e}")
+
+        node_id = os.getenv("ID")
+        inbound_queue_size.labels(node_id, module).set(queue.qsize())
+        if received_at is not None:
+            dispatch_wait_time.labels(node_id, module).set(
+                time.time() - received_at)
+
     def on_message_sent(self, msg={}, metric_data={}):
         """Callback function when a communication module has sent the message.
 
@@ -260,11 +386,11 @@ class Resolver:
                     self.fd_bytes += _bytes
 
         # Emit roundtrip time for message
-        if ("rec_id" in metric_data and "recv_hostname" in metric_data and
+        if ("rec_id" in metric_data and "rec_hostname" in metric_data and
            "latency" in metric_data):
             msg_rtt.labels(id,
                            metric_data["rec_id"],
-                           metric_data["recv_hostname"]).set(
+                           metric_data["rec_hostname"]).set(
                                 metric_data["latency"])
         # Emit size of sent message
         if ("msg_type" in metric_data and "bytes_size" in metric_data):
@@ -329,7 +455,10 @@ class Resolver:
 
     def inject_client_req(self, req: ClientRequest):
         """Injects a ClientRequest sent from a client through the API."""
-        return self.modules[Module.REPLICATION_MODULE].inject_client_req(req)
+        pend_reqs = self.modules[Module.REPLICATION_MODULE].inject_client_req(
+            req)
+        self.wake(Module.REPLICATION_MODULE)
+        return pend_reqs
 
     def on_experiment_start(self):
         """Called when the first client request is added to pend_reqs."""
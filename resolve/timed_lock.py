@@ -0,0 +1,51 @@
+"""Lock that reports how long it is waited for and held."""
+
+# standard
+from threading import Lock
+import os
+import time
+
+# local
+from metrics.messages import lock_wait_time, lock_hold_time
+
+
+class TimedLock:
+    """Non-reentrant lock like threading.Lock, observing wait and hold time.
+
+    The times are observed in the lock_wait_time and lock_hold_time
+    histograms, labelled with the name of the lock.
+    """
+
+    def __init__(self, name: str):
+        """Initializes the unlocked lock."""
+        self.name = name
+        self.lock = Lock()
+        self.acquired_at = None
+        node_id = os.getenv("ID")
+        self.wait_time = lock_wait_time.labels(node_id, name)
+        self.hold_time = lock_hold_time.labels(node_id, name)
+
+    def acquire(self):
+        """Blocks until the lock is acquired."""
+        start = time.time()
+        self.lock.acquire()
+        self.acquired_at = time.time()
+        self.wait_time.observe(self.acquired_at - start)
+
+    def release(self):
+        """Releases the lock."""
+        self.hold_time.observe(time.time() - self.acquired_at)
+        self.lock.release()
+
+    def locked(self) -> bool:
+        """Returns True if the lock is held."""
+        return self.lock.locked()
+
+    def __enter__(self):
+        """Acquires the lock in a with statement."""
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        """Releases the lock at the end of a with statement."""
+        self.release()
@@ -0,0 +1,117 @@
+import unittest
+from unittest.mock import MagicMock, patch
+
+from communication import codec
+from communication.constants import BINARY, JSONPICKLE
+from modules.constants import REQUEST, STATUS, X_SET
+from modules.enums import ReplicationEnums, OperationEnums
+from resolve.resolver import Resolver
+from modules.replication.module import ReplicationModule
+from modules.replication.models.request import Request
+from modules.replication.models.client_request import ClientRequest
+from modules.replication.models.operation import Operation
+
+PRE_PREP = ReplicationEnums.PRE_PREP
+PREP = ReplicationEnums.PREP
+COMMIT = ReplicationEnums.COMMIT
+
+
+def client_request(client_id, value):
+    return ClientRequest(client_id, value,
+                         Operation(OperationEnums.APPEND, value))
+
+
+class TestBatching(unittest.TestCase):
+
+    def setUp(self):
+        self.client_reqs = [client_request(i, i) for i in range(3)]
+        self.batch = Request(self.client_reqs[0], 0, 1,
+                             self.client_reqs[1:])
+        self.replication = ReplicationModule(0, Resolver(testing=True), 4,
+                                             1, 3)
+
+    def test_batch_request(self):
+        self.assertEqual(self.batch.get_client_requests(),
+                         tuple(self.client_reqs))
+        self.assertNotEqual(self.batch,
+                            Request(self.client_reqs[0], 0, 1))
+        self.assertEqual(Request(self.client_reqs[0], 0, 1).get_batch(), ())
+        for using in [BINARY, JSONPICKLE]:
+            self.assertEqual(
+                codec.decode(codec.encode(self.batch, using=using)),
+                self.batch)
+        with self.assertRaises(ValueError):
+            Request(self.client_reqs[0], 0, 1, [1])
+
+    @patch("modules.replication.module.BATCH_SIZE", 2)
+    @patch("modules.replication.module.BATCH_TIMEOUT", 1000)
+    def test_unassigned_batches(self):
+        replication = self.replication
+        replication.unassigned_reqs = MagicMock(
+            return_value=self.client_reqs)
+        # the last batch waits for another request
+        self.assertEqual(replication.unassigned_batches(),
+                         [self.client_reqs[:2]])
+        replication.unassigned_reqs = MagicMock(
+            return_value=self.client_reqs[2:])
+        self.assertEqual(replication.unassigned_batches(), [])
+        # until the timeout has passed
+        replication.batch_started -= 1
+        self.assertEqual(replication.unassigned_batches(),
+                         [self.client_reqs[2:]])
+        self.assertIsNone(replication.batch_started)
+
+    def test_commit_batch(self):
+        replication = self.replication
+        own = replication.rep[0]
+        own.set_pend_reqs(self.client_reqs)
+        own.set_req_q([{REQUEST: self.batch,
+                        STATUS: {PRE_PREP, PREP, COMMIT}}])
+        replication.resolver.on_req_exec = MagicMock()
+        replication.commit({REQUEST: self.batch, X_SET: {0, 1, 2}})
+        replication.resolver.on_req_exec.assert_called_once_with(1)
+        self.assertEqual(own.get_rep_state(), [0, 1, 2])
+        self.assertEqual(own.get_pend_reqs(), [])
+        self.assertEqual(own.get_req_q(), [])
+        self.assertEqual(own.get_r_log(),
+                         [{REQUEST: self.batch, X_SET: {0, 1, 2}}])
+        for i in range(3):
+            self.assertEqual(own.get_last_req()[i][REQUEST], self.batch)
+
+        # the r_log of a batch produces the whole batch
+        self.assertEqual(replication.get_corresponding_r_log(
+            [own.get_r_log()], [0, 1, 2]), own.get_r_log())
+
+    def test_double_batched_client_request(self):
+        other = Request(self.client_reqs[2], 0, 2)
+        self.replication.rep[0].set_req_q([
+            {REQUEST: self.batch, STATUS: {PRE_PREP}},
+            {REQUEST: other, STATUS: {PRE_PREP}}])
+        self.assertTrue(self.replication.double())
+        self.replication.rep[0].set_req_q([
+            {REQUEST: self.batch, STATUS: {PRE_PREP}},
+            {REQUEST: self.batch, STATUS: {PRE_PREP}}])
+        self.assertFalse(self.replication.double())
+
+    def test_accept_batch_when_all_known(self):
+        replication = self.replication
+        replication.rep[1].set_req_q([{REQUEST: Request(
+            self.client_reqs[0], 1, 1, self.client_reqs[1:]),
+            STATUS: {PRE_PREP, PREP}}])
+        replication.last_exec = MagicMock(return_value=0)
+        replication.known_pend_reqs = MagicMock(
+            return_value=self.client_reqs[:2])
+        self.assertFalse(replication.accept_req_preprep(
+            self.client_reqs[0], 1))
+        replication.known_pend_reqs = MagicMock(
+            return_value=self.client_reqs)
+        self.assertTrue(replication.accept_req_preprep(
+            self.client_reqs[0], 1))
+        # batched client requests are not unassigned
+        replication.rep[0].set_prim(1)
+        replication.rep[0].set_pend_reqs(self.client_reqs)
+        self.assertEqual(replication.unassigned_reqs(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,26 @@
+import unittest
+
+from modules.bitmask import from_ids, to_ids, contains, popcount
+
+
+class TestBitmask(unittest.TestCase):
+
+    def test_round_trip(self):
+        for ids in [[], [0], [1, 3, 5], list(range(200))]:
+            mask = from_ids(ids)
+            self.assertEqual(to_ids(mask), ids)
+            self.assertEqual(popcount(mask), len(ids))
+        self.assertEqual(from_ids({0, 3, 5}), 0b101001)
+
+    def test_contains(self):
+        mask = from_ids([0, 2, 150])
+        self.assertTrue(contains(mask, 150))
+        self.assertFalse(contains(mask, 1))
+        self.assertFalse(contains(mask, 151))
+        # no valid processor ids, such as the primary when unknown
+        self.assertFalse(contains(mask, -1))
+        self.assertFalse(contains(mask, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
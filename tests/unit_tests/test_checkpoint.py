@@ -0,0 +1,159 @@
+import json
+import unittest
+
+from api.routes import CustomEncoder
+from communication import codec
+from communication.constants import BINARY, JSONPICKLE
+from modules.constants import CHECKPOINT_INTERVAL
+from resolve.resolver import Resolver
+from modules.replication.delta import DeltaGossip
+from modules.replication.module import ReplicationModule
+from modules.replication.models.checkpoint import (
+    GENESIS, State, block_checkpoints, is_prefix_of, common_prefix_length)
+from modules.replication.models.replica_structure import ReplicaStructure
+
+BLOCKS = 3
+LENGTH = BLOCKS * CHECKPOINT_INTERVAL + 20
+
+
+def sealed(entries, blocks):
+    """Replica structure with entries, the first blocks of them sealed."""
+    rs = ReplicaStructure(0, number_of_clients=1)
+    rs.set_rep_state(entries)
+    if blocks:
+        rs.seal(rs.get_checkpoints()[blocks])
+    return rs
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def test_seal(self):
+        entries = list(range(LENGTH))
+        rs = sealed(entries, 2)
+        checkpoint = rs.get_checkpoint()
+        self.assertEqual(checkpoint.length, 2 * CHECKPOINT_INTERVAL)
+        self.assertEqual(checkpoint,
+                         block_checkpoints(GENESIS, entries)[2])
+        self.assertEqual(rs.get_rep_state(),
+                         entries[2 * CHECKPOINT_INTERVAL:])
+        self.assertEqual(rs.state_length(), LENGTH)
+        self.assertFalse(rs.is_rep_state_default())
+        self.assertNotEqual(rs.get_state(), entries)
+
+        # only own block checkpoints after the current one can be sealed
+        other = block_checkpoints(GENESIS, list(range(1, LENGTH)))
+        for cp in [other[3], checkpoint, GENESIS]:
+            with self.assertRaises(ValueError):
+                rs.seal(cp)
+
+    def test_states_with_different_checkpoints(self):
+        entries = list(range(LENGTH))
+        a = sealed(entries, 1).get_state()
+        b = sealed(entries[:-10], 2).get_state()
+        c = sealed(entries[:-10] + [-1], 2).get_state()
+        self.assertTrue(is_prefix_of(b, a))
+        self.assertFalse(is_prefix_of(c, a))
+        self.assertEqual(common_prefix_length(a, b), LENGTH - 10)
+        self.assertEqual(common_prefix_length(a, c), LENGTH - 10)
+
+        # prefixes that end within a sealed prefix can not be compared
+        short = State(entries[:CHECKPOINT_INTERVAL + 1])
+        self.assertFalse(is_prefix_of(short, b))
+        self.assertIsNone(common_prefix_length(short, b))
+        diverged = sealed([-1] + entries[1:], 2).get_state()
+        self.assertFalse(is_prefix_of(diverged, a))
+        self.assertIsNone(common_prefix_length(diverged, a))
+
+    def test_colliding_digests_are_not_equal(self):
+        entries = list(range(LENGTH))
+        # hash() reduces numbers modulo 2^61 - 1
+        forged = entries[:-5] + [entries[-5] + (1 << 61) - 1] + entries[-4:]
+        a = sealed(entries, 1).get_state()
+        b = sealed(forged, 1).get_state()
+        self.assertEqual(a.digests.digest(), b.digests.digest())
+        self.assertFalse(is_prefix_of(a, b))
+        self.assertFalse(is_prefix_of(b, a))
+        self.assertEqual(common_prefix_length(a, b), LENGTH - 5)
+
+    def test_round_trips(self):
+        rs = sealed(list(range(LENGTH)), 2)
+        for using in [BINARY, JSONPICKLE]:
+            decoded = codec.decode(codec.encode(rs, using=using))
+            self.assertEqual(decoded, rs)
+            self.assertEqual(decoded.get_state(), rs.get_state())
+
+    def test_delta_after_sealing(self):
+        rs = sealed(list(range(LENGTH)), 1)
+        sender = DeltaGossip(0, 2)
+        receiver = DeltaGossip(1, 2)
+        [(_, data)] = sender.outgoing(rs, [1])
+        receiver.receive(0, codec.decode(codec.encode(data)))
+        sender.record_ack(1, receiver.acks)
+
+        rs.get_rep_state().append(LENGTH)
+        # block checkpoints start at the current checkpoint
+        rs.seal(rs.get_checkpoints()[1])
+        [(_, data)] = sender.outgoing(rs, [1])
+        self.assertIn("delta", data)
+        self.assertEqual(data["delta"]["lists"]["rep_state"],
+                         (CHECKPOINT_INTERVAL, [LENGTH]))
+        received = receiver.receive(0, codec.decode(codec.encode(data)))
+        self.assertEqual(received, rs)
+
+
+class TestReplicationCheckpoints(unittest.TestCase):
+
+    def setUp(self):
+        self.entries = list(range(LENGTH))
+        self.replication = ReplicationModule(0, Resolver(testing=True), 4,
+                                             1, 1)
+
+    def set_states(self, *states):
+        for rs, state in zip(self.replication.rep, states):
+            rs.set_rep_state(state)
+
+    def test_seals_prefix_agreed_by_n_minus_2f(self):
+        self.set_states(self.entries, self.entries[:-10], [], [])
+        self.replication.seal_checkpoint()
+        own = self.replication.rep[0]
+        self.assertEqual(own.get_checkpoint().length,
+                         BLOCKS * CHECKPOINT_INTERVAL)
+        self.assertEqual(own.get_rep_state(),
+                         self.entries[BLOCKS * CHECKPOINT_INTERVAL:])
+        self.assertEqual(own.state_length(), LENGTH)
+
+        # the other states are still prefixes of the sealed state
+        states = self.replication.com_pref_states(2)[0]
+        self.assertEqual(len(states), 2)
+        prefix = self.replication.find_prefix(states)
+        self.assertEqual(len(prefix), LENGTH - 10)
+        # the prefix is kept after the longest checkpoint
+        self.assertEqual(prefix.entries, self.entries[
+            BLOCKS * CHECKPOINT_INTERVAL:LENGTH - 10])
+
+    def test_no_seal_without_agreement(self):
+        self.set_states(self.entries, [-1] + self.entries[1:], [], [])
+        self.replication.seal_checkpoint()
+        self.assertEqual(self.replication.rep[0].get_checkpoint(), GENESIS)
+
+    def test_keeps_entries_for_r_log(self):
+        length = 2 * CHECKPOINT_INTERVAL
+        self.set_states(self.entries[:length], self.entries[:length])
+        self.replication.seal_checkpoint()
+        # the last block is kept for the r_log of 3 * SIGMA entries
+        self.assertEqual(self.replication.rep[0].get_checkpoint().length,
+                         CHECKPOINT_INTERVAL)
+
+    def test_data_is_json_serializable(self):
+        self.set_states(self.entries, self.entries, [], [])
+        self.replication.seal_checkpoint()
+        checkpoint = self.replication.rep[0].get_checkpoint()
+        data = json.loads(json.dumps(self.replication.get_data(),
+                                     cls=CustomEncoder))
+        self.assertEqual(data["checkpoint"],
+                         {"length": checkpoint.length,
+                          "digest": checkpoint.digest.hex()})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+import unittest
+from unittest.mock import patch
+
+from communication import codec
+from communication.coalescing_queue import CoalescingQueue
+from communication.zeromq.message import Payload
+from communication.zeromq.node import Node
+from communication.zeromq.sender import Sender
+from communication.zeromq import rate_limiter
+from modules.constants import MAX_QUEUE_SIZE
+from resolve.enums import MessageType
+
+
+def msg(msg_type, i):
+    return {"type": msg_type, "sender": 0, "data": {"i": i}}
+
+
+class TestCoalescingQueue(unittest.TestCase):
+
+    def test_unkeyed_messages_are_fifo(self):
+        q = CoalescingQueue()
+        for i in range(5):
+            self.assertTrue(q.put(i))
+        self.assertEqual(q.qsize(), 5)
+        self.assertEqual(q.fifo_size(), 5)
+        self.assertEqual([q.get() for i in range(5)], list(range(5)))
+        self.assertIsNone(q.get())
+        self.assertTrue(q.empty())
+
+    def test_keyed_messages_replace_queued_message(self):
+        q = CoalescingQueue()
+        self.assertTrue(q.put("a1", "a"))
+        self.assertTrue(q.put(1))
+        self.assertTrue(q.put("b1", "b"))
+        self.assertFalse(q.put("a2", "a"))
+        self.assertTrue(q.put(2))
+        self.assertFalse(q.put("a3", "a"))
+        self.assertEqual(q.qsize(), 4)
+        self.assertEqual(q.fifo_size(), 2)
+        # the newest message takes the place of the oldest queued one
+        self.assertEqual([q.get() for i in range(4)], ["a3", 1, "b1", 2])
+        # once sent, a new message with the same key is queued again
+        self.assertTrue(q.put("a4", "a"))
+        self.assertEqual(q.get(), "a4")
+
+    def test_replaced_messages_keep_first_queued_time(self):
+        q = CoalescingQueue()
+        q.put("a1", "a", queued_at=1)
+        q.put(1, queued_at=2)
+        q.put("a2", "a", queued_at=3)
+        self.assertEqual(q.get_timed(), (1, "a2"))
+        self.assertEqual(q.get_timed(), (2, 1))
+        self.assertIsNone(q.get_timed())
+
+        # a full snapshot superseding both keeps the oldest time
+        q.put("full1", "a", pinned=True, queued_at=4)
+        q.put("delta1", "a", queued_at=5)
+        q.put("full2", "a", pinned=True, queued_at=6)
+        self.assertEqual(q.get_timed(), (4, "full2"))
+
+    def test_pinned_messages_are_not_replaced_by_unpinned(self):
+        q = CoalescingQueue()
+        self.assertEqual(q.put("full1", "a", pinned=True), 1)
+        # deltas are queued after the full snapshot and replace each other
+        self.assertEqual(q.put("delta1", "a"), 1)
+        self.assertEqual(q.put("delta2", "a"), 0)
+        self.assertEqual(q.qsize(), 2)
+        # a newer full snapshot supersedes both
+        self.assertEqual(q.put("full2", "a", pinned=True), -1)
+        self.assertEqual(q.put("full3", "a", pinned=True), 0)
+        self.assertEqual(q.put("delta3", "a"), 1)
+        self.assertEqual([q.get(), q.get(), q.get()],
+                         ["full3", "delta3", None])
+
+        # a pinned message taken before the message after it is sent
+        self.assertEqual(q.put("full4", "a", pinned=True), 1)
+        self.assertEqual(q.put("delta4", "a"), 1)
+        self.assertEqual(q.get(), "full4")
+        self.assertEqual(q.put("delta5", "a"), 0)
+        self.assertEqual(q.put("full5", "a", pinned=True), 0)
+        self.assertEqual(q.get(), "full5")
+        self.assertTrue(q.empty())
+
+
+class TestSenderQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.sender = Sender(0, Node(1, "localhost", "127.0.0.1", 5001))
+
+    def tearDown(self):
+        self.sender.socket.close(linger=0)
+
+    def test_state_messages_are_coalesced(self):
+        for i in range(10):
+            for t in [MessageType.REPLICATION_MESSAGE,
+                      MessageType.VIEW_ESTABLISHMENT_MESSAGE,
+                      MessageType.PRIMARY_MONITORING_MESSAGE]:
+                self.sender.add_msg_to_queue(msg(t, i))
+        self.sender.add_msg_to_queue(
+            msg(MessageType.EVENT_DRIVEN_FD_MESSAGE, 0))
+        self.sender.add_msg_to_queue(
+            msg(MessageType.EVENT_DRIVEN_FD_MESSAGE, 1))
+        for i in range(2):
+            self.sender.add_msg_to_queue(
+                msg(MessageType.FAILURE_DETECTOR_MESSAGE, i))
+        self.assertEqual(self.sender.msg_queue.qsize(), 7)
+
+        sent = []
+        payload = self.sender.get_msg_from_queue()
+        while payload is not None:
+            self.assertEqual(type(payload), Payload)
+            sent.append((payload.get_msg_type(),
+                         codec.decode(payload.get_data())["data"]["i"]))
+            payload = self.sender.get_msg_from_queue()
+        self.assertEqual(sent, [
+            (MessageType.REPLICATION_MESSAGE, 9),
+            (MessageType.VIEW_ESTABLISHMENT_MESSAGE, 9),
+            (MessageType.PRIMARY_MONITORING_MESSAGE, 9),
+            (MessageType.EVENT_DRIVEN_FD_MESSAGE, 0),
+            (MessageType.EVENT_DRIVEN_FD_MESSAGE, 1),
+            (MessageType.FAILURE_DETECTOR_MESSAGE, 0),
+            (MessageType.FAILURE_DETECTOR_MESSAGE, 1)
+        ])
+
+    def test_full_structure_is_not_replaced_by_delta(self):
+        full = {"type": MessageType.REPLICATION_MESSAGE, "sender": 0,
+                "data": {"own_replica_structure": None, "version": 1}}
+        self.sender.add_msg_to_queue(full)
+        for i in range(3):
+            self.sender.add_msg_to_queue(
+                msg(MessageType.REPLICATION_MESSAGE, i))
+        first = self.sender.get_msg_from_queue()
+        self.assertTrue(first.is_full())
+        self.assertEqual(codec.decode(first.get_data())["data"]["version"],
+                         1)
+        last = self.sender.get_msg_from_queue()
+        self.assertFalse(last.is_full())
+        self.assertEqual(codec.decode(last.get_data())["data"]["i"], 2)
+        self.assertIsNone(self.sender.get_msg_from_queue())
+
+    def test_slow_link_with_state_messages_is_not_full(self):
+        with patch.object(rate_limiter, "resolver") as resolver:
+            resolver.senders = {1: self.sender}
+            for i in range(MAX_QUEUE_SIZE * 2):
+                self.sender.add_msg_to_queue(
+                    msg(MessageType.REPLICATION_MESSAGE, i))
+            self.assertFalse(rate_limiter.queues_are_full())
+            for i in range(MAX_QUEUE_SIZE + 1):
+                self.sender.add_msg_to_queue(
+                    msg(MessageType.EVENT_DRIVEN_FD_MESSAGE, i))
+            self.assertTrue(rate_limiter.queues_are_full())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+import unittest
+
+from communication import codec
+from communication.constants import BINARY, JSONPICKLE
+from communication.zeromq.message import Message, MessageEnum
+from communication.udp.message import Message as FDMessage
+from resolve.enums import MessageType
+from modules.enums import (ReplicationEnums, OperationEnums,
+                           PrimaryMonitoringEnums, ViewEstablishmentEnums)
+from modules.constants import (REQUEST, STATUS, X_SET, REPLY,
+                               V_STATUS, PRIM, NEED_CHANGE, NEED_CHG_SET)
+from modules.replication.models.replica_structure import ReplicaStructure
+from modules.replication.models.request import Request
+from modules.replication.models.client_request import ClientRequest
+from modules.replication.models.operation import Operation
+
+
+def replica_structure():
+    req1 = Request(ClientRequest(0, 1, Operation(OperationEnums.APPEND, 1)),
+                   0, 1)
+    req2 = Request(ClientRequest(1, 2, Operation(OperationEnums.APPEND,
+                                                 [2, "two"])), 0, 2)
+    dummy = Request(ClientRequest(-1, None, Operation(OperationEnums.NO_OP)),
+                    0, 3)
+    rs = ReplicaStructure(
+        2,
+        number_of_clients=2,
+        rep_state=[1],
+        r_log=[{REQUEST: req1, X_SET: {0, 1, 2, 3}}],
+        pend_reqs=[req2.get_client_request()],
+        req_q=[{REQUEST: req2, STATUS: {ReplicationEnums.PRE_PREP,
+                                        ReplicationEnums.PREP}},
+               {REQUEST: dummy, STATUS: {ReplicationEnums.PRE_PREP}}],
+        last_req=[{REQUEST: req1, REPLY: [1]}, -1],
+        seq_num=2,
+        prim=0
+    )
+    return rs
+
+
+def messages():
+    """One message for each MessageType, as built by the modules."""
+    return {
+        MessageType.VIEW_ESTABLISHMENT_MESSAGE: {
+            "type": MessageType.VIEW_ESTABLISHMENT_MESSAGE,
+            "sender": 1,
+            "data": (0, True, ViewEstablishmentEnums.TEE,
+                     ViewEstablishmentEnums.DF_VIEW, False,
+                     1, False, 2, 3, True)
+        },
+        MessageType.REPLICATION_MESSAGE: {
+            "type": MessageType.REPLICATION_MESSAGE,
+            "sender": 2,
+            "data": {"own_replica_structure": replica_structure()}
+        },
+        MessageType.PRIMARY_MONITORING_MESSAGE: {
+            "type": MessageType.PRIMARY_MONITORING_MESSAGE,
+            "sender": 3,
+            "data": {"vcm": {V_STATUS: PrimaryMonitoringEnums.NO_SERVICE,
+                             PRIM: -1, NEED_CHANGE: True,
+                             NEED_CHG_SET: 0b101001}}
+        },
+        MessageType.FAILURE_DETECTOR_MESSAGE: {
+            "type": MessageType.FAILURE_DETECTOR_MESSAGE,
+            "sender": 4,
+            "data": {"prim_susp": True}
+        },
+        MessageType.EVENT_DRIVEN_FD_MESSAGE: {
+            "type": MessageType.EVENT_DRIVEN_FD_MESSAGE,
+            "sender": 5,
+            "data": {"token": 2**40, "owner_id": 0}
+        }
+    }
+
+
+class TestCodec(unittest.TestCase):
+
+    def round_trip(self, obj, using=BINARY):
+        return codec.decode(codec.encode(obj, using=using))
+
+    def test_builtins_round_trip(self):
+        values = [None, True, False, 0, 127, 128, -1, -2**70, 2**63, 1.5,
+                  "", "åäö", b"\x00\xff", [], [1, [2, [3]]], (1, "a"), (),
+                  {}, {1: "a", "b": [None]}, set(), {1, 2}, frozenset({3})]
+        for v in values:
+            decoded = self.round_trip(v)
+            self.assertEqual(decoded, v)
+            self.assertEqual(type(decoded), type(v))
+
+    def test_enums_keep_their_type(self):
+        for e in [MessageType.REPLICATION_MESSAGE, ReplicationEnums.COMMIT,
+                  OperationEnums.NO_OP, PrimaryMonitoringEnums.V_CHANGE,
+                  ViewEstablishmentEnums.TEE, MessageEnum.RECEIVER_MESSAGE]:
+            decoded = self.round_trip(e)
+            self.assertIs(decoded, e)
+
+    def test_models_round_trip(self):
+        rs = replica_structure()
+        decoded = self.round_trip(rs)
+        self.assertEqual(decoded, rs)
+        self.assertEqual(decoded.get_id(), rs.get_id())
+        self.assertEqual(decoded.number_of_clients, rs.number_of_clients)
+        req = rs.get_req_q()[0][REQUEST]
+        decoded_req = self.round_trip(req)
+        self.assertEqual(decoded_req, req)
+        self.assertEqual(decoded_req.get_client_request().get_operation()
+                         .args, ([2, "two"],))
+        self.assertTrue(self.round_trip(
+            rs.get_req_q()[1][REQUEST]).get_client_request().is_dummy())
+
+    def test_all_message_types_round_trip_with_both_codecs(self):
+        msgs = messages()
+        self.assertEqual(set(msgs.keys()), set(MessageType))
+        for using in [BINARY, JSONPICKLE]:
+            for msg_type, msg in msgs.items():
+                wrapped = Message(MessageEnum.SENDER_MESSAGE, 7, 1, msg)
+                decoded = codec.decode(codec.encode(wrapped, using=using))
+                self.assertEqual(type(decoded), Message)
+                self.assertEqual(decoded.get_type(),
+                                 MessageEnum.SENDER_MESSAGE)
+                self.assertEqual(decoded.get_counter(), 7)
+                self.assertEqual(decoded.get_sender_id(), 1)
+                self.assertEqual(decoded.get_data(), msg)
+
+    def test_fd_message_round_trip(self):
+        msg = messages()[MessageType.FAILURE_DETECTOR_MESSAGE]
+        fd_msg = FDMessage(4, 12, payload=msg)
+        decoded = FDMessage.from_bytes(codec.encode(fd_msg, using=BINARY))
+        self.assertEqual(decoded.get_sender_id(), 4)
+        self.assertEqual(decoded.get_msg_counter(), 12)
+        self.assertEqual(decoded.get_payload(), msg)
+        self.assertTrue(decoded.has_payload())
+        token = FDMessage.from_bytes(codec.encode(FDMessage(4, 13),
+                                                  using=BINARY))
+        self.assertFalse(token.has_payload())
+
+    def test_binary_is_smaller_than_jsonpickle(self):
+        for msg in messages().values():
+            self.assertLess(len(codec.encode(msg, using=BINARY)),
+                            len(codec.encode(msg, using=JSONPICKLE)))
+
+    def test_malformed_data_raises(self):
+        data = codec.encode([1, 2, "three"], using=BINARY)
+        with self.assertRaises(ValueError):
+            codec.decode(data[:-2])
+        with self.assertRaises(ValueError):
+            codec.decode(data + b"\x00")
+        with self.assertRaises(ValueError):
+            codec.decode(bytes([codec.MAGIC, 0x7F]))
+        with self.assertRaises(TypeError):
+            codec.encode(object(), using=BINARY)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import random
+import unittest
+
+from resolve.resolver import Resolver
+from modules.replication.module import ReplicationModule
+from modules.replication.models.client_request import ClientRequest
+from benchmarks.com_pref_states import combinations_com_pref_states
+
+
+def random_replication(rnd, n):
+    """Replication module with random states, many sharing prefixes."""
+    replication = ReplicationModule(0, Resolver(testing=True), n,
+                                    (n - 1) // 3, 1)
+    bases = [[rnd.randint(0, 2) for i in range(6)] for b in range(2)]
+    for rs in replication.rep:
+        kind = rnd.random()
+        if kind < 0.15:
+            # default prefix values
+            continue
+        state = list(rnd.choice(bases)[:rnd.randint(0, 6)])
+        if kind < 0.3:
+            # diverges from the base states
+            state.append(rnd.randint(3, 4))
+        rs.set_rep_state(state)
+        # processors with empty states but not default prefix values
+        rs.set_pend_reqs([ClientRequest(0, 0, None)])
+    return replication
+
+
+class TestComPrefStates(unittest.TestCase):
+
+    def test_equivalent_to_combinations(self):
+        rnd = random.Random(1234)
+        for i in range(300):
+            n = rnd.randint(4, 9)
+            replication = random_replication(rnd, n)
+            for k in range(1, n + 2):
+                self.assertEqual(
+                    replication.com_pref_states(k),
+                    combinations_com_pref_states(replication, k),
+                    f"states {[rs.get_rep_state() for rs in replication.rep]}"
+                    f" k {k}")
+
+    def test_large_cluster(self):
+        rnd = random.Random(4321)
+        replication = random_replication(rnd, 64)
+        states, r_logs, _ = replication.com_pref_states(64 - 2 * 21)
+        self.assertEqual(len(states), 22)
+        prefix = min(states, key=len)
+        for state in states:
+            self.assertEqual(state.entries[:len(prefix)], prefix.entries)
+
+
+if __name__ == '__main__':
+    unittest.main()
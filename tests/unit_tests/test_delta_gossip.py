@@ -0,0 +1,190 @@
+import unittest
+from copy import deepcopy
+
+from communication import codec
+from communication.constants import BINARY, JSONPICKLE
+from modules.constants import (REQUEST, STATUS, X_SET,
+                               FULL_SNAPSHOT_INTERVAL)
+from modules.enums import ReplicationEnums, OperationEnums
+from modules.replication.delta import (DeltaGossip, list_delta,
+                                       apply_list_delta)
+from modules.replication.models.replica_structure import ReplicaStructure
+from modules.replication.models.request import Request
+from modules.replication.models.client_request import ClientRequest
+from modules.replication.models.operation import Operation
+
+
+def request(seq_num):
+    return Request(ClientRequest(seq_num % 2, seq_num,
+                                 Operation(OperationEnums.APPEND, seq_num)),
+                   0, seq_num)
+
+
+class TestDeltaGossip(unittest.TestCase):
+
+    def setUp(self):
+        self.rs = ReplicaStructure(0, number_of_clients=2, prim=0)
+        self.sender = DeltaGossip(0, 2)
+        self.receiver = DeltaGossip(1, 2)
+
+    def gossip(self, using=BINARY):
+        """Sends rs from node 0 to 1 and acks it back, returns the data."""
+        [(ids, data)] = self.sender.outgoing(self.rs, [1])
+        self.assertEqual(ids, [1])
+        data = codec.decode(codec.encode(data, using=using))
+        received = self.receiver.receive(0, data)
+        self.assertEqual(received, self.rs)
+        # node 1 acks in its own replication message
+        [(_, ack_data)] = self.receiver.outgoing(
+            ReplicaStructure(1, number_of_clients=2), [0])
+        self.sender.receive(1, ack_data)
+        return data
+
+    def mutate(self, i):
+        req = request(i)
+        self.rs.set_seq_num(i)
+        self.rs.extend_pend_reqs([req.get_client_request()])
+        self.rs.add_to_req_q({REQUEST: req,
+                              STATUS: {ReplicationEnums.PRE_PREP}})
+        if i % 3 == 0:
+            self.rs.add_to_r_log({REQUEST: req, X_SET: {0, 1}})
+            self.rs.set_rep_state(self.rs.get_rep_state() + [i])
+            self.rs.update_last_req(req.get_client_request().get_client_id(),
+                                    req, i)
+
+    def test_list_delta(self):
+        for base, cur in [([], []), ([], [1]), ([1, 2], [1, 2, 3]),
+                          ([1, 2, 3], [2, 3, 4]), ([1, 2], [3]),
+                          ([1, 2], [])]:
+            self.assertEqual(apply_list_delta(base, list_delta(base, cur)),
+                             cur)
+        self.assertEqual(list_delta([1, 2], [1, 2, 3]), (0, [3]))
+        self.assertEqual(list_delta([1, 2, 3], [2, 3, 4]), (1, [4]))
+        # rep_state is only appended to, anything else replaces it
+        self.assertEqual(list_delta([1, 2, 3], [2, 3, 4], 0), (3, [2, 3, 4]))
+
+    def test_first_message_is_full(self):
+        data = self.gossip()
+        self.assertIn("own_replica_structure", data)
+        self.assertNotIn("delta", data)
+
+    def test_only_changes_are_sent_after_ack(self):
+        self.gossip()
+        self.rs.set_rep_state([1, 2])
+        data = self.gossip()
+        self.assertEqual(set(data.keys()), {"delta", "acks"})
+        self.assertEqual(data["delta"]["lists"], {"rep_state": (0, [1, 2])})
+        self.assertEqual(data["delta"]["fields"], {})
+
+        self.rs.set_rep_state([1, 2, 3])
+        self.rs.set_prim(1)
+        data = self.gossip()
+        self.assertEqual(data["delta"]["lists"], {"rep_state": (0, [3])})
+        self.assertEqual(data["delta"]["fields"], {"prim": 1})
+
+    def test_unchanged_structure_sends_empty_delta(self):
+        self.gossip()
+        version = self.sender.version
+        data = self.gossip()
+        self.assertEqual(self.sender.version, version)
+        self.assertEqual(data["delta"]["lists"], {})
+        self.assertEqual(data["delta"]["fields"], {})
+
+    def test_receiver_reconstructs_structure(self):
+        for using in [BINARY, JSONPICKLE]:
+            self.setUp()
+            for i in range(1, 20):
+                self.mutate(i)
+                self.gossip(using)
+            self.assertEqual(self.receiver.latest(0), self.rs)
+            self.rs.set_r_log(self.rs.get_r_log()[2:])
+            self.rs.remove_from_pend_reqs(request(19).get_client_request())
+            self.gossip(using)
+            self.assertEqual(self.receiver.latest(0), self.rs)
+
+    def test_deltas_sent_before_ack_arrives_apply(self):
+        self.gossip()
+        self.mutate(3)
+        [(_, data)] = self.sender.outgoing(self.rs, [1])
+        first = self.receiver.receive(0, codec.decode(codec.encode(data)))
+        self.assertEqual(first, self.rs)
+        first_copy = deepcopy(first)
+        # the sender has not seen the ack, the delta is from the older base
+        self.gossip()
+        self.mutate(6)
+        self.gossip()
+        self.assertEqual(first, first_copy)
+
+    def test_deltas_sent_after_full_structure_apply(self):
+        self.gossip()
+        self.sender.sends_since_full[1] = FULL_SNAPSHOT_INTERVAL
+        self.mutate(3)
+        [(_, data)] = self.sender.outgoing(self.rs, [1])
+        self.assertIn("own_replica_structure", data)
+        self.receiver.receive(0, codec.decode(codec.encode(data)))
+        # the ack of the full structure has not arrived, so the next delta
+        # is based on the version acked before
+        self.mutate(6)
+        [(_, data)] = self.sender.outgoing(self.rs, [1])
+        self.assertIn("delta", data)
+        received = self.receiver.receive(0, codec.decode(codec.encode(data)))
+        self.assertEqual(received, self.rs)
+
+    def test_delta_with_unknown_base_is_ignored(self):
+        self.gossip()
+        self.mutate(3)
+        [(_, data)] = self.sender.outgoing(self.rs, [1])
+        self.assertIn("delta", data)
+        other = DeltaGossip(1, 2)
+        self.assertIsNone(other.receive(0, data))
+        # a receiver that lost its mirror is sent a full structure again
+        self.sender.receive(1, {"acks": [None, None]})
+        [(_, data)] = self.sender.outgoing(self.rs, [1])
+        self.assertIn("own_replica_structure", data)
+
+    def test_invalid_delta_is_ignored(self):
+        self.gossip()
+        [(_, data)] = self.sender.outgoing(self.rs, [1])
+        data["delta"]["fields"] = {"id": 5}
+        self.assertIsNone(self.receiver.receive(0, data))
+        self.assertEqual(self.receiver.latest(0).get_id(), 0)
+
+    def test_full_structure_sent_periodically(self):
+        kinds = []
+        for i in range(2 * FULL_SNAPSHOT_INTERVAL):
+            data = self.gossip()
+            kinds.append("delta" in data)
+        self.assertEqual(kinds.count(False), 2)
+
+    def test_nodes_with_same_base_are_grouped(self):
+        sender = DeltaGossip(0, 4)
+        groups = sender.outgoing(self.rs, [1, 2, 3])
+        self.assertEqual([ids for ids, _ in groups], [[1, 2, 3]])
+        version = [(sender.epoch, sender.version)]
+        sender.receive(1, {"acks": version + [None] * 3})
+        sender.receive(2, {"acks": version + [None] * 3})
+        self.rs.set_prim(2)
+        groups = sender.outgoing(self.rs, [1, 2, 3])
+        self.assertEqual([ids for ids, _ in groups], [[1, 2], [3]])
+        self.assertIn("delta", groups[0][1])
+        self.assertIn("own_replica_structure", groups[1][1])
+
+    def test_delta_size_does_not_depend_on_state_size(self):
+        sizes = []
+        for state_length in [100, 1000]:
+            self.setUp()
+            # same encoded version size for both runs
+            self.sender.epoch = self.receiver.epoch = 1
+            self.rs.set_rep_state(list(range(state_length)))
+            for i in range(1, 30):
+                self.mutate(i)
+            full = len(codec.encode(self.gossip(), using=BINARY))
+            self.mutate(30)
+            delta = len(codec.encode(self.gossip(), using=BINARY))
+            self.assertLess(delta, full)
+            sizes.append(delta)
+        self.assertEqual(sizes[0], sizes[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,14 +3,14 @@ import os
 from conf import config
 
 
-from unittest.mock import Mock, MagicMock, call
+from unittest.mock import Mock, MagicMock, call, patch
 from resolve.resolver import Resolver
 from resolve.enums import Function, Module
 from modules.replication.models.client_request import ClientRequest
 from modules.replication.models.operation import Operation
 from modules.enums import OperationEnums
 from modules.primary_monitoring.failure_detector import FailureDetectorModule
-from modules.constants import VIEW_CHANGE
+from modules.bitmask import from_ids
 
 class TestFailureDetector(unittest.TestCase):
 
@@ -32,15 +32,13 @@ class TestFailureDetector(unittest.TestCase):
 
     def test_call_replication_module(self):
         fail_det = FailureDetectorModule(0, self.resolver, 6, 1)
-        fail_det.resolver.execute = MagicMock(return_value = [2])
+        fail_det.resolver.execute = MagicMock(return_value = frozenset([2]))
 
-        self.assertEqual(fail_det.get_pend_reqs(),[2])
+        self.assertEqual(fail_det.get_pend_snapshot(), frozenset([2]))
         fail_det.resolver.execute.assert_called_once_with(
             Module.REPLICATION_MODULE,
-            Function.GET_PEND_REQS
+            Function.GET_PEND_SNAPSHOT
         )
-        fail_det.resolver.execute = MagicMock(return_value = VIEW_CHANGE)
-        self.assertEqual(fail_det.get_pend_reqs(), [])
 
     def test_call_allow_serivce(self):
         fail_det = FailureDetectorModule(0, self.resolver, 6, 1)
@@ -86,23 +84,38 @@ class TestFailureDetector(unittest.TestCase):
 
     def test_check_progress_by_prim(self):
         fail_det = FailureDetectorModule(0, self.resolver, 6, 1)
-        fail_det.resolver.execute = MagicMock(return_value = [self.clientRequest1])
+        fail_det.resolver.execute = MagicMock(
+            return_value = frozenset([self.clientRequest1]))
         fail_det.cur_check_req = [self.clientRequest1, self.clientRequest2]
 
         # let cnt not be default value
         fail_det.cnt = 2
-        # There has been progress since clientRequest2 is missing in get_pend_reqs
+        # There has been progress since clientRequest2 is no longer pending
         fail_det.check_progress_by_prim(1)
+        fail_det.resolver.execute.assert_called_once_with(
+            Module.REPLICATION_MODULE,
+            Function.GET_PEND_SNAPSHOT
+        )
         self.assertEqual(fail_det.cur_check_req, [self.clientRequest1])
         self.assertEqual(fail_det.cnt, 0)
 
         # There has been no progress, cnt should be incremented
-        fail_det.cur_check_req = [self.clientRequest1]        
         fail_det.check_progress_by_prim(1)
         self.assertEqual(fail_det.cnt, 1)
 
+        # requests that arrived after cur_check_req was taken are no
+        # progress, neither when assigned
+        fail_det.resolver.execute = MagicMock(
+            return_value = frozenset([self.clientRequest1,
+                                      self.clientRequest2]))
+        fail_det.check_progress_by_prim(1)
+        fail_det.resolver.execute = MagicMock(
+            return_value = frozenset([self.clientRequest1]))
+        fail_det.check_progress_by_prim(1)
+        self.assertEqual(fail_det.cnt, 3)
+
         # cur_check_req is empty, cnt should be reset
-        fail_det.cur_check_req = []        
+        fail_det.cur_check_req = []
         fail_det.check_progress_by_prim(1)
         self.assertEqual(fail_det.cnt, 0)
 
@@ -114,7 +127,7 @@ class TestFailureDetector(unittest.TestCase):
         # All except Node 0 and 3 should increment with 1,
         # Node 0 and 3 should be set to 0
         self.assertEqual(fail_det.beat, [0, 2, 3, 0, 5, 6])
-        self.assertEqual(fail_det.fd_set, {0,1,2,3,4,5})
+        self.assertEqual(fail_det.fd_set, from_ids({0,1,2,3,4,5}))
 
         fail_det.beat = [i for i in range(5)] + [99]
         fail_det.update_beat(3)
@@ -123,7 +136,7 @@ class TestFailureDetector(unittest.TestCase):
         # Node 0 and 3 should be set to 0
         # Node 5 is above the threshold and should not be in fd_set
         self.assertEqual(fail_det.beat, [0, 2, 3, 0, 5, 100])
-        self.assertEqual(fail_det.fd_set, {0,1,2,3,4})
+        self.assertEqual(fail_det.fd_set, from_ids({0,1,2,3,4}))
 
     def test_upon_token_from_pj(self):
         fail_det = FailureDetectorModule(0, self.resolver, 6, 1)
@@ -139,7 +152,7 @@ class TestFailureDetector(unittest.TestCase):
         fail_det.upon_token_from_pj(1, False)
         # Update beat should be called
         self.assertEqual(fail_det.beat, [0, 0, 3, 4, 5, 6])
-        self.assertEqual(fail_det.fd_set, {0,1,2,3,4,5})
+        self.assertEqual(fail_det.fd_set, from_ids({0,1,2,3,4,5}))
 
         # 1 is the new primary hence check_progress_by_prim should be called
         fail_det.check_progress_by_prim.assert_called_once_with(1)
@@ -176,7 +189,7 @@ class TestFailureDetector(unittest.TestCase):
         fail_det.upon_token_from_pj(1, False)
         # Update beat should be called
         self.assertEqual(fail_det.beat, [0, 0, 3, 4, 5, 6])
-        self.assertEqual(fail_det.fd_set, {0,1,2,3,4,5})
+        self.assertEqual(fail_det.fd_set, from_ids({0,1,2,3,4,5}))
 
         # self.id is the new primary hence check_progress_by_prim should not be called
         fail_det.check_progress_by_prim.assert_not_called()
@@ -189,5 +202,49 @@ class TestFailureDetector(unittest.TestCase):
         fail_det.allow_service = MagicMock(return_value = False)
         fail_det.upon_token_from_pj(2, False)
         fail_det.reset.assert_called_once()
+
+    def test_run_drains_tokens(self):
+        fail_det = FailureDetectorModule(0, self.resolver, 6, 1)
+        fail_det.upon_token_from_pj = Mock()
+        fail_det.send_msg = Mock()
+        for sender, prim_susp in [(1, False), (2, False), (1, True)]:
+            fail_det.receive_msg({"sender": sender,
+                                  "data": {"prim_susp": prim_susp}})
+
+        fail_det.run(testing=True)
+        # one token and one reply per node, the newest token is kept
+        fail_det.upon_token_from_pj.assert_has_calls(
+            [call(1, True), call(2, False)])
+        self.assertEqual(fail_det.upon_token_from_pj.call_count, 2)
+        fail_det.send_msg.assert_has_calls([call(1), call(2)])
+        self.assertEqual(fail_det.send_msg.call_count, 2)
+        self.assertTrue(fail_det.msg_queue.empty())
+
+        # no tokens, nothing to reply to
+        fail_det.send_msg.reset_mock()
+        self.assertEqual(fail_det.get_tokens(), {})
+        fail_det.send_msg.assert_not_called()
+
+    def test_time_to_suspicion(self):
+        fail_det = FailureDetectorModule(0, self.resolver, 6, 1)
+        self.resolver.execute = MagicMock(return_value = True)
+        fail_det.allow_service = MagicMock(return_value = True)
+        fail_det.check_progress_by_prim = Mock()
+        fail_det.get_current_view = MagicMock(return_value = 1)
+        fail_det.prim = 1
+        fail_det.prim_progress_at -= 10
+
+        with patch("modules.primary_monitoring.failure_detector."
+                   "time_to_suspicion") as gauge:
+            fail_det.cnt = 101
+            fail_det.upon_token_from_pj(2, False)
+            self.assertTrue(fail_det.prim_susp[0])
+            gauge.labels.assert_called_once_with(0, 1, "cnt")
+            self.assertGreaterEqual(
+                gauge.labels.return_value.set.call_args[0][0], 10)
+
+            # already suspected, the time is not set again
+            fail_det.upon_token_from_pj(2, False)
+            gauge.labels.assert_called_once()
         
 
@@ -5,6 +5,7 @@ from modules.primary_monitoring.module import PrimaryMonitoringModule
 from resolve.enums import Function, Module
 from modules.enums import PrimaryMonitoringEnums as enums
 from modules.constants import V_STATUS, PRIM, NEED_CHANGE, NEED_CHG_SET
+from modules.bitmask import from_ids
 
 
 class TestPredicatesAndAction(unittest.TestCase):
@@ -18,14 +19,14 @@ class TestPredicatesAndAction(unittest.TestCase):
         self.resolver.execute = MagicMock(return_value = 0)
         primary_mod = PrimaryMonitoringModule(0, self.resolver, 6, 1)
         # Create a non-default vcm
-        primary_mod.vcm = [{V_STATUS: enums.V_CHANGE, PRIM: 1, NEED_CHANGE: True, NEED_CHG_SET: {0,2}} for i in range(6)]
+        primary_mod.vcm = [{V_STATUS: enums.V_CHANGE, PRIM: 1, NEED_CHANGE: True, NEED_CHG_SET: from_ids({0,2})} for i in range(6)]
         # Check so that vcm is not in default state
         self.assertNotEqual(primary_mod.vcm,
-            [{V_STATUS: enums.OK, PRIM: 0, NEED_CHANGE: False, NEED_CHG_SET: set()} for i in range(6)])
+            [{V_STATUS: enums.OK, PRIM: 0, NEED_CHANGE: False, NEED_CHG_SET: 0} for i in range(6)])
         # Clean the vcm and check that all elements are set to the default
         primary_mod.clean_state()
         self.assertEqual(primary_mod.vcm,
-            [{V_STATUS: enums.OK, PRIM: 0, NEED_CHANGE: False, NEED_CHG_SET: set()} for i in range(6)])
+            [{V_STATUS: enums.OK, PRIM: 0, NEED_CHANGE: False, NEED_CHG_SET: 0} for i in range(6)])
 
     def test_sup_change(self):
         # Let primary be 0
@@ -33,7 +34,7 @@ class TestPredicatesAndAction(unittest.TestCase):
         primary_mod = PrimaryMonitoringModule(0, self.resolver, 6, 1)
 
         # All nodes are needing change
-        primary_mod.vcm = [{V_STATUS: enums.OK, PRIM: 0, NEED_CHANGE: True, NEED_CHG_SET: {0,1,2,3,4,5}} for i in range(6)]
+        primary_mod.vcm = [{V_STATUS: enums.OK, PRIM: 0, NEED_CHANGE: True, NEED_CHG_SET: from_ids({0,1,2,3,4,5})} for i in range(6)]
         self.assertTrue(primary_mod.sup_change(6))
         # Length of the processor set will not be 7
         self.assertFalse(primary_mod.sup_change(7))
@@ -43,11 +44,11 @@ class TestPredicatesAndAction(unittest.TestCase):
         primary_mod.vcm = [{V_STATUS: enums.OK,
                            PRIM: 0,
                            NEED_CHANGE: True,
-                           NEED_CHG_SET: {0,1,2}} for i in range(3)] + [
+                           NEED_CHG_SET: from_ids({0,1,2})} for i in range(3)] + [
                              {V_STATUS: enums.OK,
                            PRIM: 0,
                            NEED_CHANGE: True,
-                           NEED_CHG_SET: {}} for i in range(3,6)  
+                           NEED_CHG_SET: 0} for i in range(3,6)  
                            ]
 
         self.assertFalse(primary_mod.sup_change(6))
@@ -56,15 +57,34 @@ class TestPredicatesAndAction(unittest.TestCase):
         primary_mod.vcm = [{V_STATUS: enums.OK,
                     PRIM: 0,
                     NEED_CHANGE: True,
-                    NEED_CHG_SET: {0,1,2,3}} for i in range(4)] + [
+                    NEED_CHG_SET: from_ids({0,1,2,3})} for i in range(4)] + [
                         {V_STATUS: enums.OK,
                     PRIM: 0,
                     NEED_CHANGE: False,
-                    NEED_CHG_SET: {}} for i in range(4,6)  
+                    NEED_CHG_SET: 0} for i in range(4,6)  
                     ]
         
         self.assertTrue(primary_mod.sup_change(4))
 
+        # Only the first non-empty need_chg_set of the set is checked
+        for i, ids in enumerate([{0,1,2,3}, {0,1,2,4}, {0,1,2,3}, {0,1,2,3}]):
+            primary_mod.vcm[i][NEED_CHG_SET] = from_ids(ids)
+        self.assertTrue(primary_mod.sup_change(4))
+        primary_mod.vcm[0][NEED_CHG_SET] = 0
+        primary_mod.vcm[1][NEED_CHG_SET] = from_ids({0,1,2})
+        self.assertFalse(primary_mod.sup_change(4))
+
+    def test_receive_msg_ignores_invalid_need_chg_set(self):
+        primary_mod = PrimaryMonitoringModule(0, self.resolver, 6, 1)
+        vcm = {V_STATUS: enums.OK, PRIM: 0, NEED_CHANGE: True,
+               NEED_CHG_SET: from_ids({1})}
+        primary_mod.receive_msg({"sender": 1, "data": {"vcm": vcm}})
+        self.assertEqual(primary_mod.vcm[1], vcm)
+        for need_chg_set in [{1, 2}, -1]:
+            primary_mod.receive_msg({"sender": 1, "data": {"vcm": {
+                **vcm, NEED_CHG_SET: need_chg_set}}})
+            self.assertEqual(primary_mod.vcm[1], vcm)
+
     # Interface functions
     def test_no_view_change(self):
         # Let primary be 0
@@ -75,9 +95,21 @@ class TestPredicatesAndAction(unittest.TestCase):
         self.assertTrue(primary_mod.no_view_change())
 
         # Change V_STATUS to not OK
-        primary_mod.vcm[primary_mod.id] = {V_STATUS: enums.NO_SERVICE, PRIM: 0, NEED_CHANGE: False, NEED_CHG_SET: {}} 
+        primary_mod.vcm[primary_mod.id] = {V_STATUS: enums.NO_SERVICE, PRIM: 0, NEED_CHANGE: False, NEED_CHG_SET: 0} 
         self.assertFalse(primary_mod.no_view_change())
 
+    def test_wake_replication_on_change(self):
+        self.resolver.execute = MagicMock(return_value = 0)
+        primary_mod = PrimaryMonitoringModule(0, self.resolver, 6, 1)
+        module = Module.REPLICATION_MODULE
+        primary_mod.wake_replication()
+        self.assertTrue(self.resolver.wait_for_change(module, 0))
+        primary_mod.wake_replication()
+        self.assertFalse(self.resolver.wait_for_change(module, 0))
+        primary_mod.vcm[primary_mod.id][V_STATUS] = enums.NO_SERVICE
+        primary_mod.wake_replication()
+        self.assertTrue(self.resolver.wait_for_change(module, 0))
+
     # Added functions
     def test_get_df_vcm(self):        
         # Let primary be 1
@@ -85,7 +117,7 @@ class TestPredicatesAndAction(unittest.TestCase):
         primary_mod = PrimaryMonitoringModule(0, self.resolver, 6, 1)
 
         self.assertEqual(primary_mod.get_default_vcm(0),
-            {V_STATUS: enums.OK, PRIM: 1, NEED_CHANGE: False, NEED_CHG_SET: set()})
+            {V_STATUS: enums.OK, PRIM: 1, NEED_CHANGE: False, NEED_CHG_SET: 0})
         
     def test_get_number_of_processors_in_no_service(self):
         primary_mod = PrimaryMonitoringModule(0, self.resolver, 6, 1)
@@ -93,18 +125,18 @@ class TestPredicatesAndAction(unittest.TestCase):
         primary_mod.vcm = [{V_STATUS: enums.NO_SERVICE,
                 PRIM: 0,
                 NEED_CHANGE: False,
-                NEED_CHG_SET: set()
+                NEED_CHG_SET: 0
         } for i in range(6)]
         self.assertEqual(primary_mod.get_number_of_processors_in_no_service(), 6)
         # Only 3 nodes are in status no_service
         primary_mod.vcm = [{V_STATUS: enums.NO_SERVICE,
                 PRIM: 0,
                 NEED_CHANGE: False,
-                NEED_CHG_SET: set()
+                NEED_CHG_SET: 0
         } for i in range(3)] + [{V_STATUS: enums.OK,
                 PRIM: 0,
                 NEED_CHANGE: False,
-                NEED_CHG_SET: set()
+                NEED_CHG_SET: 0
         } for i in range(3,6)]
         self.assertEqual(primary_mod.get_number_of_processors_in_no_service(), 3)
 
@@ -116,23 +148,23 @@ class TestPredicatesAndAction(unittest.TestCase):
         primary_mod.vcm = [{V_STATUS: enums.NO_SERVICE,
                 PRIM: 0,
                 NEED_CHANGE: True,
-                NEED_CHG_SET: set()
+                NEED_CHG_SET: 0
         } for i in range(6)]
         primary_mod.update_need_chg_set()
-        self.assertEqual(primary_mod.vcm[primary_mod.id][NEED_CHG_SET], {0,1,2,3,4,5})
+        self.assertEqual(primary_mod.vcm[primary_mod.id][NEED_CHG_SET], from_ids({0,1,2,3,4,5}))
 
         # Node 0,1,2 need a change
         primary_mod.vcm = [{V_STATUS: enums.NO_SERVICE,
                 PRIM: 0,
                 NEED_CHANGE: True,
-                NEED_CHG_SET: set()
+                NEED_CHG_SET: 0
         } for i in range(3)] + [{V_STATUS: enums.NO_SERVICE,
                 PRIM: 0,
                 NEED_CHANGE: False,
-                NEED_CHG_SET: set()
+                NEED_CHG_SET: 0
         } for i in range(3)]
         primary_mod.update_need_chg_set()
-        self.assertEqual(primary_mod.vcm[primary_mod.id][NEED_CHG_SET], {0,1,2})
+        self.assertEqual(primary_mod.vcm[primary_mod.id][NEED_CHG_SET], from_ids({0,1,2}))
 
         # Half of the nodes has primary 0 and half has primary 1
         # All need change, but not all are in same view
@@ -140,10 +172,10 @@ class TestPredicatesAndAction(unittest.TestCase):
         primary_mod.vcm = [{V_STATUS: enums.NO_SERVICE,
                 PRIM: 0,
                 NEED_CHANGE: True,
-                NEED_CHG_SET: set()
+                NEED_CHG_SET: 0
         } for i in range(6)]
         primary_mod.update_need_chg_set()
-        self.assertEqual(primary_mod.vcm[primary_mod.id][NEED_CHG_SET], {0,2,4})
+        self.assertEqual(primary_mod.vcm[primary_mod.id][NEED_CHG_SET], from_ids({0,2,4}))
 
     
     def test_while_clean_state(self):
@@ -0,0 +1,59 @@
+import time
+import unittest
+from threading import Thread
+from unittest.mock import Mock, patch
+
+from communication.coalescing_queue import CoalescingQueue
+from communication.zeromq import rate_limiter
+from modules.constants import MAX_QUEUE_SIZE
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def setUp(self):
+        sender = Mock()
+        sender.msg_queue = CoalescingQueue()
+        self.queue = sender.msg_queue
+        resolver = Mock()
+        resolver.senders = {1: sender}
+        patcher = patch.object(rate_limiter, "resolver", resolver)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        rate_limiter.pace.last = None
+
+    def test_throttle_blocks_until_queues_drained(self):
+        for i in range(MAX_QUEUE_SIZE + 1):
+            self.queue.put(i)
+        self.assertTrue(rate_limiter.queues_are_full())
+        t = Thread(target=rate_limiter.throttle, args=(False,))
+        t.start()
+        t.join(0.1)
+        self.assertTrue(t.is_alive())
+
+        # draining down to the high watermark is not enough
+        self.queue.get()
+        rate_limiter.notify_drained(self.queue)
+        t.join(0.1)
+        self.assertTrue(t.is_alive())
+
+        while not rate_limiter.queues_have_drained():
+            self.queue.get()
+            rate_limiter.notify_drained(self.queue)
+        t.join(1)
+        self.assertFalse(t.is_alive())
+
+    def test_throttle_paces_loop(self):
+        with patch.object(rate_limiter, "run_sleep", return_value=0.05):
+            start = time.time()
+            for i in range(4):
+                rate_limiter.throttle()
+            # first call does not sleep, the others wait for the interval
+            self.assertGreaterEqual(time.time() - start, 0.15)
+
+            start = time.time()
+            rate_limiter.throttle(paced=False)
+            self.assertLess(time.time() - start, 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
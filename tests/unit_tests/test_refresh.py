@@ -0,0 +1,76 @@
+import unittest
+from unittest.mock import Mock
+
+from communication.refresh import RefreshFilter
+from resolve.resolver import Resolver
+from resolve.enums import MessageType
+from modules.replication.module import ReplicationModule
+
+
+class TestRefreshFilter(unittest.TestCase):
+
+    def test_unchanged_sent_once_per_interval(self):
+        refresh = RefreshFilter(interval=1)
+        self.assertTrue(refresh.should_send(1, "kind", "a", now=0))
+        self.assertFalse(refresh.should_send(1, "kind", "a", now=0.5))
+        # other nodes and kinds are tracked separately
+        self.assertTrue(refresh.should_send(2, "kind", "a", now=0.5))
+        self.assertTrue(refresh.should_send(1, "other", "a", now=0.5))
+        self.assertTrue(refresh.should_send(1, "kind", "a", now=1))
+        self.assertFalse(refresh.should_send(1, "kind", "a", now=1.5))
+
+    def test_changed_sent_immediately(self):
+        refresh = RefreshFilter(interval=1)
+        self.assertTrue(refresh.should_send(1, "kind", "a", now=0))
+        self.assertTrue(refresh.should_send(1, "kind", "b", now=0.1))
+        self.assertTrue(refresh.should_send(1, "kind", "a", now=0.2))
+
+
+class TestSkipUnchanged(unittest.TestCase):
+
+    def setUp(self):
+        self.resolver = Resolver(testing=True)
+        self.resolver.senders = {i: Mock() for i in range(1, 4)}
+
+    def sent_counts(self):
+        return [s.add_msg_to_queue.call_count
+                for s in self.resolver.senders.values()]
+
+    def test_broadcast_skips_unchanged(self):
+        msg = {"type": MessageType.PRIMARY_MONITORING_MESSAGE, "sender": 0,
+               "data": {"vcm": [1, 2]}}
+        self.resolver.broadcast(msg, skip_unchanged=True)
+        self.resolver.broadcast(msg, skip_unchanged=True)
+        self.assertEqual(self.sent_counts(), [1, 1, 1])
+        msg["data"]["vcm"].append(3)
+        self.resolver.broadcast(msg, skip_unchanged=True)
+        self.assertEqual(self.sent_counts(), [2, 2, 2])
+        # messages are always sent without skip_unchanged
+        self.resolver.broadcast(msg)
+        self.assertEqual(self.sent_counts(), [3, 3, 3])
+
+    def test_send_to_node_skips_unchanged(self):
+        msg = {"type": MessageType.VIEW_ESTABLISHMENT_MESSAGE, "sender": 0,
+               "data": {"views": [0, 1]}}
+        for _ in range(2):
+            self.resolver.send_to_node(1, msg, skip_unchanged=True)
+            self.resolver.send_to_node(2, msg, skip_unchanged=True)
+        self.assertEqual(self.sent_counts(), [1, 1, 0])
+        # the same message is sent again once the interval has passed
+        self.resolver.refresh.interval = 0
+        self.resolver.send_to_node(1, msg, skip_unchanged=True)
+        self.assertEqual(self.sent_counts(), [2, 1, 0])
+
+    def test_replication_skips_unchanged_structure(self):
+        replication = ReplicationModule(0, self.resolver, 4, 1, 1)
+        self.assertEqual(replication.changed_for([1, 2, 3]), [1, 2, 3])
+        self.assertEqual(replication.changed_for([1, 2, 3]), [])
+        replication.rep[0].set_rep_state([1])
+        self.assertEqual(replication.changed_for([1, 2, 3]), [1, 2, 3])
+        # a new ack from a node is sent to all nodes
+        replication.gossip.acks[2] = (0, 1)
+        self.assertEqual(replication.changed_for([1, 3]), [1, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import unittest
+from copy import copy
+
+from communication import codec
+from communication.constants import BINARY
+from modules.constants import REQUEST, STATUS, X_SET
+from modules.enums import ReplicationEnums, OperationEnums
+from modules.replication.delta import DeltaGossip
+from modules.replication.models.replica_structure import ReplicaStructure
+from modules.replication.models.request import Request
+from modules.replication.models.client_request import ClientRequest
+from modules.replication.models.operation import Operation
+
+PRE_PREP = ReplicationEnums.PRE_PREP
+PREP = ReplicationEnums.PREP
+
+
+def request(seq_num):
+    return Request(ClientRequest(0, seq_num,
+                                 Operation(OperationEnums.APPEND, seq_num)),
+                   0, seq_num)
+
+
+def structure():
+    rs = ReplicaStructure(0, number_of_clients=2)
+    rs.set_rep_state([1, 2])
+    rs.add_to_r_log({REQUEST: request(1), X_SET: {0}})
+    rs.extend_pend_reqs([request(2).get_client_request()])
+    rs.add_to_req_q({REQUEST: request(3), STATUS: {PRE_PREP}})
+    rs.update_last_req(0, request(1), 1)
+    return rs
+
+
+class TestReplicaStructureSharing(unittest.TestCase):
+
+    def test_clone_shares_entries_but_not_lists(self):
+        rs = structure()
+        clone = rs.clone()
+        self.assertEqual(clone, rs)
+        for field in ["rep_state", "r_log", "pend_reqs", "req_q",
+                      "last_req"]:
+            self.assertIsNot(getattr(clone, field), getattr(rs, field))
+        self.assertIs(clone.get_r_log()[0], rs.get_r_log()[0])
+        self.assertIs(clone.get_req_q()[0][REQUEST],
+                      rs.get_req_q()[0][REQUEST])
+
+        # changes to the own lists and statuses are not seen by the clone
+        rs.get_rep_state().append(3)
+        rs.get_req_q()[0][STATUS].add(PREP)
+        rs.renew_req(rs.get_req_q()[0], 1, 4)
+        self.assertEqual(clone.get_rep_state(), [1, 2])
+        self.assertEqual(clone.get_req_q(),
+                         [{REQUEST: request(3), STATUS: {PRE_PREP}}])
+
+    def test_setters_own_their_lists(self):
+        rs = ReplicaStructure(0)
+        req_q = [{REQUEST: request(1), STATUS: {PRE_PREP}}]
+        rep_state = [1]
+        rs.set_req_q(req_q)
+        rs.set_rep_state(rep_state)
+        rs.get_req_q()[0][STATUS].add(PREP)
+        rs.get_rep_state().append(2)
+        self.assertEqual(req_q[0][STATUS], {PRE_PREP})
+        self.assertEqual(rep_state, [1])
+
+    def test_frozen_structure_can_not_be_changed(self):
+        rs = structure()
+        rs.freeze()
+        self.assertTrue(rs.is_frozen())
+        with self.assertRaises(ValueError):
+            rs.add_to_req_q({REQUEST: request(5), STATUS: {PRE_PREP}})
+        with self.assertRaises(ValueError):
+            rs.set_rep_state([])
+        with self.assertRaises(ValueError):
+            rs.inc_seq_num()
+        with self.assertRaises(ValueError):
+            rs.set_to_tee()
+        # copies are not frozen, and neither are decoded structures
+        self.assertFalse(copy(rs).is_frozen())
+        self.assertFalse(rs.clone().is_frozen())
+        self.assertFalse(codec.decode(codec.encode(rs, using=BINARY))
+                         .is_frozen())
+
+    def test_snapshots_are_frozen(self):
+        rs = structure()
+        sender = DeltaGossip(0, 2)
+        receiver = DeltaGossip(1, 2)
+        [(_, data)] = sender.outgoing(rs, [1])
+        self.assertTrue(data["own_replica_structure"].is_frozen())
+        self.assertFalse(rs.is_frozen())
+        received = receiver.receive(0, codec.decode(codec.encode(data)))
+        self.assertTrue(received.is_frozen())
+        self.assertEqual(received, rs)
+
+    def test_no_defensive_copies(self):
+        root = os.path.join(os.path.dirname(__file__), "..", "..", "modules",
+                            "replication")
+        for path, _, files in os.walk(root):
+            for name in files:
+                if name.endswith(".py"):
+                    with open(os.path.join(path, name)) as f:
+                        self.assertNotIn("deepcopy(", f.read(), name)
+
+
+if __name__ == '__main__':
+    unittest.main()
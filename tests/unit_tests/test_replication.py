@@ -16,6 +16,8 @@ from modules.replication.models.replica_structure import ReplicaStructure
 from modules.replication.models.request import Request
 from modules.replication.models.client_request import ClientRequest
 from modules.replication.models.operation import Operation
+from modules.replication.delta import DeltaGossip
+from communication import codec
 
 class TestReplicationModule(unittest.TestCase):
 
@@ -456,9 +458,12 @@ class TestReplicationModule(unittest.TestCase):
         replication.msg = MagicMock(return_value = [])
         self.assertEqual(replication.committed_set(self.dummyRequest2), {1})
 
-        # The msg will return dummyRequest1 for both processors but it is not in R_LOG for any of the processors
+        # Both processors have reported to commit dummyRequest1 but it is not in R_LOG for any of the processors
         replication.rep[1].set_r_log([])
-        replication.msg = MagicMock(return_value = [self.dummyRequest1])
+        for rs in replication.rep:
+            rs.set_req_q([{REQUEST: self.dummyRequest1, STATUS: {
+                ReplicationEnums.PRE_PREP, ReplicationEnums.PREP,
+                ReplicationEnums.COMMIT}}])
         self.assertEqual(replication.committed_set(self.dummyRequest1),{0, 1})
         # No condition for dummyRequest2 will now be true
         self.assertEqual(replication.committed_set(self.dummyRequest2),set())
@@ -475,6 +480,31 @@ class TestReplicationModule(unittest.TestCase):
         replication.view_changed = False
         self.assertEqual(replication.get_pend_reqs(), [2])
 
+    def test_get_pend_snapshot(self):
+        replication = ReplicationModule(0, Resolver(testing=True), 2, 0, 1)
+        self.assertEqual(replication.get_pend_snapshot(), frozenset())
+
+        replication.get_pend_reqs = MagicMock(return_value = [1, 2])
+        replication.update_pend_snapshot()
+        self.assertEqual(replication.get_pend_snapshot(), frozenset([1, 2]))
+
+        # the snapshot is kept while the structures are unchanged
+        replication.update_pend_snapshot()
+        replication.get_pend_reqs.assert_called_once()
+
+        # no pending requests after a view change
+        replication.get_pend_reqs = MagicMock(return_value = VIEW_CHANGE)
+        replication.rep[1] = ReplicaStructure(1)
+        replication.update_pend_snapshot()
+        self.assertEqual(replication.get_pend_snapshot(), frozenset())
+
+        # the own structure is changed in place
+        replication.get_pend_reqs = MagicMock(return_value = [3])
+        replication.rep[0].set_seq_num(1)
+        replication.gossip.update_version(replication.rep[0])
+        replication.update_pend_snapshot()
+        self.assertEqual(replication.get_pend_snapshot(), frozenset([3]))
+
     def test_rep_request_reset(self):
         replication = ReplicationModule(0, Resolver(testing=True), 2, 0, 1)
 
@@ -955,6 +985,7 @@ class TestReplicationModule(unittest.TestCase):
         replication.act_as_prim_when_view_changed = Mock()
         replication.send_msg = Mock()
         replication.flush_local = Mock()
+        replication.update_pend_snapshot = Mock()
 
         # If not returning arrays, it returns an Mock-object and tests don't pass at all
         replication.find_cons_state = MagicMock(return_value = ([], [], False))
@@ -1829,3 +1860,43 @@ class TestReplicationModule(unittest.TestCase):
 
         self.assertTrue(replication.accept_req_preprep(self.dummyRequest1.get_client_request(), 1))
 
+
+    def test_receive_rep_msg_keeps_received_structure_private(self):
+        replication = ReplicationModule(0, Resolver(testing=True), 2, 0, 1)
+        replication.resolver.execute = MagicMock(return_value=True)
+        sender = DeltaGossip(1, 2)
+        rs = ReplicaStructure(1, rep_state=[1], prim=0)
+
+        def send():
+            [(_, data)] = sender.outgoing(rs, [0])
+            data = codec.decode(codec.encode(data))
+            replication.receive_rep_msg({"sender": 1, "data": data})
+            replication.swap_buffers()
+            sender.receive(0, {"acks": list(replication.gossip.acks)})
+
+        send()
+        first = replication.rep[1]
+        self.assertEqual(first, rs)
+        rs.set_rep_state([1, 2])
+        send()
+        self.assertEqual(replication.rep[1], rs)
+        # the earlier structure, still the base of later deltas, is unchanged
+        self.assertEqual(first.get_rep_state(), [1])
+
+        # only the state is taken during a view change
+        replication.resolver.execute = MagicMock(
+            side_effect=lambda m, f: f == Function.ALLOW_SERVICE)
+        second = replication.rep[1]
+        rs.set_rep_state([1, 2, 3])
+        rs.set_prim(1)
+        send()
+        self.assertEqual(replication.rep[1].get_rep_state(), [1, 2, 3])
+        self.assertEqual(replication.rep[1].get_prim(), 0)
+        self.assertEqual(second.get_rep_state(), [1, 2])
+
+        # messages claiming to be from itself are ignored
+        own = replication.rep[0]
+        replication.receive_rep_msg({"sender": 0, "data": {
+            "own_replica_structure": rs}})
+        replication.swap_buffers()
+        self.assertIs(replication.rep[0], own)
@@ -0,0 +1,143 @@
+import random
+import unittest
+from unittest.mock import patch
+
+from communication import codec
+from communication.constants import BINARY
+from modules.constants import REQUEST, STATUS, X_SET
+from modules.enums import ReplicationEnums, OperationEnums
+from modules.replication.models.replica_structure import ReplicaStructure
+from modules.replication.models.request import Request
+from modules.replication.models.client_request import ClientRequest
+from modules.replication.models.operation import Operation
+from modules.replication.models.request_index import (RequestIndex,
+                                                      request_of)
+
+
+def request(client, seq_num, view=0):
+    return Request(ClientRequest(client, seq_num, Operation(
+        OperationEnums.APPEND, seq_num)), view, seq_num)
+
+
+# The list operations as they were before the index
+def scan_add_to_req_q(req_q, req_pair, limit):
+    if req_pair[REQUEST] not in [x[REQUEST] for x in req_q]:
+        req_q.append(req_pair)
+    while len(req_q) > limit:
+        lowest = min(req_q, key=lambda x: x[REQUEST].get_seq_num())
+        req_q[:] = [x for x in req_q if x[REQUEST] != lowest[REQUEST]]
+
+
+def scan_add_to_r_log(r_log, log_entry, limit):
+    r_log.append(log_entry)
+    while len(r_log) > limit:
+        lowest = min(r_log, key=lambda x: x[REQUEST].get_seq_num())
+        r_log[:] = [x for x in r_log if x != lowest]
+
+
+class TestRequestIndex(unittest.TestCase):
+
+    def test_counts_and_lowest(self):
+        entries = [{REQUEST: request(0, 5)}, {REQUEST: request(1, 3)},
+                   {REQUEST: request(2, 3)}, {REQUEST: request(0, 5)}]
+        index = RequestIndex(entries, request_of, True)
+        self.assertTrue(index.covers(entries))
+        self.assertEqual(index.count(request(0, 5)), 2)
+        self.assertIn(request(1, 3), index)
+        self.assertNotIn(request(1, 4), index)
+        self.assertNotIn({"unhashable": 1}, index)
+        self.assertEqual(index.lowest(), request(1, 3))
+
+        index.removed(entries.pop(1))
+        self.assertEqual(index.lowest(), request(2, 3))
+        entries.append({REQUEST: request(3, 1)})
+        self.assertFalse(index.covers(entries))
+        index.added(entries[-1])
+        self.assertTrue(index.covers(entries))
+        self.assertEqual(index.lowest(), request(3, 1))
+        self.assertFalse(index.covers(list(entries)))
+
+    def test_invalid_entries(self):
+        entries = [{"no request": 1}, {REQUEST: "no seq num"},
+                   {REQUEST: request(0, None)}]
+        index = RequestIndex(entries, request_of, True)
+        self.assertTrue(index.covers(entries))
+        self.assertIsNone(index.lowest())
+        self.assertIn("no seq num", index)
+
+
+class TestReplicaStructureIndexes(unittest.TestCase):
+
+    def test_equivalent_to_list_scans(self):
+        rnd = random.Random(3)
+        rs = ReplicaStructure(0, number_of_clients=2)
+        req_q = []
+        r_log = []
+        pend_reqs = []
+        with patch("modules.replication.models.replica_structure.SIGMA", 3):
+            for i in range(2000):
+                req = request(rnd.randint(0, 3), rnd.randint(0, 20),
+                              rnd.randint(0, 1))
+                op = rnd.random()
+                if op < 0.3:
+                    pair = {REQUEST: req,
+                            STATUS: {ReplicationEnums.PRE_PREP}}
+                    rs.add_to_req_q(pair)
+                    scan_add_to_req_q(req_q, pair, 6)
+                elif op < 0.5:
+                    entry = {REQUEST: req, X_SET: {rnd.randint(0, 1)}}
+                    rs.add_to_r_log(entry)
+                    scan_add_to_r_log(r_log, entry, 18)
+                elif op < 0.6:
+                    rs.remove_from_req_q(req)
+                    req_q[:] = [x for x in req_q if x[REQUEST] != req]
+                elif op < 0.8:
+                    client_req = req.get_client_request()
+                    rs.extend_pend_reqs([client_req])
+                    if client_req not in pend_reqs:
+                        pend_reqs.append(client_req)
+                    del pend_reqs[:-6]
+                elif op < 0.9:
+                    client_req = req.get_client_request()
+                    rs.remove_from_pend_reqs(client_req)
+                    if client_req in pend_reqs:
+                        pend_reqs.remove(client_req)
+                elif op < 0.95 and rs.get_req_q():
+                    # renewing changes the request of a pair in place
+                    pair = rnd.choice(rs.get_req_q())
+                    seq_num = rnd.randint(0, 20)
+                    old = pair[REQUEST]
+                    new = Request(old.get_client_request(), 1, seq_num)
+                    for x in req_q:
+                        if x[REQUEST] == old:
+                            x[REQUEST] = new
+                    rs.renew_req(pair, 1, seq_num)
+                else:
+                    # lists replaced without going through the structure
+                    rs.set_req_q(list(req_q))
+                    rs.r_log = list(r_log)
+
+                self.assertEqual(rs.get_req_q(), req_q)
+                self.assertEqual(rs.get_r_log(), r_log)
+                self.assertEqual(rs.get_pend_reqs(), pend_reqs)
+                self.assertEqual(rs.req_already_exist(req),
+                                 req in [x[REQUEST] for x in req_q])
+                self.assertEqual(rs.exist_in_r_log(req),
+                                 req in [x[REQUEST] for x in r_log])
+
+    def test_indexes_are_not_encoded(self):
+        rs = ReplicaStructure(0, number_of_clients=2)
+        data = codec.encode(rs, using=BINARY)
+        rs.add_to_req_q({REQUEST: request(0, 1),
+                         STATUS: {ReplicationEnums.PRE_PREP}})
+        rs.remove_from_req_q(request(0, 1))
+        rs.extend_pend_reqs([request(0, 1).get_client_request()])
+        rs.remove_from_pend_reqs(request(0, 1).get_client_request())
+        self.assertTrue(rs.exist_in_r_log(request(0, 1)) is False)
+        self.assertEqual(codec.encode(rs, using=BINARY), data)
+        self.assertEqual(set(rs.__getstate__()),
+                         set(ReplicaStructure(1).__dict__))
+
+
+if __name__ == '__main__':
+    unittest.main()
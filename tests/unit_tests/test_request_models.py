@@ -0,0 +1,82 @@
+import pickle
+import unittest
+from copy import copy, deepcopy
+from unittest.mock import patch
+
+from communication import codec
+from communication.constants import BINARY, JSONPICKLE
+from modules.enums import OperationEnums
+from modules.replication.models.request import Request
+from modules.replication.models.client_request import (
+    ClientRequest, intern_client_request)
+from modules.replication.models.operation import Operation
+
+
+def client_request(timestamp, value=None):
+    return ClientRequest(0, timestamp, Operation(
+        OperationEnums.APPEND, timestamp if value is None else value))
+
+
+class TestRequestModels(unittest.TestCase):
+
+    def test_immutable(self):
+        req = Request(client_request(1), 0, 1)
+        for obj, field in [(req, "seq_num"),
+                           (req.get_client_request(), "timestamp"),
+                           (req.get_client_request().get_operation(),
+                            "args")]:
+            with self.assertRaises(AttributeError):
+                setattr(obj, field, 2)
+            with self.assertRaises(AttributeError):
+                delattr(obj, field)
+            with self.assertRaises(AttributeError):
+                obj.other = 1
+        self.assertIs(copy(req), req)
+        self.assertIs(deepcopy(req), req)
+
+    def test_equality_and_hash(self):
+        req = Request(client_request(1), 0, 1)
+        same = Request(client_request(1), 0, 1)
+        self.assertEqual(req, same)
+        self.assertEqual(hash(req), hash(same))
+        self.assertEqual(hash(req), hash((0, 0, 1)))
+        self.assertEqual(hash(req.get_client_request()), hash((0, 1)))
+        self.assertNotEqual(req, Request(client_request(1), 1, 1))
+        self.assertNotEqual(req, Request(client_request(1, 2), 0, 1))
+        self.assertNotEqual(req, req.get_client_request())
+        self.assertFalse(req != same)
+
+    def test_unhashable_operation(self):
+        op = Operation(OperationEnums.APPEND, [1])
+        with self.assertRaises(TypeError):
+            hash(op)
+        self.assertEqual(op, Operation(OperationEnums.APPEND, [1]))
+        # client requests are hashed by client id and timestamp only
+        self.assertEqual(hash(ClientRequest(0, 1, op)), hash((0, 1)))
+
+    def test_round_trips(self):
+        req = Request(client_request(1, [1, "a"]), 2, 3)
+        for using in [BINARY, JSONPICKLE]:
+            decoded = codec.decode(codec.encode(req, using=using))
+            self.assertEqual(decoded, req)
+            self.assertEqual(hash(decoded), hash(req))
+            with self.assertRaises(AttributeError):
+                decoded.view = 1
+        self.assertEqual(pickle.loads(pickle.dumps(req)), req)
+
+    def test_interning(self):
+        req = client_request(1)
+        self.assertIs(intern_client_request(req), req)
+        self.assertIs(intern_client_request(client_request(1)), req)
+        decoded = codec.decode(codec.encode(req, using=BINARY))
+        self.assertIs(decoded, req)
+        self.assertIsNot(intern_client_request(client_request(1, 2)), req)
+        unhashable = client_request(1, [1])
+        self.assertIs(intern_client_request(unhashable), unhashable)
+        with patch("modules.replication.models.client_request."
+                   "INTERN_CLIENT_REQUESTS", False):
+            self.assertIsNot(intern_client_request(client_request(1)), req)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,204 @@
+import unittest
+from threading import Thread
+from unittest.mock import Mock, MagicMock, patch
+
+from communication import codec
+from communication.zeromq.message import Payload
+from resolve.resolver import Resolver
+from resolve.enums import MessageType, Module
+from modules.replication.module import ReplicationModule
+from modules.replication.models.replica_structure import ReplicaStructure
+from modules.replication.models.client_request import ClientRequest
+from modules.replication.models.operation import Operation
+import modules.byzantine as byz
+
+
+class TestResolver(unittest.TestCase):
+
+    def setUp(self):
+        self.resolver = Resolver(testing=True)
+        self.resolver.senders = {i: Mock() for i in range(1, 4)}
+
+    def tearDown(self):
+        byz.set_byz_behavior(byz.NONE)
+
+    def test_broadcast_encodes_once(self):
+        msg = {"type": MessageType.PRIMARY_MONITORING_MESSAGE, "sender": 0,
+               "data": {"vcm": [1, 2]}}
+        self.resolver.broadcast(msg)
+
+        payloads = [s.add_msg_to_queue.call_args[0][0]
+                    for s in self.resolver.senders.values()]
+        self.assertEqual(type(payloads[0]), Payload)
+        # the very same payload object is queued on all senders
+        for p in payloads:
+            self.assertIs(p, payloads[0])
+
+        # changing the message afterwards does not change what is sent
+        msg["data"]["vcm"].append(3)
+        self.assertEqual(codec.decode(payloads[0].get_data())["data"],
+                         {"vcm": [1, 2]})
+        self.assertEqual(payloads[0].get_msg_type(),
+                         MessageType.PRIMARY_MONITORING_MESSAGE)
+
+    def test_broadcast_respects_byzantine_behavior(self):
+        msg = {"type": MessageType.PRIMARY_MONITORING_MESSAGE, "sender": 0,
+               "data": {}}
+        byz.set_byz_behavior(byz.UNRESPONSIVE_TO_HALF)
+        self.resolver.broadcast(msg)
+        self.resolver.senders[1].add_msg_to_queue.assert_not_called()
+        self.resolver.senders[2].add_msg_to_queue.assert_called_once()
+        self.resolver.senders[3].add_msg_to_queue.assert_not_called()
+
+        byz.set_byz_behavior(byz.UNRESPONSIVE)
+        self.resolver.broadcast(msg)
+        self.resolver.senders[2].add_msg_to_queue.assert_called_once()
+
+    def test_replication_send_msg_broadcasts(self):
+        replication = ReplicationModule(0, self.resolver, 4, 1, 1)
+        self.resolver.broadcast = MagicMock()
+        self.resolver.send_to_node = MagicMock()
+        replication.send_msg()
+        self.resolver.send_to_node.assert_not_called()
+        self.resolver.broadcast.assert_called_once()
+        msg, node_ids = self.resolver.broadcast.call_args[0]
+        self.assertEqual(msg["type"], MessageType.REPLICATION_MESSAGE)
+        self.assertEqual(msg["sender"], 0)
+        # a frozen snapshot of the own structure is sent
+        sent = msg["data"]["own_replica_structure"]
+        self.assertEqual(sent, replication.rep[0])
+        self.assertTrue(sent.is_frozen())
+        self.assertEqual(node_ids, [1, 2, 3])
+
+    def test_broadcast_to_some_nodes(self):
+        msg = {"type": MessageType.PRIMARY_MONITORING_MESSAGE, "sender": 0,
+               "data": {}}
+        self.resolver.broadcast(msg, [1, 3])
+        self.resolver.senders[1].add_msg_to_queue.assert_called_once()
+        self.resolver.senders[2].add_msg_to_queue.assert_not_called()
+        self.resolver.senders[3].add_msg_to_queue.assert_called_once()
+
+    def test_dispatch_queues_msgs_for_module_thread(self):
+        prim_mon = Mock()
+        view_est = Mock()
+        self.resolver.modules = {
+            Module.PRIMARY_MONITORING_MODULE: prim_mon,
+            Module.VIEW_ESTABLISHMENT_MODULE: view_est
+        }
+        module = Module.PRIMARY_MONITORING_MODULE
+        msgs = [{"type": MessageType.PRIMARY_MONITORING_MESSAGE,
+                 "sender": i, "data": {}} for i in range(3)]
+        for msg in msgs:
+            self.resolver.dispatch_msg(msg)
+        prim_mon.receive_msg.assert_not_called()
+
+        self.resolver.deliver_msgs(module)
+        self.assertEqual(
+            [c[0][0] for c in prim_mon.receive_msg.call_args_list], msgs)
+        self.assertTrue(self.resolver.inbound[module].empty())
+
+        # a failing message does not stop the delivery of the others
+        prim_mon.receive_msg.side_effect = [ValueError(), None]
+        self.resolver.dispatch_msg(msgs[0])
+        self.resolver.dispatch_msg(msgs[1])
+        self.resolver.deliver_msgs(module)
+        self.assertEqual(prim_mon.receive_msg.call_count, 5)
+        view_est.receive_msg.assert_not_called()
+
+    def test_dispatch_buffers_replication_msgs(self):
+        replication = ReplicationModule(0, self.resolver, 4, 1, 1)
+        self.resolver.modules = {Module.REPLICATION_MODULE: replication}
+        self.resolver.execute = MagicMock(return_value=True)
+        rs = ReplicaStructure(1, rep_state=[1])
+        self.resolver.dispatch_msg({
+            "type": MessageType.REPLICATION_MESSAGE, "sender": 1,
+            "data": {"own_replica_structure": rs}})
+        # the structure is applied at the start of the next iteration
+        self.assertNotEqual(replication.rep[1], rs)
+        self.assertEqual(replication.received, {1: rs})
+        replication.swap_buffers()
+        self.assertIs(replication.rep[1], rs)
+        self.assertEqual(replication.received, {})
+
+        # and so are client requests
+        req = ClientRequest(0, 1, Operation("APPEND", 1))
+        self.assertEqual(self.resolver.inject_client_req(req), [req])
+        self.assertEqual(replication.rep[0].get_pend_reqs(), [])
+        replication.swap_buffers()
+        self.assertEqual(replication.rep[0].get_pend_reqs(), [req])
+        self.assertEqual(replication.lock.name, "replication")
+
+    def test_gossip_is_only_received_with_buffer_lock(self):
+        replication = ReplicationModule(0, self.resolver, 4, 1, 1)
+        self.resolver.modules = {Module.REPLICATION_MODULE: replication}
+        msg = {"type": MessageType.REPLICATION_MESSAGE, "sender": 1,
+               "data": {"own_replica_structure": ReplicaStructure(1),
+                        "version": (1, 1), "acks": [(2, 1)] * 4}}
+        replication.buffer_lock.acquire()
+        receiver = Thread(target=self.resolver.dispatch_msg, args=(msg,))
+        receiver.start()
+        receiver.join(0.1)
+        # send_msg holds the lock, the gossip is not changed meanwhile
+        self.assertEqual(replication.gossip.acks[1], None)
+        self.assertEqual(replication.gossip.acked, {})
+        replication.buffer_lock.release()
+        receiver.join(5)
+        self.assertEqual(replication.gossip.acks[1], (1, 1))
+        self.assertEqual(replication.gossip.acked, {1: (2, 1)})
+
+    def test_only_newest_msg_from_each_sender_is_delivered(self):
+        prim_mon = Mock()
+        self.resolver.modules = {Module.PRIMARY_MONITORING_MODULE: prim_mon}
+        for i in range(3):
+            for sender in [2, 1]:
+                self.resolver.dispatch_msg({
+                    "type": MessageType.PRIMARY_MONITORING_MESSAGE,
+                    "sender": sender, "data": {"vcm": i}})
+        self.resolver.deliver_msgs(Module.PRIMARY_MONITORING_MODULE)
+        self.assertEqual(
+            [c[0][0] for c in prim_mon.receive_msg.call_args_list],
+            [{"type": MessageType.PRIMARY_MONITORING_MESSAGE, "sender": 2,
+              "data": {"vcm": 2}},
+             {"type": MessageType.PRIMARY_MONITORING_MESSAGE, "sender": 1,
+              "data": {"vcm": 2}}])
+
+    @patch("resolve.resolver.time.time", return_value=30)
+    @patch("resolve.resolver.dispatch_wait_time")
+    def test_dispatch_wait_time_counts_from_first_msg(self, wait_time, _):
+        self.resolver.modules = {Module.PRIMARY_MONITORING_MODULE: Mock()}
+        for received_at in [10, 20]:
+            self.resolver.dispatch_msg({
+                "type": MessageType.PRIMARY_MONITORING_MESSAGE,
+                "sender": 1, "data": {}}, received_at)
+        self.resolver.deliver_msgs(Module.PRIMARY_MONITORING_MODULE)
+        # the newer message waited in the slot of the first one
+        wait_time.labels.return_value.set.assert_called_once_with(20)
+
+    def test_changes_wake_up_replication(self):
+        replication = Mock()
+        replication.inject_client_req.return_value = []
+        self.resolver.modules = {Module.REPLICATION_MODULE: replication}
+        module = Module.REPLICATION_MODULE
+        self.assertFalse(self.resolver.wait_for_change(module, 0.01))
+
+        self.resolver.dispatch_msg({"type": MessageType.REPLICATION_MESSAGE,
+                                    "sender": 1, "data": {}})
+        self.assertTrue(self.resolver.wait_for_change(module, 0.01))
+        # the change is only seen once
+        self.assertFalse(self.resolver.wait_for_change(module, 0.01))
+
+        self.resolver.inject_client_req(None)
+        self.assertTrue(self.resolver.wait_for_change(module, 0.01))
+
+        # messages to other modules do not wake up replication
+        self.resolver.dispatch_msg({
+            "type": MessageType.PRIMARY_MONITORING_MESSAGE, "sender": 1,
+            "data": {}})
+        self.assertFalse(self.resolver.wait_for_change(module, 0.01))
+
+        self.resolver.wake(module)
+        self.assertTrue(self.resolver.wait_for_change(module, 0.01))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,207 @@
+import random
+import unittest
+from copy import deepcopy
+
+import jsonpickle
+
+from communication import codec
+from communication.constants import BINARY, JSONPICKLE
+from modules.constants import REQUEST, X_SET
+from modules.enums import OperationEnums
+from modules.replication.models.state_digests import StateDigests, roll
+from modules.replication.models.replica_structure import ReplicaStructure
+from modules.replication.models.request import Request
+from modules.replication.models.client_request import ClientRequest
+from modules.replication.models.operation import Operation
+from modules.replication.delta import DeltaGossip
+from modules.replication.module import ReplicationModule
+from resolve.resolver import Resolver
+
+
+def append_request(seq_num, value):
+    return Request(ClientRequest(0, seq_num,
+                                 Operation(OperationEnums.APPEND, value)),
+                   0, seq_num)
+
+
+class TestStateDigests(unittest.TestCase):
+
+    def test_prefix_digests(self):
+        d = StateDigests.of([1, 2, 3])
+        self.assertEqual(len(d), 3)
+        self.assertEqual(d.digest(), StateDigests.of([1, 2, 3]).digest())
+        self.assertEqual(d.digest(2), StateDigests.of([1, 2]).digest())
+        self.assertEqual(d.digest(0), StateDigests().digest())
+        self.assertNotEqual(d.digest(), StateDigests.of([1, 3, 2]).digest())
+        self.assertEqual(d.segment(1, 3), roll(0, [2, 3]))
+        self.assertEqual(d.segment(3, 3), 0)
+
+    def test_equal_entries_have_equal_digests(self):
+        self.assertEqual(StateDigests.of([1, -1, True]).digest(),
+                         StateDigests.of([1.0, -1.0, 1]).digest())
+        self.assertNotEqual(StateDigests.of([-1]).digest(),
+                            StateDigests.of([-2]).digest())
+
+    def test_unhashable_state(self):
+        self.assertIsNone(StateDigests.of([1, {"a": 1}]))
+        d = StateDigests.of([1])
+        self.assertIsNone(d.extend([[2]]))
+        self.assertEqual(d.extend([2]).digest(),
+                         StateDigests.of([1, 2]).digest())
+
+    def test_extending_shared_digests(self):
+        base = StateDigests.of([1, 2])
+        a = base.extend([3])
+        b = base.extend([4, 5])
+        self.assertEqual(len(base), 2)
+        self.assertEqual(a.digest(), StateDigests.of([1, 2, 3]).digest())
+        self.assertEqual(b.digest(), StateDigests.of([1, 2, 4, 5]).digest())
+        self.assertEqual(base.digest(), StateDigests.of([1, 2]).digest())
+        # extending never changes the digests extended
+        self.assertEqual(base.digests, StateDigests.of([1, 2]).digests)
+        self.assertEqual(a.extend([6]).digest(),
+                         StateDigests.of([1, 2, 3, 6]).digest())
+        self.assertEqual(len(a.digests), 4)
+
+    def test_prefix_checks(self):
+        a = StateDigests.of([1, 2])
+        b = StateDigests.of([1, 2, 3])
+        c = StateDigests.of([1, 3, 3, 4])
+        self.assertTrue(a.is_prefix_of(b))
+        self.assertFalse(b.is_prefix_of(a))
+        self.assertFalse(a.is_prefix_of(c))
+        self.assertEqual(b.common_prefix_length(c), 1)
+        self.assertEqual(a.common_prefix_length(b), 2)
+        self.assertEqual(StateDigests().common_prefix_length(b), 0)
+
+
+class TestReplicaStructureDigests(unittest.TestCase):
+
+    def test_digests_follow_rep_state(self):
+        rs = ReplicaStructure(0)
+        self.assertEqual(len(rs.get_rep_state_digests()), 0)
+        rs.set_rep_state([1, 2])
+        digests = rs.get_rep_state_digests()
+        self.assertEqual(digests.digest(), StateDigests.of([1, 2]).digest())
+        self.assertIs(rs.get_rep_state_digests(), digests)
+
+        # appended in place, as by the APPEND operation
+        rs.get_rep_state().append(3)
+        self.assertEqual(rs.get_rep_state_digests().digest(),
+                         StateDigests.of([1, 2, 3]).digest())
+
+        # set along with the digests of a prefix
+        rs.set_rep_state([1, 2, 3, 4], rs.get_rep_state_digests())
+        self.assertEqual(rs.get_rep_state_digests().digest(),
+                         StateDigests.of([1, 2, 3, 4]).digest())
+
+        rs.set_rep_state([5])
+        self.assertEqual(rs.get_rep_state_digests().digest(),
+                         StateDigests.of([5]).digest())
+        rs.set_to_tee()
+        self.assertEqual(len(rs.get_rep_state_digests()), 0)
+
+    def test_digests_are_not_encoded(self):
+        rs = ReplicaStructure(0, rep_state=[1, 2])
+        rs.get_rep_state_digests()
+        self.assertNotIn("_digests", jsonpickle.encode(rs))
+        for using in (BINARY, JSONPICKLE):
+            decoded = codec.decode(codec.encode(rs, using=using))
+            self.assertEqual(decoded, rs)
+            self.assertEqual(decoded.get_rep_state_digests().digest(),
+                             rs.get_rep_state_digests().digest())
+        self.assertEqual(deepcopy(rs).get_rep_state_digests().digest(),
+                         rs.get_rep_state_digests().digest())
+
+    def test_digests_of_received_deltas(self):
+        sender = DeltaGossip(0, 2)
+        receiver = DeltaGossip(1, 2)
+        rs = ReplicaStructure(0)
+        for i in range(5):
+            rs.get_rep_state().append(i)
+            [(ids, data)] = sender.outgoing(rs, [1])
+            data = codec.decode(codec.encode(data, using=BINARY))
+            received = receiver.receive(0, data)
+            self.assertEqual(received.get_rep_state(), rs.get_rep_state())
+            self.assertEqual(received.get_rep_state_digests().digest(),
+                             StateDigests.of(rs.get_rep_state()).digest())
+            sender.record_ack(1, list(receiver.acks))
+
+
+class TestReplicationDigests(unittest.TestCase):
+
+    def random_replication(self, rnd, n):
+        replication = ReplicationModule(0, Resolver(testing=True), n,
+                                        (n - 1) // 3, 1)
+        base = [rnd.randint(0, 3) for i in range(12)]
+        for rs in replication.rep:
+            state = base[:rnd.randint(0, 12)]
+            if rnd.random() < 0.3:
+                state = state + [rnd.randint(0, 3)]
+            rs.set_rep_state(state)
+        return replication
+
+    def test_equivalent_to_entry_comparisons(self):
+        rnd = random.Random(42)
+        for i in range(100):
+            replication = self.random_replication(rnd, rnd.randint(4, 7))
+            states = [rs.get_rep_state() for rs in replication.rep]
+            digests = [rs.get_rep_state_digests() for rs in replication.rep]
+            for a in range(len(states)):
+                for b in range(len(states)):
+                    self.assertEqual(
+                        replication.prefixes(states[a], states[b],
+                                             digests[a], digests[b]),
+                        replication.prefixes(states[a], states[b]))
+                    self.assertEqual(
+                        replication.is_prefix_of(states[a], states[b],
+                                                 digests[a], digests[b]),
+                        replication.is_prefix_of(states[a], states[b]))
+            # copies are not rep_states of processors, so not digested
+            copies = [list(state) for state in states]
+            self.assertIsNone(replication.known_rep_state_digests(copies))
+            self.assertEqual(replication.find_prefix(states),
+                             replication.find_prefix(copies))
+
+    def test_colliding_digests_are_not_prefixes(self):
+        replication = ReplicationModule(0, Resolver(testing=True), 4, 1, 1)
+        # hash() reduces numbers modulo 2^61 - 1
+        colliding = 2 + (1 << 61) - 1
+        replication.rep[0].set_rep_state([1, 2, 3])
+        replication.rep[1].set_rep_state([1, colliding, 3])
+        replication.rep[2].set_rep_state([1, colliding, 3, 4])
+        states = [rs.get_rep_state() for rs in replication.rep[:3]]
+        digests = [rs.get_rep_state_digests() for rs in replication.rep[:3]]
+        self.assertEqual(digests[0].digest(), digests[1].digest())
+
+        self.assertFalse(replication.prefixes(states[0], states[1],
+                                              digests[0], digests[1]))
+        self.assertFalse(replication.prefixes(states[2], states[0],
+                                              digests[2], digests[0]))
+        self.assertFalse(replication.is_prefix_of(states[0], states[2],
+                                                  digests[0], digests[2]))
+        self.assertTrue(replication.is_prefix_of(states[1], states[2],
+                                                 digests[1], digests[2]))
+        self.assertEqual(replication.find_prefix(states), [1])
+
+    def test_get_corresponding_r_log(self):
+        replication = ReplicationModule(0, Resolver(testing=True), 4, 1, 1)
+        r_log = [{REQUEST: append_request(i, v), X_SET: set()}
+                 for i, v in enumerate([7, 8, 9, 8, 9])]
+        self.assertEqual(
+            replication.get_corresponding_r_log([r_log], [1, 7, 8, 9]),
+            r_log[:3])
+        self.assertEqual(
+            replication.get_corresponding_r_log([r_log], [7, 8, 9, 8, 9]),
+            r_log)
+        self.assertEqual(
+            replication.get_corresponding_r_log([r_log], [1, 2]), [])
+        # unhashable entries are compared entry by entry
+        r_log = [{REQUEST: append_request(0, [7]), X_SET: set()}]
+        self.assertEqual(
+            replication.get_corresponding_r_log([r_log], [[1], [7]]),
+            r_log)
+
+
+if __name__ == '__main__':
+    unittest.main()
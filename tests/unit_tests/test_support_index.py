@@ -0,0 +1,201 @@
+import random
+import unittest
+from collections import Counter
+from copy import copy
+from unittest.mock import patch
+
+from modules.constants import REQUEST, STATUS, X_SET
+from modules.enums import ReplicationEnums, OperationEnums
+from modules.replication.models.replica_structure import ReplicaStructure
+from modules.replication.models.request import Request
+from modules.replication.models.client_request import ClientRequest
+from modules.replication.models.operation import Operation
+from modules.replication.module import ReplicationModule
+from modules.replication.support import QuorumCounter, STATUSES
+from resolve.resolver import Resolver
+
+PRE_PREP = ReplicationEnums.PRE_PREP
+PREP = ReplicationEnums.PREP
+COMMIT = ReplicationEnums.COMMIT
+STATUS_SETS = [{PRE_PREP}, {PRE_PREP, PREP}, {PRE_PREP, PREP, COMMIT}]
+
+
+# The predicates as they were before the support index, scanning the
+# replica structures of all processors
+def scan_unsup_req(replication):
+    for request in replication.rep[replication.id].get_req_q():
+        processors_supporting = 0
+        client_request = request[REQUEST].get_client_request()
+        for rs in replication.rep:
+            for req_pair in rs.get_req_q():
+                if client_request == req_pair[REQUEST].get_client_request():
+                    processors_supporting += 1
+        if processors_supporting < (replication.number_of_nodes - 3 *
+                                    replication.number_of_byzantine):
+            return True
+    return False
+
+
+def quorum(replication):
+    return replication.number_of_nodes - 2 * replication.number_of_byzantine
+
+
+def scan_known_pend_reqs(replication):
+    count = Counter()
+    for rs in replication.rep:
+        count.update(rs.get_pend_reqs())
+    return [k for k, v in count.items() if v >= quorum(replication)]
+
+
+def scan_known_reqs(replication, status):
+    request_set = []
+    for req_pair in replication.rep[replication.id].get_req_q():
+        processor_set = 0
+        if status <= req_pair[STATUS]:
+            for rs in replication.rep:
+                for request_pair in rs.get_req_q():
+                    if (req_pair[REQUEST] == request_pair[REQUEST] and
+                            status <= request_pair[STATUS]):
+                        processor_set += 1
+        if processor_set >= quorum(replication):
+            request_set.append(req_pair)
+    return request_set
+
+
+def scan_supported_reqs(replication, status):
+    count = Counter()
+    for rs in replication.rep:
+        for req_pair in rs.get_req_q():
+            if status <= req_pair[STATUS]:
+                count[req_pair[REQUEST]] += 1
+        for applied_req in rs.get_r_log():
+            count[applied_req[REQUEST]] += 1
+    own_r_log = [x[REQUEST] for x in replication.rep[replication.id].get_r_log()]
+    return [k for k, v in count.items()
+            if v >= quorum(replication) and k not in own_r_log]
+
+
+def scan_committed_set(replication, request):
+    processor_set = set()
+    for rs in replication.rep:
+        if request in [x[REQUEST] for x in rs.get_req_q()
+                       if COMMIT in x[STATUS]]:
+            processor_set.add(rs.get_id())
+        elif rs.exist_in_r_log(request):
+            processor_set.add(rs.get_id())
+    return processor_set
+
+
+def scan_get_unknown_supported_prep(replication):
+    count = Counter()
+    for rs in replication.rep:
+        for req_pairs in rs.get_req_q():
+            if {PREP} <= req_pairs[STATUS]:
+                for rp in replication.rep[replication.id].get_req_q():
+                    if rp[REQUEST] != req_pairs[REQUEST]:
+                        count[req_pairs[REQUEST]] += 1
+    return [k for k, v in count.items() if v >= quorum(replication)]
+
+
+def random_request(rnd):
+    seq_num = rnd.randint(0, 5)
+    return Request(ClientRequest(rnd.randint(0, 2), seq_num, Operation(
+        OperationEnums.APPEND, seq_num)), rnd.randint(0, 1), seq_num)
+
+
+def random_structure(rnd, i):
+    rs = ReplicaStructure(i)
+    rs.set_pend_reqs([random_request(rnd).get_client_request()
+                      for k in range(rnd.randint(0, 4))])
+    rs.set_req_q([{REQUEST: random_request(rnd),
+                   STATUS: set(rnd.choice(STATUS_SETS))}
+                  for k in range(rnd.randint(0, 4))])
+    rs.set_r_log([{REQUEST: random_request(rnd), X_SET: {i}}
+                  for k in range(rnd.randint(0, 2))])
+    return rs
+
+
+class TestQuorumCounter(unittest.TestCase):
+
+    def test_reached(self):
+        counter = QuorumCounter(2)
+        counter.add("a")
+        self.assertEqual(list(counter.reached), [])
+        counter.add("a")
+        counter.add("b", 3)
+        self.assertEqual(list(counter.reached), ["a", "b"])
+        counter.add("a", -1)
+        self.assertEqual(list(counter.reached), ["b"])
+        counter.add("a", -1)
+        self.assertEqual(counter["a"], 0)
+        self.assertNotIn("a", counter.counts)
+
+
+class TestSupportIndex(unittest.TestCase):
+
+    def assert_equivalent(self, replication):
+        rep = replication
+        self.assertEqual(rep.unsup_req(), scan_unsup_req(rep))
+        self.assertCountEqual(rep.known_pend_reqs(),
+                              scan_known_pend_reqs(rep))
+        self.assertCountEqual(rep.get_unknown_supported_prep(),
+                              scan_get_unknown_supported_prep(rep))
+        for status in [set(s) for s in STATUSES]:
+            self.assertEqual(rep.known_reqs(status),
+                             scan_known_reqs(rep, status))
+            self.assertCountEqual(rep.supported_reqs(status),
+                                  scan_supported_reqs(rep, status))
+        requests = set()
+        for rs in rep.rep:
+            requests.update(x[REQUEST] for x in rs.get_req_q())
+            requests.update(x[REQUEST] for x in rs.get_r_log())
+        for request in requests:
+            self.assertEqual(rep.committed_set(request),
+                             scan_committed_set(rep, request))
+
+    def test_equivalent_to_scanning_predicates(self):
+        rnd = random.Random(7)
+        for i in range(50):
+            n = rnd.randint(4, 7)
+            f = (n - 1) // 3
+            replication = ReplicationModule(0, Resolver(testing=True), n, f,
+                                            3)
+            replication.rep = [random_structure(rnd, j) for j in range(n)]
+            self.assert_equivalent(replication)
+
+            # structures received from other nodes replace the old ones
+            for k in range(5):
+                j = rnd.randint(1, n - 1)
+                if rnd.random() < 0.5:
+                    replication.rep[j] = random_structure(rnd, j)
+                else:
+                    rs = copy(replication.rep[j])
+                    rs.set_req_q(random_structure(rnd, j).get_req_q())
+                    replication.rep[j] = rs
+                # own structure changes in place
+                own = replication.rep[0]
+                own.add_to_req_q({REQUEST: random_request(rnd),
+                                  STATUS: {PRE_PREP}})
+                for req_pair in own.get_req_q():
+                    req_pair[STATUS].add(PREP)
+                self.assert_equivalent(replication)
+
+    def test_index_is_rebuilt(self):
+        rnd = random.Random(8)
+        replication = ReplicationModule(0, Resolver(testing=True), 4, 1, 3)
+        replication.rep = [random_structure(rnd, j) for j in range(4)]
+        self.assert_equivalent(replication)
+        # corrupt the index
+        replication.support.pend.counts.clear()
+        replication.support.pend.reached.clear()
+        with patch("modules.replication.support.SUPPORT_INDEX_REBUILD", 1):
+            self.assert_equivalent(replication)
+
+    def test_unknown_status(self):
+        replication = ReplicationModule(0, Resolver(testing=True), 4, 1, 3)
+        with self.assertRaises(ValueError):
+            replication.known_reqs({"PREP"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,13 @@
 import unittest
-from unittest.mock import Mock, MagicMock, call
+from unittest.mock import Mock, MagicMock, call, patch
+from communication import codec
+from modules.bitmask import from_ids
 from resolve.resolver import Resolver
 from modules.view_establishment.predicates import PredicatesAndAction
 from modules.view_establishment.module import ViewEstablishmentModule
 from modules.enums import ViewEstablishmentEnums
 from resolve.enums import Function, Module
-from modules.constants import VIEWS, PHASE, WITNESSES, VCHANGE
+from modules.constants import VIEWS, PHASE, WITNESSES, VCHANGE, CURRENT, NEXT
 
 
 class ViewEstablishmentModuleTest(unittest.TestCase):
@@ -22,7 +24,7 @@ class ViewEstablishmentModuleTest(unittest.TestCase):
 
         # (2) Processor i recent values are noticed and both processors have been witnessed 
         view_est_mod.noticed_recent_value = MagicMock(return_value = True)
-        view_est_mod.get_witnesses = MagicMock(return_value = {0,1})
+        view_est_mod.get_witnesses = MagicMock(return_value = from_ids({0,1}))
 
         # (3)Let predicate of case 0 be false and case 1 true
         view_est_mod.witnes_seen = MagicMock(return_value = True)
@@ -39,7 +41,7 @@ class ViewEstablishmentModuleTest(unittest.TestCase):
 
         # (2) Processor i recent values are noticed and both processors have been witnessed 
         self.assertTrue(view_est_mod.witnesses[view_est_mod.id])
-        self.assertEqual(view_est_mod.witnesses_set, {0,1})
+        self.assertEqual(view_est_mod.witnesses_set, from_ids({0,1}))
 
         # (3) Let predicate of case 0 be false and case 1 true, make sure function is called 
         calls_automaton = [call(
@@ -72,7 +74,7 @@ class ViewEstablishmentModuleTest(unittest.TestCase):
 
         # (2) Processor i recent values are noticed and both processors have been witnessed 
         view_est_mod.noticed_recent_value = MagicMock(return_value = False)
-        view_est_mod.get_witnesses = MagicMock(return_value = set())
+        view_est_mod.get_witnesses = MagicMock(return_value = 0)
 
         # (3)Let predicate of case 0 be false and case 1 true
         view_est_mod.witnes_seen = MagicMock(return_value = True)
@@ -110,7 +112,7 @@ class ViewEstablishmentModuleTest(unittest.TestCase):
 
         # (2) Processor i recent values are noticed and both processors have been witnessed 
         view_est_mod.noticed_recent_value = MagicMock(return_value = True)
-        view_est_mod.get_witnesses = MagicMock(return_value = {0,1})
+        view_est_mod.get_witnesses = MagicMock(return_value = from_ids({0,1}))
 
         # (3) No predicate is true
         view_est_mod.witnes_seen = MagicMock(return_value = True)
@@ -165,7 +167,7 @@ class ViewEstablishmentModuleTest(unittest.TestCase):
 
         # Both condition fulfilled with f = 0
         view_est_mod.witnesses[view_est_mod.id] = True
-        view_est_mod.witnesses_set = {1, 2, 3, 4, 5}
+        view_est_mod.witnesses_set = from_ids({1, 2, 3, 4, 5})
         view_est_mod.echo[0] = {VIEWS: {"current": 0, "next": 1}, PHASE: 1, WITNESSES: None}
         view_est_mod.echo[2] = {VIEWS: {"current": 0, "next": 1}, PHASE: 1, WITNESSES: None}
         view_est_mod.echo[3] = {VIEWS: {"current": 0, "next": 1}, PHASE: 1, WITNESSES: None}
@@ -180,7 +182,7 @@ class ViewEstablishmentModuleTest(unittest.TestCase):
 
         # f = 1, meaning the set is not big enough
         view_est_mod.witnesses[view_est_mod.id] = True
-        view_est_mod.witnesses_set = {1, 2, 3}
+        view_est_mod.witnesses_set = from_ids({1, 2, 3})
         self.assertFalse(view_est_mod.witnes_seen())
 
 
@@ -207,12 +209,12 @@ class ViewEstablishmentModuleTest(unittest.TestCase):
     def test_init(self):
         view_est_mod = ViewEstablishmentModule(0, self.resolver, 2, 0)
         view_est_mod.phs = [0, 1]
-        view_est_mod.witnesses_set = {0}
+        view_est_mod.witnesses_set = from_ids({0})
         view_est_mod.witnesses = [True, True]
 
         view_est_mod.init_module()
         self.assertEqual(view_est_mod.phs, [0, 0])
-        self.assertEqual(view_est_mod.witnesses_set, set())
+        self.assertEqual(view_est_mod.witnesses_set, 0)
         self.assertEqual(view_est_mod.witnesses, [False, False])
 
     # Function added for while true loop
@@ -237,15 +239,15 @@ class ViewEstablishmentModuleTest(unittest.TestCase):
 
         # Both processors have been witnessed
         view_est_mod.witnesses=[True, True]
-        self.assertEqual(view_est_mod.get_witnesses(), {0,1})
+        self.assertEqual(view_est_mod.get_witnesses(), from_ids({0,1}))
 
         # Both processor 1 has been witnessed, not processor 0
         view_est_mod.witnesses=[False, True]
-        self.assertEqual(view_est_mod.get_witnesses(), {1})
+        self.assertEqual(view_est_mod.get_witnesses(), from_ids({1}))
 
         # None of the processors have been witnessed
         view_est_mod.witnesses=[False, False]
-        self.assertEqual(view_est_mod.get_witnesses(), set())
+        self.assertEqual(view_est_mod.get_witnesses(), 0)
 
     
     # Function added for re-routing inter-module communication
@@ -259,4 +261,36 @@ class ViewEstablishmentModuleTest(unittest.TestCase):
         view_est_mod = ViewEstablishmentModule(0, self.resolver, 2, 0)
         view_est_mod.pred_and_action.allow_service = Mock()
         view_est_mod.allow_service()
-        view_est_mod.pred_and_action.allow_service.assert_called_once()
\ No newline at end of file
+        view_est_mod.pred_and_action.allow_service.assert_called_once()
+    @patch("modules.view_establishment.module.conf.get_nodes",
+           return_value={0: None, 1: None, 2: None})
+    def test_send_and_receive_records(self, _):
+        sender = ViewEstablishmentModule(0, Resolver(testing=True), 3, 0)
+        sender.resolver.send_to_node = Mock()
+        sender.phs = [1, 0, 0]
+        sender.witnesses = [True, False, True]
+        sender.pred_and_action.views[0] = {CURRENT: 1, NEXT: 2}
+        sender.pred_and_action.vChange = [True, False, False]
+        sender.send_msg()
+
+        calls = sender.resolver.send_to_node.call_args_list
+        self.assertEqual([c[0][0] for c in calls], [1, 2])
+        msg = calls[1][0][1]
+        TEE = ViewEstablishmentEnums.TEE
+        DF_VIEW = ViewEstablishmentEnums.DF_VIEW
+        self.assertEqual(msg["data"], (1, True, 1, 2, True,
+                                       0, True, TEE, DF_VIEW, False))
+        self.assertEqual(sender.echo[0][VIEWS], {CURRENT: 1, NEXT: 2})
+
+        receiver = ViewEstablishmentModule(2, Resolver(testing=True), 3, 0)
+        receiver.receive_msg(codec.decode(codec.encode(msg)))
+        self.assertEqual(receiver.phs[0], 1)
+        self.assertEqual(receiver.witnesses[0], True)
+        self.assertEqual(receiver.pred_and_action.get_info(0),
+                         ({CURRENT: 1, NEXT: 2}, True))
+        self.assertEqual(receiver.echo[0], {
+            PHASE: 0, WITNESSES: True, VIEWS: {CURRENT: TEE, NEXT: DF_VIEW},
+            VCHANGE: False})
+
+        with self.assertRaises(ValueError):
+            receiver.receive_msg({"sender": 0, "data": (1, True, 1, 2)})
@@ -0,0 +1,71 @@
+import random
+import unittest
+
+from resolve.resolver import Resolver
+from modules.view_establishment.module import ViewEstablishmentModule
+from modules.enums import ViewEstablishmentEnums as enums
+from modules.constants import CURRENT, NEXT
+
+MODES = [enums.REMAIN, enums.FOLLOW]
+
+
+def random_module(rnd, n):
+    """View Establishment module with random, partly stale, views."""
+    module = ViewEstablishmentModule(0, Resolver(testing=True), n,
+                                     (n - 1) // 3)
+    values = [enums.TEE, enums.DF_VIEW, 1, 2, n]
+    for k in range(n):
+        module.pred_and_action.views[k] = {CURRENT: rnd.choice(values),
+                                           NEXT: rnd.choice(values)}
+        module.phs[k] = rnd.choice([0, 1])
+        module.pred_and_action.vChange[k] = rnd.random() < 0.5
+    return module
+
+
+def predicates(pred_and_action, n):
+    """Results of all predicates for all nodes."""
+    pred_and_action.view_pair_to_adopt = -1
+    res = []
+    for j in range(n):
+        for phase in [None, 0, 1]:
+            res.append(pred_and_action.same_v_set(j, phase))
+        for phase in [0, 1]:
+            for mode in MODES:
+                res.append(pred_and_action.transit_set(j, phase, mode))
+                res.append(pred_and_action.transit_adopble(j, phase, mode))
+    for phase in [0, 1]:
+        for mode in MODES:
+            res.append(pred_and_action.establishable(phase, mode))
+        for case in range(4):
+            res.append(pred_and_action.automation(enums.PREDICATE, phase,
+                                                  case))
+            res.append(pred_and_action.view_pair_to_adopt)
+    res.append(pred_and_action.changeable())
+    res.append(pred_and_action.allow_service())
+    return res
+
+
+class TestViewHistogram(unittest.TestCase):
+
+    def test_same_results_as_scanning_views(self):
+        rnd = random.Random(0)
+        for n in [4, 7, 10]:
+            for _ in range(50):
+                module = random_module(rnd, n)
+                pred_and_action = module.pred_and_action
+                expected = predicates(pred_and_action, n)
+                pred_and_action.take_snapshot()
+                self.assertIsNotNone(pred_and_action.histogram)
+                self.assertEqual(predicates(pred_and_action, n), expected)
+                pred_and_action.drop_snapshot()
+                self.assertIsNone(pred_and_action.histogram)
+
+    def test_malformed_views_are_scanned(self):
+        module = random_module(random.Random(0), 4)
+        module.pred_and_action.views[1] = {CURRENT: 0}
+        module.pred_and_action.take_snapshot()
+        self.assertIsNone(module.pred_and_action.histogram)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+
+from modules.replication.window import SeqNumWindow
+
+
+def commit(window, seq_num, latency, backlog=1):
+    window.assigned(seq_num, now=0)
+    window.held_back(backlog)
+    window.committed(seq_num, now=latency)
+
+
+class TestSeqNumWindow(unittest.TestCase):
+
+    def test_starts_at_max(self):
+        window = SeqNumWindow(2, 10)
+        self.assertEqual(window.size, 10)
+        self.assertTrue(window.allows(14, 5))
+        self.assertFalse(window.allows(15, 5))
+
+    def test_shrinks_once_per_window_on_latency(self):
+        window = SeqNumWindow(2, 16)
+        commit(window, 1, 1.0)
+        for seq_num in range(2, 6):
+            window.assigned(seq_num, now=0)
+        window.committed(2, now=5.0)
+        self.assertEqual(window.size, 8)
+        # requests assigned before shrinking do not shrink it again
+        window.committed(3, now=5.0)
+        self.assertEqual(window.size, 8)
+        commit(window, 6, 5.0)
+        self.assertEqual(window.size, 4)
+        for seq_num in range(7, 10):
+            commit(window, seq_num, 10.0)
+        self.assertEqual(window.size, 2)
+
+    def test_grows_with_backlog(self):
+        window = SeqNumWindow(2, 16)
+        commit(window, 1, 1.0)
+        commit(window, 2, 10.0)
+        self.assertEqual(window.size, 8)
+        commit(window, 3, 1.0, backlog=0)
+        self.assertEqual(window.size, 8)
+        for seq_num in range(4, 20):
+            commit(window, seq_num, 1.0)
+        self.assertEqual(window.size, 16)
+
+    def test_fixed_window(self):
+        window = SeqNumWindow(10, 10)
+        commit(window, 1, 1.0)
+        commit(window, 2, 10.0)
+        self.assertEqual(window.size, 10)
+        self.assertEqual(window.assigned_at, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,192 @@
+import asyncio
+import socket
+import time
+import unittest
+import zmq
+from threading import Event, Thread
+from unittest.mock import Mock, MagicMock
+
+from communication import codec
+from communication.zeromq.message import Message, MessageEnum, Payload
+from communication.zeromq.node import Node
+from communication.zeromq.receiver import Receiver
+from communication.zeromq.sender import Sender
+from communication.zeromq.pipelined_sender import PipelinedSender
+from resolve.enums import MessageType
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def run_until_acked(sender, n, timeout=5):
+    task = asyncio.ensure_future(sender.start())
+    loop = asyncio.get_event_loop()
+    deadline = loop.time() + timeout
+    while sender.counter <= n and not task.done() and \
+            loop.time() < deadline:
+        await asyncio.sleep(0.01)
+    task.cancel()
+    if task.done() and not task.cancelled() and task.exception():
+        raise task.exception()
+
+
+class TestZeroMQChannels(unittest.TestCase):
+
+    def setUp(self):
+        self.port = free_port()
+        self.dispatched = []
+        self.max_in_flight = 0
+        self.sender = None
+        resolver = Mock()
+        resolver.dispatch_msg = MagicMock(side_effect=self.dispatch)
+        self.receiver = Receiver(0, "127.0.0.1", self.port, resolver)
+        Thread(target=self.receiver.start, daemon=True).start()
+        self.node = Node(0, "127.0.0.1", "127.0.0.1", self.port)
+
+    def tearDown(self):
+        # the receiver socket is left open, it is owned by its thread
+        if self.sender is not None:
+            self.sender.socket.close(linger=0)
+
+    def dispatch(self, msg, received_at):
+        self.dispatched.append(msg["data"]["i"])
+        if isinstance(self.sender, PipelinedSender):
+            self.max_in_flight = max(self.max_in_flight,
+                                     len(self.sender.in_flight))
+
+    def queue_all(self, n):
+        for i in range(n):
+            self.sender.add_msg_to_queue({
+                "type": MessageType.EVENT_DRIVEN_FD_MESSAGE,
+                "sender": 1,
+                "data": {"i": i}
+            })
+
+    def send_all(self, n):
+        self.queue_all(n)
+        asyncio.run(run_until_acked(self.sender, n))
+
+    def wait_dispatched(self, n, timeout=5):
+        # messages are acked before they are dispatched
+        deadline = time.time() + timeout
+        while len(self.dispatched) < n and time.time() < deadline:
+            time.sleep(0.01)
+
+    def test_pipelined_sender_delivers_in_order(self):
+        on_message_sent = Mock()
+        self.sender = PipelinedSender(1, self.node, on_message_sent,
+                                      window=4)
+        self.send_all(50)
+        self.wait_dispatched(50)
+        self.assertEqual(self.dispatched, list(range(50)))
+        self.assertEqual(self.sender.counter, 51)
+        self.assertEqual(len(self.sender.in_flight), 0)
+        self.assertLessEqual(self.max_in_flight, 4)
+        self.assertEqual(on_message_sent.call_count, 50)
+        msg, metric_data = on_message_sent.call_args[0]
+        self.assertEqual(msg, {
+            "type": MessageType.EVENT_DRIVEN_FD_MESSAGE})
+        self.assertEqual(metric_data["rec_id"], 0)
+        self.assertEqual(metric_data["rec_hostname"], "127.0.0.1")
+        self.assertGreaterEqual(metric_data["latency"], 0)
+
+    def test_pipelined_sender_waits_for_queued_msgs(self):
+        self.sender = PipelinedSender(1, self.node)
+
+        async def send_later():
+            task = asyncio.ensure_future(run_until_acked(self.sender, 2))
+            await asyncio.sleep(0.05)
+            # queued by another thread while the send loop waits
+            Thread(target=self.queue_all, args=(2,)).start()
+            await task
+
+        asyncio.run(send_later())
+        self.wait_dispatched(2)
+        self.assertEqual(self.dispatched, [0, 1])
+        self.assertEqual(self.sender.counter, 3)
+
+    def test_req_sender_still_served(self):
+        self.sender = Sender(1, self.node)
+        self.send_all(5)
+        self.wait_dispatched(5)
+        self.assertEqual(self.dispatched, list(range(5)))
+        self.assertEqual(self.sender.counter, 6)
+
+    def test_receiver_skips_malformed_msgs(self):
+        dealer = zmq.Context.instance().socket(zmq.DEALER)
+        dealer.connect(f"tcp://127.0.0.1:{self.port}")
+        dealer.send_multipart([b"short"])
+        dealer.send_multipart([b"", b"garbled header"])
+        # messages on one connection arrive in order
+        header = Message(MessageEnum.SENDER_MESSAGE, 1, 1).as_bytes()
+        payload = Payload({"type": MessageType.EVENT_DRIVEN_FD_MESSAGE,
+                           "sender": 1, "data": {"i": 0}})
+        dealer.send_multipart([b"", header, payload.get_data()])
+        acked = dealer.poll(5000)
+        reply = dealer.recv_multipart()[-1] if acked else None
+        dealer.close(linger=0)
+        self.assertTrue(acked)
+        self.assertEqual(codec.decode(reply).get_counter(), 1)
+        self.wait_dispatched(1)
+        self.assertEqual(self.dispatched, [0])
+
+    def test_receiver_dispatches_with_receipt_time(self):
+        dispatched = Event()
+        self.receiver.resolver.dispatch_msg = MagicMock(
+            side_effect=lambda msg, received_at: dispatched.set())
+        self.sender = Sender(1, self.node)
+        before = time.time()
+        self.send_all(1)
+        self.assertTrue(dispatched.wait(5))
+        received_at = self.receiver.resolver.dispatch_msg.call_args[0][1]
+        self.assertGreaterEqual(received_at, before)
+        self.assertLessEqual(received_at, time.time())
+
+    def test_receiver_acks_before_dispatching(self):
+        dispatched = Event()
+        self.receiver.resolver.dispatch_msg = MagicMock(
+            side_effect=lambda msg, received_at: dispatched.wait(5))
+        self.sender = Sender(1, self.node)
+        self.send_all(1)
+        # the message was acked while its dispatch is still blocked
+        self.assertEqual(self.sender.counter, 2)
+        self.assertFalse(dispatched.is_set())
+        dispatched.set()
+
+    def ack(self, counter):
+        return codec.encode(Message(MessageEnum.RECEIVER_MESSAGE, counter, 0))
+
+    def test_lost_and_garbled_acks_free_the_window(self):
+        self.sender = PipelinedSender(1, self.node)
+        for c in range(1, 5):
+            self.sender.in_flight.append((c, 0, None, 0))
+        self.sender.next_counter = 5
+        # the ack of message 1 was lost
+        self.assertEqual(self.sender.handle_ack(self.ack(2)), 2)
+        self.assertEqual(self.sender.counter, 3)
+        # an ack that can not be decoded acks the oldest message
+        self.assertEqual(self.sender.handle_ack(b"garbled"), 1)
+        self.assertEqual(self.sender.counter, 4)
+        # acks of messages not in flight are ignored
+        self.assertEqual(self.sender.handle_ack(self.ack(2)), 0)
+        self.assertEqual(self.sender.handle_ack(self.ack(4)), 1)
+        self.assertEqual(self.sender.counter, 5)
+        self.assertEqual(len(self.sender.in_flight), 0)
+
+    def test_unacked_messages_expire(self):
+        self.sender = PipelinedSender(1, self.node, ack_timeout=5)
+        self.sender.in_flight.extend([(1, 0, None, 0), (2, 4, None, 0)])
+        self.sender.next_counter = 3
+        self.assertEqual(self.sender.expire_in_flight(now=5), 0)
+        self.assertEqual(self.sender.expire_in_flight(now=6), 1)
+        self.assertEqual(self.sender.counter, 2)
+        self.assertEqual(self.sender.expire_in_flight(now=10), 1)
+        self.assertEqual(self.sender.counter, 3)
+        # the late ack is ignored
+        self.assertEqual(self.sender.handle_ack(self.ack(1)), 0)
+
+if __name__ == '__main__':
+    unittest.main()